@@ -1,57 +1,234 @@
+from collections import Counter, defaultdict
 from datetime import datetime, timedelta
-from sqlalchemy import func, desc
+from sqlalchemy import String, and_, case, cast, desc, func, literal_column, select, union_all, update
+from sqlalchemy.exc import IntegrityError
 from app import db
-from models import Question, ContentItem, Category, Analytics
+from models import Question, ContentItem, Category, Analytics, AnalyticsCategoryCount, AnalyticsSession
 import logging
+import threading
+import time
 
 class AnalyticsManager:
     """Analytics manager for tracking and analyzing system usage"""
     
-    def __init__(self):
+    # Confidence score distribution buckets, [min, max)
+    CONFIDENCE_RANGES = [
+        (0.0, 0.2, 'Very Low'),
+        (0.2, 0.4, 'Low'),
+        (0.4, 0.6, 'Medium'),
+        (0.6, 0.8, 'High'),
+        (0.8, 1.0, 'Very High')
+    ]
+    
+    # Distinct `days` values whose trends are cached
+    TRENDS_CACHE_ENTRIES = 16
+    
+    def __init__(self, trends_ttl: float = 60.0, trends_check_interval: float = 1.0):
         self.logger = logging.getLogger(__name__)
+        self.trends_ttl = trends_ttl
+        self.trends_check_interval = trends_check_interval
+        self._trends_cache = {}  # days -> cached trends and the latest question id they saw
+        self._trends_lock = threading.Lock()
     
-    def update_daily_analytics(self):
-        """Update daily analytics record"""
-        try:
-            today = datetime.utcnow().date()
-            
-            # Get or create today's analytics record
-            analytics = Analytics.query.filter_by(date=today).first()
-            if not analytics:
-                analytics = Analytics(date=today)
-                db.session.add(analytics)
-            
-            # Calculate metrics for today
-            today_questions = Question.query.filter(
-                func.date(Question.asked_at) == today
-            ).all()
-            
-            analytics.total_questions = len(today_questions)
-            analytics.total_sessions = len(set(q.session_id for q in today_questions))
-            
-            # Calculate average confidence score
-            if today_questions:
-                avg_confidence = sum(q.confidence_score for q in today_questions) / len(today_questions)
-                analytics.avg_confidence_score = avg_confidence
-            
-            # Find most asked category
-            if today_questions:
-                category_counts = {}
-                for question in today_questions:
-                    if question.best_answer and question.best_answer.category:
-                        cat_id = question.best_answer.category.id
-                        category_counts[cat_id] = category_counts.get(cat_id, 0) + 1
-                
-                if category_counts:
-                    most_asked_cat_id = max(category_counts, key=category_counts.get)
-                    analytics.most_asked_category_id = most_asked_cat_id
-            
-            db.session.commit()
-            self.logger.info(f"Updated analytics for {today}")
-            
-        except Exception as e:
-            self.logger.error(f"Error updating daily analytics: {e}")
-            db.session.rollback()
+    # Days whose AnalyticsSession rows are kept for incremental session counts;
+    # older days are final and only change through reconciliation
+    SESSION_RETENTION_DAYS = 2
+    
+    def record_questions(self, questions):
+        """Fold newly saved questions into their days' analytics in one transaction
+        
+        Each call costs a fixed number of indexed lookups and single-row
+        UPDATEs per day and category (running sum and count, per-category
+        counters), independent of how many questions were asked that day.
+        Counters are incremented in SQL so concurrent workers never lose
+        updates; a worker that loses a race to create a day's rows retries once.
+        """
+        if not questions:
+            return
+        
+        for _ in range(2):
+            try:
+                self._record_questions(questions)
+                db.session.commit()
+                return
+            except IntegrityError:
+                # Another worker created the same row first; retry as an update
+                db.session.rollback()
+            except Exception as e:
+                self.logger.error(f"Error updating daily analytics: {e}")
+                db.session.rollback()
+                return
+        
+        self.logger.warning(f"Could not record {len(questions)} questions in daily analytics")
+    
+    def _record_questions(self, questions):
+        """Stage the incremental updates for a group of questions"""
+        answer_ids = {question.best_answer_id for question in questions if question.best_answer_id is not None}
+        answer_categories = {}
+        if answer_ids:
+            answer_categories = dict(
+                db.session.query(ContentItem.id, ContentItem.category_id)
+                          .filter(ContentItem.id.in_(answer_ids)).all()
+            )
+        
+        questions_by_day = defaultdict(list)
+        for question in questions:
+            questions_by_day[(question.asked_at or datetime.utcnow()).date()].append(question)
+        
+        for day, day_questions in questions_by_day.items():
+            self._record_day(day, day_questions, answer_categories)
+    
+    def _record_day(self, day, questions, answer_categories):
+        """Stage one day's counter updates for questions asked on it"""
+        session_ids = {question.session_id for question in questions}
+        seen_sessions = {
+            session_id for (session_id,) in db.session.query(AnalyticsSession.session_id)
+                                                     .filter(AnalyticsSession.date == day,
+                                                             AnalyticsSession.session_id.in_(session_ids))
+        }
+        new_sessions = session_ids - seen_sessions
+        for session_id in new_sessions:
+            db.session.add(AnalyticsSession(date=day, session_id=session_id))
+        
+        question_count = len(questions)
+        confidence = sum(question.confidence_score or 0.0 for question in questions)
+        category_counts = Counter(
+            answer_categories[question.best_answer_id] for question in questions
+            if question.best_answer_id in answer_categories
+        )
+        
+        analytics = Analytics.query.filter_by(date=day).first()
+        if analytics is None:
+            db.session.add(Analytics(
+                date=day,
+                total_questions=question_count,
+                total_sessions=len(new_sessions),
+                confidence_sum=confidence,
+                avg_confidence_score=confidence / question_count,
+                most_asked_category_id=min(
+                    category_counts.items(), key=lambda entry: (-entry[1], entry[0])
+                )[0] if category_counts else None
+            ))
+            for category_id, count in category_counts.items():
+                db.session.add(AnalyticsCategoryCount(date=day, category_id=category_id, question_count=count))
+            return
+        
+        if analytics.confidence_sum is None:
+            # Row written before running sums existed, recompute it exactly once
+            self.reconcile_day(day)
+            return
+        
+        db.session.execute(
+            update(Analytics)
+            .where(Analytics.id == analytics.id)
+            .values(
+                total_questions=Analytics.total_questions + question_count,
+                total_sessions=Analytics.total_sessions + len(new_sessions),
+                confidence_sum=Analytics.confidence_sum + confidence
+            )
+            .execution_options(synchronize_session=False)
+        )
+        # Separate statement: MySQL evaluates SET clauses left to right
+        db.session.execute(
+            update(Analytics)
+            .where(Analytics.id == analytics.id)
+            .values(avg_confidence_score=Analytics.confidence_sum / Analytics.total_questions)
+            .execution_options(synchronize_session=False)
+        )
+        
+        for category_id, count in category_counts.items():
+            self._count_category(analytics, day, category_id, count)
+    
+    def _count_category(self, analytics, day, category_id, count=1):
+        """Add to a category's daily counter and keep the most asked category current"""
+        updated = db.session.execute(
+            update(AnalyticsCategoryCount)
+            .where(AnalyticsCategoryCount.date == day, AnalyticsCategoryCount.category_id == category_id)
+            .values(question_count=AnalyticsCategoryCount.question_count + count)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not updated:
+            db.session.add(AnalyticsCategoryCount(date=day, category_id=category_id, question_count=count))
+        
+        # Only the category just incremented can overtake the current leader
+        leader_id = analytics.most_asked_category_id
+        if leader_id == category_id:
+            return
+        
+        counts = dict(db.session.query(AnalyticsCategoryCount.category_id, AnalyticsCategoryCount.question_count)
+                      .filter(AnalyticsCategoryCount.date == day,
+                              AnalyticsCategoryCount.category_id.in_([category_id, leader_id]))
+                      .all())
+        if leader_id is None or counts.get(category_id, 0) > counts.get(leader_id, 0):
+            analytics.most_asked_category_id = category_id
+    
+    def reconcile_day(self, day):
+        """Recompute one day's analytics and counters exactly from Question rows
+        
+        Aggregates run in SQL. Changes are staged in the session; the caller commits.
+        """
+        start = datetime.combine(day, datetime.min.time())
+        in_day = (Question.asked_at >= start, Question.asked_at < start + timedelta(days=1))
+        
+        total_questions, total_sessions, confidence_sum = db.session.query(
+            func.count(Question.id),
+            func.count(func.distinct(Question.session_id)),
+            func.coalesce(func.sum(Question.confidence_score), 0.0)
+        ).filter(*in_day).one()
+        
+        category_counts = db.session.query(
+            ContentItem.category_id,
+            func.count(Question.id)
+        ).join(ContentItem, ContentItem.id == Question.best_answer_id)\
+         .filter(*in_day)\
+         .group_by(ContentItem.category_id).all()
+        
+        analytics = Analytics.query.filter_by(date=day).first()
+        if analytics is None:
+            if not total_questions:
+                return
+            analytics = Analytics(date=day)
+            db.session.add(analytics)
+        
+        analytics.total_questions = total_questions
+        analytics.total_sessions = total_sessions
+        analytics.confidence_sum = float(confidence_sum)
+        analytics.avg_confidence_score = float(confidence_sum) / total_questions if total_questions else 0.0
+        analytics.most_asked_category_id = min(
+            category_counts, key=lambda entry: (-entry[1], entry[0])
+        )[0] if category_counts else None
+        
+        AnalyticsCategoryCount.query.filter_by(date=day).delete(synchronize_session=False)
+        for category_id, count in category_counts:
+            db.session.add(AnalyticsCategoryCount(date=day, category_id=category_id, question_count=count))
+        
+        AnalyticsSession.query.filter_by(date=day).delete(synchronize_session=False)
+        if day > datetime.utcnow().date() - timedelta(days=self.SESSION_RETENTION_DAYS):
+            session_ids = db.session.query(Question.session_id).filter(*in_day).distinct()
+            for (session_id,) in session_ids:
+                db.session.add(AnalyticsSession(date=day, session_id=session_id))
+    
+    def reconcile(self, days=30):
+        """Recompute the last `days` days exactly and prune expired session rows, return days reconciled"""
+        today = datetime.utcnow().date()
+        reconciled = 0
+        
+        for offset in range(days - 1, -1, -1):
+            day = today - timedelta(days=offset)
+            try:
+                self.reconcile_day(day)
+                db.session.commit()
+                reconciled += 1
+            except Exception as e:
+                self.logger.error(f"Error reconciling analytics for {day}: {e}")
+                db.session.rollback()
+        
+        cutoff = today - timedelta(days=self.SESSION_RETENTION_DAYS - 1)
+        AnalyticsSession.query.filter(AnalyticsSession.date < cutoff).delete(synchronize_session=False)
+        db.session.commit()
+        
+        self.logger.info(f"Reconciled analytics for {reconciled} days")
+        return reconciled
     
     def get_dashboard_stats(self):
         """Get dashboard statistics"""
@@ -88,7 +265,7 @@ class AnalyticsManager:
                 'avg_confidence_score': round(avg_confidence, 2),
                 'top_categories': [{'name': name, 'count': count} for name, count in category_stats]
             }
-            
+        
         except Exception as e:
             self.logger.error(f"Error getting dashboard stats: {e}")
             return {
@@ -101,52 +278,29 @@ class AnalyticsManager:
             }
     
     def get_question_trends(self, days=30):
-        """Get question trends over time"""
+        """Get question trends over time
+        
+        Served from a per-`days` cache while no newer question exists; the
+        latest question id is re-read at most every trends_check_interval
+        seconds, and entries expire after trends_ttl as the window moves on.
+        """
+        now = time.monotonic()
+        with self._trends_lock:
+            entry = self._trends_cache.get(days)
+        
         try:
-            start_date = datetime.utcnow() - timedelta(days=days)
-            
-            # Daily question counts
-            daily_counts = db.session.query(
-                func.date(Question.asked_at).label('date'),
-                func.count(Question.id).label('count')
-            ).filter(Question.asked_at >= start_date)\
-             .group_by(func.date(Question.asked_at))\
-             .order_by('date').all()
-            
-            # Category distribution
-            category_dist = db.session.query(
-                Category.name,
-                func.count(Question.id).label('count')
-            ).join(ContentItem, Category.id == ContentItem.category_id)\
-             .join(Question, ContentItem.id == Question.best_answer_id)\
-             .filter(Question.asked_at >= start_date)\
-             .group_by(Category.id, Category.name)\
-             .order_by(desc('count')).all()
-            
-            # Confidence score distribution
-            confidence_ranges = [
-                (0.0, 0.2, 'Very Low'),
-                (0.2, 0.4, 'Low'),
-                (0.4, 0.6, 'Medium'),
-                (0.6, 0.8, 'High'),
-                (0.8, 1.0, 'Very High')
-            ]
-            
-            confidence_dist = []
-            for min_score, max_score, label in confidence_ranges:
-                count = Question.query.filter(
-                    Question.asked_at >= start_date,
-                    Question.confidence_score >= min_score,
-                    Question.confidence_score < max_score
-                ).count()
-                confidence_dist.append({'label': label, 'count': count})
-            
-            return {
-                'daily_counts': [{'date': str(date), 'count': count} for date, count in daily_counts],
-                'category_distribution': [{'name': name, 'count': count} for name, count in category_dist],
-                'confidence_distribution': confidence_dist
-            }
+            if entry is not None and now - entry['computed_at'] < self.trends_ttl:
+                if now - entry['checked_at'] < self.trends_check_interval:
+                    return entry['trends']
+                latest_id = self._latest_question_id()
+                if latest_id == entry['latest_id']:
+                    entry['checked_at'] = now
+                    return entry['trends']
+            else:
+                latest_id = self._latest_question_id()
             
+            trends = self._query_question_trends(datetime.utcnow() - timedelta(days=days))
+        
         except Exception as e:
             self.logger.error(f"Error getting question trends: {e}")
             return {
@@ -154,26 +308,117 @@ class AnalyticsManager:
                 'category_distribution': [],
                 'confidence_distribution': []
             }
+        
+        with self._trends_lock:
+            if days not in self._trends_cache and len(self._trends_cache) >= self.TRENDS_CACHE_ENTRIES:
+                self._trends_cache.pop(next(iter(self._trends_cache)))
+            self._trends_cache[days] = {
+                'trends': trends,
+                'latest_id': latest_id,
+                'computed_at': now,
+                'checked_at': now
+            }
+        return trends
+    
+    def _latest_question_id(self):
+        """Highest question id, a primary-key lookup that changes whenever questions land"""
+        return db.session.query(func.max(Question.id)).scalar()
+    
+    def _query_question_trends(self, start_date):
+        """Daily counts, category distribution and confidence histogram in one round trip
+        
+        The three grouped aggregates are combined with UNION ALL as
+        (kind, key, count) rows; the histogram buckets scores with one CASE.
+        """
+        in_window = Question.asked_at >= start_date
+        
+        day = func.date(Question.asked_at)
+        daily_counts = select(
+            literal_column("'day'", String).label('kind'),
+            cast(day, String).label('key'),
+            func.count(Question.id).label('count')
+        ).where(in_window).group_by(day)
+        
+        category_distribution = select(
+            literal_column("'category'", String),
+            Category.name,
+            func.count(Question.id)
+        ).select_from(Question)\
+         .join(ContentItem, ContentItem.id == Question.best_answer_id)\
+         .join(Category, Category.id == ContentItem.category_id)\
+         .where(in_window)\
+         .group_by(Category.id, Category.name)
+        
+        # Bucket in a subquery so GROUP BY sees a plain column on every dialect
+        bucket = case(
+            *[(and_(Question.confidence_score >= min_score, Question.confidence_score < max_score), position)
+              for position, (min_score, max_score, _) in enumerate(self.CONFIDENCE_RANGES)],
+            else_=None
+        )
+        buckets = select(bucket.label('bucket')).where(in_window).subquery()
+        confidence_distribution = select(
+            literal_column("'confidence'", String),
+            cast(buckets.c.bucket, String),
+            func.count()
+        ).where(buckets.c.bucket.isnot(None)).group_by(buckets.c.bucket)
+        
+        rows = db.session.execute(union_all(daily_counts, category_distribution, confidence_distribution)).all()
+        
+        daily = []
+        categories = []
+        confidence_counts = [0] * len(self.CONFIDENCE_RANGES)
+        for kind, key, count in rows:
+            if kind == 'day':
+                daily.append({'date': key, 'count': count})
+            elif kind == 'category':
+                categories.append({'name': key, 'count': count})
+            else:
+                confidence_counts[int(key)] = count
+        
+        daily.sort(key=lambda entry: entry['date'])
+        categories.sort(key=lambda entry: -entry['count'])
+        
+        return {
+            'daily_counts': daily,
+            'category_distribution': categories,
+            'confidence_distribution': [
+                {'label': label, 'count': count}
+                for (_, _, label), count in zip(self.CONFIDENCE_RANGES, confidence_counts)
+            ]
+        }
     
     def get_recent_questions(self, limit=50):
-        """Get recent questions with details"""
+        """Get recent questions with details
+        
+        Columns are projected through outer joins, so the page costs one
+        query whatever the limit.
+        """
         try:
-            questions = Question.query.order_by(desc(Question.asked_at))\
-                                     .limit(limit).all()
+            rows = db.session.query(
+                Question.id,
+                Question.question_text,
+                Question.asked_at,
+                Question.confidence_score,
+                Question.was_helpful,
+                Category.name
+            ).outerjoin(ContentItem, ContentItem.id == Question.best_answer_id)\
+             .outerjoin(Category, Category.id == ContentItem.category_id)\
+             .order_by(desc(Question.asked_at))\
+             .limit(limit).all()
             
             result = []
-            for q in questions:
+            for question_id, question_text, asked_at, confidence_score, was_helpful, category_name in rows:
                 result.append({
-                    'id': q.id,
-                    'question': q.question_text,
-                    'asked_at': q.asked_at.isoformat(),
-                    'confidence_score': q.confidence_score,
-                    'category': q.best_answer.category.name if q.best_answer else 'No match',
-                    'was_helpful': q.was_helpful
+                    'id': question_id,
+                    'question': question_text,
+                    'asked_at': asked_at.isoformat(),
+                    'confidence_score': confidence_score,
+                    'category': category_name if category_name is not None else 'No match',
+                    'was_helpful': was_helpful
                 })
             
             return result
-            
+        
         except Exception as e:
             self.logger.error(f"Error getting recent questions: {e}")
             return []
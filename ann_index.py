@@ -0,0 +1,180 @@
+"""
+Vector search indexes for the dense content embeddings
+Exact cosine scan plus an IVF approximate index, both pure NumPy
+"""
+
+import logging
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+class ExactIndex:
+    """Brute-force cosine scan over every row
+    
+    Vectors are owned by the caller and passed to search(), so switching
+    between exact and approximate search never copies the matrix.
+    """
+    
+    def build(self, vectors: np.ndarray) -> None:
+        """Nothing to precompute for an exact scan"""
+        pass
+    
+    def add(self, start_row: int, vectors: np.ndarray) -> None:
+        """Nothing to update for an exact scan"""
+        pass
+    
+    def search(self, vectors: np.ndarray, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the k rows most similar to query and their scores"""
+        scores = vectors @ query
+        return _top_k(np.arange(len(vectors)), scores, k)
+
+class IVFIndex:
+    """Inverted-file index over L2-normalised vectors
+    
+    Spherical k-means splits the rows into n_lists clusters; a query only
+    scans the rows of its n_probe closest clusters. Raising n_probe trades
+    speed for recall, n_probe == n_lists is an exact scan.
+    """
+    
+    def __init__(self, n_lists: Optional[int] = None, n_probe: int = 8, n_iter: int = 8,
+                 train_sample_per_list: int = 32, seed: int = 0):
+        self.logger = logging.getLogger(__name__)
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.n_iter = n_iter
+        self.train_sample_per_list = train_sample_per_list
+        self.seed = seed
+        
+        self.centroids = None
+        self.trained_rows = 0
+        self._lists = []  # row indices per cluster
+    
+    def build(self, vectors: np.ndarray) -> None:
+        """Train centroids on a sample of vectors and assign every row"""
+        start_time = time.perf_counter()
+        n_rows = len(vectors)
+        # Around 4 * sqrt(n) lists keeps both centroid and list scans small
+        n_lists = self.n_lists or max(1, int(4 * np.sqrt(n_rows)))
+        n_lists = min(n_lists, n_rows)
+        
+        rng = np.random.default_rng(self.seed)
+        sample_size = min(n_rows, n_lists * self.train_sample_per_list)
+        sample = vectors[np.sort(rng.choice(n_rows, sample_size, replace=False))]
+        
+        centroids = sample[rng.choice(sample_size, n_lists, replace=False)].copy()
+        for _ in range(self.n_iter):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            counts = np.bincount(assignment, minlength=n_lists)
+            
+            # Re-seed empty clusters from random sample points
+            empty = np.flatnonzero(counts == 0)
+            if len(empty):
+                sums[empty] = sample[rng.choice(sample_size, len(empty))]
+            
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids = (sums / norms).astype(np.float32)
+        
+        self.centroids = centroids
+        self._lists = [np.zeros(0, dtype=np.intp) for _ in range(n_lists)]
+        self.trained_rows = 0
+        self.add(0, vectors)
+        self.trained_rows = n_rows
+        
+        self.logger.info(
+            f"Built IVF index: {n_rows} rows, {n_lists} lists in {time.perf_counter() - start_time:.2f}s"
+        )
+    
+    def add(self, start_row: int, vectors: np.ndarray, chunk_size: int = 8192) -> None:
+        """Assign rows start_row.. to their closest cluster"""
+        for chunk_start in range(0, len(vectors), chunk_size):
+            chunk = vectors[chunk_start:chunk_start + chunk_size]
+            assignment = np.argmax(chunk @ self.centroids.T, axis=1)
+            rows = np.arange(len(chunk)) + start_row + chunk_start
+            
+            order = np.argsort(assignment, kind='stable')
+            lists, boundaries = np.unique(assignment[order], return_index=True)
+            for list_id, group in zip(lists, np.split(rows[order], boundaries[1:])):
+                self._lists[list_id] = np.concatenate([self._lists[list_id], group])
+    
+    def search(self, vectors: np.ndarray, query: np.ndarray, k: int,
+               n_probe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the k best rows among the n_probe closest clusters"""
+        n_probe = min(n_probe or self.n_probe, len(self.centroids))
+        centroid_scores = self.centroids @ query
+        probed = np.argpartition(-centroid_scores, n_probe - 1)[:n_probe]
+        
+        rows = np.concatenate([self._lists[list_id] for list_id in probed])
+        scores = vectors[rows] @ query
+        return _top_k(rows, scores, k)
+    
+    def export_arrays(self) -> Dict[str, np.ndarray]:
+        """Centroids and list assignments as flat arrays, see from_arrays"""
+        sizes = np.array([len(rows) for rows in self._lists], dtype=np.int64)
+        return {
+            'centroids': self.centroids,
+            'list_rows': np.concatenate(self._lists).astype(np.int64),
+            'list_offsets': np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+        }
+    
+    @classmethod
+    def from_arrays(cls, centroids: np.ndarray, list_rows: np.ndarray, list_offsets: np.ndarray,
+                    trained_rows: int, n_probe: int = 8) -> 'IVFIndex':
+        """Index over exported arrays without retraining; they may stay memory-mapped"""
+        index = cls(n_lists=len(centroids), n_probe=n_probe)
+        index.centroids = centroids
+        index._lists = [list_rows[list_offsets[i]:list_offsets[i + 1]] for i in range(len(centroids))]
+        index.trained_rows = trained_rows
+        return index
+    
+    def get_stats(self) -> Dict:
+        """Get index statistics"""
+        sizes = [len(rows) for rows in self._lists]
+        return {
+            'n_lists': len(self._lists),
+            'n_probe': self.n_probe,
+            'rows': int(sum(sizes)),
+            'largest_list': max(sizes) if sizes else 0
+        }
+
+def _top_k(rows: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Select the k highest scores, best first"""
+    k = min(k, len(scores))
+    if k <= 0:
+        return rows[:0], scores[:0]
+    if k < len(scores):
+        top = np.argpartition(-scores, k - 1)[:k]
+    else:
+        top = np.arange(len(scores))
+    top = top[np.argsort(-scores[top])]
+    return rows[top], scores[top]
+
+def evaluate_recall(vectors: np.ndarray, queries: np.ndarray, index, k: int = 10,
+                    **search_options) -> Dict:
+    """Measure recall@k and latency of index against the exact scan"""
+    exact = ExactIndex()
+    recalls = []
+    exact_time = 0.0
+    index_time = 0.0
+    
+    for query in queries:
+        start_time = time.perf_counter()
+        exact_rows, _ = exact.search(vectors, query, k)
+        exact_time += time.perf_counter() - start_time
+        
+        start_time = time.perf_counter()
+        index_rows, _ = index.search(vectors, query, k, **search_options)
+        index_time += time.perf_counter() - start_time
+        
+        recalls.append(len(np.intersect1d(exact_rows, index_rows)) / max(len(exact_rows), 1))
+    
+    return {
+        'recall_at_k': float(np.mean(recalls)) if recalls else 0.0,
+        'k': k,
+        'queries': len(queries),
+        'exact_ms_per_query': exact_time / max(len(queries), 1) * 1000,
+        'index_ms_per_query': index_time / max(len(queries), 1) * 1000
+    }
@@ -0,0 +1,89 @@
+"""
+Answer result cache for repeat questions
+Bounded LRU cache with a TTL, invalidated whenever the content corpus changes
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+class AnswerCache:
+    """LRU + TTL cache of final ranked answers
+    
+    Keys combine the normalized question, the target language and the
+    corpus version, so any content write makes earlier entries unreachable.
+    With shared index snapshots the corpus version is the snapshot version,
+    so every worker invalidates on the same writes.
+    """
+    
+    def __init__(self, max_entries: int = 1000, ttl_seconds: int = 600):
+        self.logger = logging.getLogger(__name__)
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.corpus_version = 0
+        
+        self._entries = OrderedDict()  # key -> (stored_at, value)
+        self._lock = threading.Lock()
+        
+        self.hits = 0
+        self.misses = 0
+    
+    def make_key(self, normalized_question: str, target_language: str) -> Tuple:
+        """Build the cache key for a question against the current corpus"""
+        return (normalized_question, target_language, self.corpus_version)
+    
+    def get(self, key: Tuple) -> Optional[Any]:
+        """Return the cached value for key, or None on a miss or expiry"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if time.monotonic() - stored_at < self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            
+            self.misses += 1
+            return None
+    
+    def set(self, key: Tuple, value: Any) -> None:
+        """Store value under key, evicting the least recently used entry when full"""
+        with self._lock:
+            # A write may have landed while the answer was being computed
+            if key[-1] != self.corpus_version:
+                return
+            
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def bump_corpus_version(self) -> None:
+        """Invalidate every cached answer after a content write"""
+        with self._lock:
+            self.corpus_version += 1
+            self._entries.clear()
+    
+    def set_corpus_version(self, version: Any) -> None:
+        """Follow the shared index snapshot version, invalidating on any change"""
+        with self._lock:
+            if version == self.corpus_version:
+                return
+            self.corpus_version = version
+            self._entries.clear()
+    
+    def get_stats(self) -> Dict:
+        """Get cache statistics"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups * 100, 1) if lookups else 0.0,
+                'corpus_version': self.corpus_version
+            }
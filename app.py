@@ -1,5 +1,7 @@
+import gc
 import os
 import logging
+from typing import Dict, Optional
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
@@ -14,7 +16,7 @@ class Base(DeclarativeBase):
 
 db = SQLAlchemy(model_class=Base)
 
-# Create the app
+# Create the app; create_app() configures it and registers the routes
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key-change-in-production")
 app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
@@ -30,43 +32,183 @@ app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 
-# Initialize SocketIO for real-time collaboration
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
+# Number of candidates the lexical retrieval stage hands to the reranker
+app.config['RETRIEVAL_CANDIDATES'] = int(os.environ.get("RETRIEVAL_CANDIDATES", 50))
 
-# Initialize the app with the extension
-db.init_app(app)
+# spaCy preprocessing batches; more than one process forks workers per batch run
+app.config['SPACY_BATCH_SIZE'] = int(os.environ.get("SPACY_BATCH_SIZE", 256))
+app.config['SPACY_N_PROCESS'] = int(os.environ.get("SPACY_N_PROCESS", 1))
 
-# Create upload directory if it doesn't exist
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+# Rows per commit when backfilling processed_content after a pipeline change
+app.config['BACKFILL_CHUNK_SIZE'] = int(os.environ.get("BACKFILL_CHUNK_SIZE", 500))
 
-with app.app_context():
-    # Import models and routes
-    import models
-    import routes
+# Long content is embedded as overlapping passages of this many words
+app.config['PASSAGE_WORDS'] = int(os.environ.get("PASSAGE_WORDS", 128))
+app.config['PASSAGE_OVERLAP'] = int(os.environ.get("PASSAGE_OVERLAP", 32))
+
+# Approximate nearest-neighbour search for large corpora
+app.config['ANN_MIN_ROWS'] = int(os.environ.get("ANN_MIN_ROWS", 20000))
+app.config['ANN_LISTS'] = int(os.environ.get("ANN_LISTS", 0)) or None  # None picks ~4 * sqrt(rows)
+app.config['ANN_PROBE'] = int(os.environ.get("ANN_PROBE", 8))
+app.config['ANN_CANDIDATES'] = int(os.environ.get("ANN_CANDIDATES", 200))
+
+# Cache of final answers for repeat questions
+app.config['ANSWER_CACHE_SIZE'] = int(os.environ.get("ANSWER_CACHE_SIZE", 1000))
+app.config['ANSWER_CACHE_TTL'] = int(os.environ.get("ANSWER_CACHE_TTL", 600))  # seconds
+
+# Overall time budget for external knowledge sources per question
+app.config['EXTERNAL_KNOWLEDGE_DEADLINE'] = float(os.environ.get("EXTERNAL_KNOWLEDGE_DEADLINE", 3.0))  # seconds
+
+# On-disk embedding cache shared by all workers
+app.config['EMBEDDING_CACHE_DIR'] = os.environ.get(
+    "EMBEDDING_CACHE_DIR", os.path.join(app.instance_path, 'embeddings')
+)
+
+# Transformer inference on CPU: fp32, int8 (dynamic quantization) or onnx
+app.config['INFERENCE_BACKEND'] = os.environ.get("INFERENCE_BACKEND", "fp32")
+app.config['INFERENCE_THREADS'] = int(os.environ.get("INFERENCE_THREADS", 0)) or None  # None keeps torch's default
+app.config['ONNX_DIR'] = os.environ.get("ONNX_DIR", os.path.join(app.instance_path, 'onnx'))
+
+# Concurrent question embeddings wait up to this long to share one forward pass (0 disables)
+app.config['INFERENCE_BATCH_WAIT_MS'] = float(os.environ.get("INFERENCE_BATCH_WAIT_MS", 5.0))
+app.config['INFERENCE_MAX_BATCH'] = int(os.environ.get("INFERENCE_MAX_BATCH", 32))
+
+# Versioned index snapshots memory-mapped by every worker (empty keeps indexes per process)
+app.config['INDEX_SNAPSHOT_DIR'] = os.environ.get(
+    "INDEX_SNAPSHOT_DIR", os.path.join(app.instance_path, 'index')
+)
+# Content edits are shared as small deltas; every this many a full snapshot is written again
+app.config['INDEX_SNAPSHOT_MAX_DELTAS'] = int(os.environ.get("INDEX_SNAPSHOT_MAX_DELTAS", 16))
+
+# Warm models and indexes at startup; /healthz/ready reports 503 until done
+app.config['WARMUP_ON_STARTUP'] = os.environ.get("WARMUP_ON_STARTUP", "1") != "0"
+# Only load models already on disk instead of downloading them on startup
+app.config['MODEL_LOCAL_FILES_ONLY'] = os.environ.get("MODEL_LOCAL_FILES_ONLY", "0") == "1"
+
+# Longest a cached analytics trends payload is served while no new questions land
+app.config['TRENDS_CACHE_TTL'] = float(os.environ.get("TRENDS_CACHE_TTL", 60.0))  # seconds
+
+# Question logs and analytics are written by a background thread in batches
+# of up to QUESTION_WRITE_BATCH, at least every QUESTION_FLUSH_MS (0 writes on the request thread)
+app.config['QUESTION_WRITE_BATCH'] = int(os.environ.get("QUESTION_WRITE_BATCH", 100))
+app.config['QUESTION_FLUSH_MS'] = float(os.environ.get("QUESTION_FLUSH_MS", 200.0))
+
+# Optional subsystems, each can be switched off here or with create_app(config)
+app.config['ENABLE_TRANSFORMER'] = os.environ.get("ENABLE_TRANSFORMER", "1") != "0"
+app.config['ENABLE_EXTERNAL_KNOWLEDGE'] = os.environ.get("ENABLE_EXTERNAL_KNOWLEDGE", "1") != "0"
+app.config['ENABLE_COLLABORATION'] = os.environ.get("ENABLE_COLLABORATION", "1") != "0"
+# Load model weights in create_app so gunicorn --preload workers share them copy-on-write
+app.config['PRELOAD_MODELS'] = os.environ.get("PRELOAD_MODELS", "0") == "1"
+
+# SocketIO for real-time collaboration, bound to the app in create_app
+socketio = SocketIO()
+
+def _preload_models(app):
+    """Load read-only model weights in the current process before workers fork
     
-    # Create all tables
-    db.create_all()
+    Only weights are loaded: no inference runs and no threads start, so the
+    forked workers inherit the pages copy-on-write instead of each loading
+    its own copy. gc.freeze() keeps the collector in the workers from
+    writing to these objects and un-sharing their pages.
+    """
+    from model_registry import model_registry
     
-    # Initialize advanced processors
-    from nlp_processor import NLPProcessor
-    from transformer_nlp import TransformerNLP
-    from multilang_support import MultiLanguageProcessor
-    from external_knowledge import ExternalKnowledgeConnector
-    from collaborative_editor import CollaborativeEditor
-    from hindi_content_extractor import HindiContentExtractor
+    model_registry.get_spacy_model()
+    if app.transformer_nlp is not None:
+        try:
+            model_registry.get_transformer(
+                app.transformer_nlp.model_name, local_files_only=app.config['MODEL_LOCAL_FILES_ONLY']
+            )
+        except Exception as e:
+            logging.warning(f"Could not preload transformer model: {e}")
     
-    # Initialize processors with fallback handling
-    try:
-        app.transformer_nlp = TransformerNLP()
-        logging.info("Advanced transformer NLP initialized")
-    except Exception as e:
-        logging.warning(f"Transformer NLP initialization failed: {e}")
-        app.transformer_nlp = None
+    gc.collect()
+    gc.freeze()
+    logging.info(f"Preloaded models: {', '.join(model_registry.get_stats())}")
+
+def create_app(config: Optional[Dict] = None) -> Flask:
+    """Configure the app, register its routes and start the enabled subsystems
     
-    app.nlp_processor = NLPProcessor()
-    app.multilang_processor = MultiLanguageProcessor()
-    app.external_knowledge = ExternalKnowledgeConnector()
-    app.collaborative_editor = CollaborativeEditor(socketio)
-    app.hindi_extractor = HindiContentExtractor()
+    config overrides the settings above, e.g. {'ENABLE_TRANSFORMER': False}
+    for a process that only serves analytics. Routes are registered on the
+    module-level app (templates address them by endpoint name), so the app
+    is set up once per process and later calls return it unchanged.
+    """
+    if 'sqlalchemy' in app.extensions:
+        return app
+    
+    app.config.update(config or {})
+    
+    socketio.init_app(app, cors_allowed_origins="*", async_mode='threading')
+    db.init_app(app)
+    
+    # Create upload directory if it doesn't exist
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    
+    with app.app_context():
+        # Import models and routes
+        import models
+        import routes
+        import commands
+        
+        # Create all tables
+        db.create_all()
+        
+        from migrations import ensure_schema
+        ensure_schema()
+        
+        # Initialize processors with fallback handling
+        app.transformer_nlp = None
+        if app.config['ENABLE_TRANSFORMER']:
+            try:
+                from transformer_nlp import TransformerNLP
+                app.transformer_nlp = TransformerNLP(
+                    cache_dir=app.config['EMBEDDING_CACHE_DIR'],
+                    ann_min_rows=app.config['ANN_MIN_ROWS'],
+                    ann_lists=app.config['ANN_LISTS'],
+                    ann_probe=app.config['ANN_PROBE'],
+                    ann_candidates=app.config['ANN_CANDIDATES'],
+                    inference_backend=app.config['INFERENCE_BACKEND'],
+                    num_threads=app.config['INFERENCE_THREADS'],
+                    onnx_dir=app.config['ONNX_DIR'],
+                    batch_wait_ms=app.config['INFERENCE_BATCH_WAIT_MS'],
+                    max_batch_size=app.config['INFERENCE_MAX_BATCH'],
+                    passage_words=app.config['PASSAGE_WORDS'],
+                    passage_overlap=app.config['PASSAGE_OVERLAP'],
+                    local_files_only=app.config['MODEL_LOCAL_FILES_ONLY']
+                )
+                logging.info("Advanced transformer NLP initialized")
+            except Exception as e:
+                logging.warning(f"Transformer NLP initialization failed: {e}")
+        
+        from multilang_support import MultiLanguageProcessor
+        from hindi_content_extractor import HindiContentExtractor
+        
+        # Share the processor (and its index) that routes already built
+        app.nlp_processor = routes.nlp_processor
+        app.multilang_processor = MultiLanguageProcessor()
+        app.hindi_extractor = HindiContentExtractor()
+        
+        # Routes check for these attributes, so disabled subsystems are left unset
+        if app.config['ENABLE_EXTERNAL_KNOWLEDGE']:
+            from external_knowledge import ExternalKnowledgeConnector
+            app.external_knowledge = ExternalKnowledgeConnector(
+                deadline_seconds=app.config['EXTERNAL_KNOWLEDGE_DEADLINE']
+            )
+        if app.config['ENABLE_COLLABORATION']:
+            from collaborative_editor import CollaborativeEditor
+            app.collaborative_editor = CollaborativeEditor(socketio)
+        
+        # Warmup steps run once per worker, see /healthz/ready
+        from warmup import WarmupManager
+        app.warmup = WarmupManager()
+        routes.register_warmup_steps(app.warmup)
+        
+        if app.config['PRELOAD_MODELS']:
+            _preload_models(app)
+            # Workers must not share the master's database connections
+            db.engine.dispose()
+        
+        logging.info("Advanced Q&A system initialized")
     
-    logging.info("Advanced Q&A system initialized with all features")
+    return app
@@ -0,0 +1,97 @@
+"""
+Queue-and-batch background worker
+Request threads queue entries; one worker thread drains them in bounded batches
+"""
+
+import atexit
+import logging
+import queue
+import threading
+import time
+from typing import List
+
+class BatchWorker:
+    """Single worker thread that hands queued entries to _process in batches
+    
+    The worker blocks for the first entry, then keeps collecting for at most
+    max_wait seconds or until max_batch_size entries are queued. Subclasses
+    implement _process(batch). Queueing and stop() share one lock, so an
+    entry is either queued ahead of the stop sentinel or refused (and the
+    caller handles it on its own thread); none is left behind in the queue.
+    """
+    
+    thread_name = 'batch-worker'
+    stop_at_exit = False  # Drain the queue when the interpreter exits
+    
+    def __init__(self, max_batch_size: int, max_wait: float, max_queue: int):
+        self.logger = logging.getLogger(self.__class__.__module__)
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stopped = False
+    
+    def _enqueue(self, entry) -> bool:
+        """Queue entry for the worker, False once stopped; raises queue.Full when saturated"""
+        with self._lock:
+            if self._stopped:
+                return False
+            
+            # Started on first use (after any fork, never before)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.thread_name, daemon=True)
+                self._thread.start()
+                if self.stop_at_exit:
+                    atexit.register(self.stop)
+            
+            self._queue.put_nowait(entry)
+            return True
+    
+    def _collect(self) -> List:
+        """Block for one entry, then gather more until the batch or wait fills"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        
+        return batch
+    
+    def _run(self) -> None:
+        """Worker loop: one _process call per collected batch"""
+        while True:
+            batch = self._collect()
+            stop_requested = None in batch  # Sentinel queued by stop()
+            batch = [entry for entry in batch if entry is not None]
+            
+            if batch:
+                try:
+                    self._process(batch)
+                except Exception as e:
+                    self.logger.error(f"{self.thread_name} failed on a batch of {len(batch)}: {e}")
+            if stop_requested:
+                return
+    
+    def _process(self, batch: List) -> None:
+        """Handle one batch of entries"""
+        raise NotImplementedError
+    
+    def stop(self) -> None:
+        """Stop the worker once the queued entries are processed"""
+        with self._lock:
+            if self._stopped:
+                return
+            self._stopped = True
+            thread = self._thread
+            if thread is not None and thread.is_alive():
+                self._queue.put(None)
+        
+        if thread is not None and thread.is_alive():
+            thread.join()
@@ -0,0 +1,256 @@
+"""
+Maintenance commands for the Q&A system
+Run with `flask --app main <command>`
+"""
+
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List
+import click
+import numpy as np
+from sqlalchemy import desc, func, select
+from sqlalchemy.orm import joinedload
+from app import app, db
+from models import Category, ContentItem, Question
+from ann_index import IVFIndex, evaluate_recall
+from inference_backends import (BACKENDS, MIN_AGREEMENT, benchmark_backend, create_backend,
+                                embedding_agreement, set_num_threads)
+from lazy_imports import module_available
+from routes import analytics_manager, content_backfill, index_store, nlp_processor, _rebuild_lexical_index
+
+# Libraries kept off the startup import path (see lazy_imports.py)
+HEAVY_MODULES = ('torch', 'transformers', 'spacy', 'sklearn', 'scipy', 'pandas',
+                 'onnxruntime', 'wikipedia', 'bs4')
+
+@app.cli.command('compact-embeddings')
+def compact_embeddings():
+    """Drop cached embeddings that no longer belong to any content item"""
+    transformer_nlp = getattr(app, 'transformer_nlp', None)
+    if transformer_nlp is not None:
+        transformer_nlp.load_model()
+    if transformer_nlp is None or transformer_nlp.embedding_cache is None:
+        click.echo('Embedding cache is not enabled.')
+        return
+    
+    dropped = transformer_nlp.compact_embedding_cache(
+        [item.to_dict() for item in ContentItem.query.options(joinedload(ContentItem.category)).all()]
+    )
+    stats = transformer_nlp.embedding_cache.get_stats()
+    click.echo(f"Dropped {dropped} stale embeddings, {stats['entries']} remain.")
+
+@app.cli.command('bench-ann')
+@click.option('--queries', default=200, help='Number of query vectors to sample.')
+@click.option('--k', default=10, help='Neighbours compared for recall@k.')
+@click.option('--lists', default=0, help='IVF lists (0 picks about 4 * sqrt(rows)).')
+@click.option('--probe', default='1,4,8,16,32', help='Comma-separated n_probe values to try.')
+@click.option('--synthetic', default=0, help='Benchmark on this many random vectors instead of the corpus.')
+def bench_ann(queries, k, lists, probe, synthetic):
+    """Report recall@k and latency of the IVF index against the exact scan"""
+    rng = np.random.default_rng(0)
+    
+    if synthetic:
+        vectors = rng.normal(size=(synthetic, 384)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    else:
+        transformer_nlp = getattr(app, 'transformer_nlp', None)
+        if transformer_nlp is None or transformer_nlp.model is None:
+            click.echo('Transformer model is not available, use --synthetic.')
+            return
+        transformer_nlp.build_embedding_index(
+            [item.to_dict() for item in ContentItem.query.options(joinedload(ContentItem.category)).all()]
+        )
+        vectors = transformer_nlp.get_content_embeddings()
+        if vectors is None or not len(vectors):
+            click.echo('No content embeddings to benchmark, use --synthetic.')
+            return
+    
+    # Perturbed corpus rows stand in for real questions
+    query_vectors = vectors[rng.choice(len(vectors), min(queries, len(vectors)), replace=False)]
+    query_vectors = query_vectors + rng.normal(scale=0.05, size=query_vectors.shape).astype(np.float32)
+    query_vectors /= np.linalg.norm(query_vectors, axis=1, keepdims=True)
+    
+    index = IVFIndex(n_lists=lists or None)
+    index.build(vectors)
+    stats = index.get_stats()
+    click.echo(f"{len(vectors)} rows, {stats['n_lists']} lists, largest list {stats['largest_list']}")
+    
+    for n_probe in [int(value) for value in probe.split(',') if value.strip()]:
+        result = evaluate_recall(vectors, query_vectors, index, k=k, n_probe=n_probe)
+        click.echo(
+            f"n_probe={n_probe:<4} recall@{k}={result['recall_at_k']:.3f}  "
+            f"exact={result['exact_ms_per_query']:.2f}ms  ivf={result['index_ms_per_query']:.2f}ms"
+        )
+
+@app.cli.command('backfill-processed-content')
+@click.option('--chunk-size', default=0, help='Rows per commit (defaults to BACKFILL_CHUNK_SIZE).')
+def backfill_processed_content(chunk_size):
+    """Reprocess content whose processed text predates the current pipeline"""
+    if chunk_size:
+        content_backfill.chunk_size = chunk_size
+    
+    stale = content_backfill.count_stale()
+    click.echo(f"{stale} items need preprocessing with {nlp_processor.preprocessing_version}.")
+    if not stale:
+        return
+    
+    updated = content_backfill.run()
+    click.echo(f"Backfilled {updated} items.")
+    
+    if updated and index_store is not None:
+        # Running workers switch to the refitted index on their next request
+        _rebuild_lexical_index(updated)
+        click.echo(f"Published index snapshot v{index_store.current_version(refresh=True)}.")
+
+@app.cli.command('reconcile-analytics')
+@click.option('--days', default=30, help='Recompute this many most recent days.')
+def reconcile_analytics(days):
+    """Recompute daily analytics exactly from the questions table (run e.g. nightly)"""
+    reconciled = analytics_manager.reconcile(days=days)
+    click.echo(f"Reconciled analytics for {reconciled} of {days} days.")
+
+@app.cli.command('bench-inference')
+@click.option('--rows', default=512, help='Content rows to embed per backend.')
+@click.option('--batch-size', default=32, help='Rows per forward pass.')
+@click.option('--threads', default=0, help='Intra-op threads (0 keeps INFERENCE_THREADS).')
+@click.option('--backends', default=','.join(BACKENDS), help='Comma-separated backends to compare.')
+def bench_inference(rows, batch_size, threads, backends):
+    """Report rows per second and fp32 agreement for each inference backend"""
+    transformer_nlp = getattr(app, 'transformer_nlp', None)
+    if transformer_nlp is None or transformer_nlp.model is None:
+        click.echo('Transformer model is not available.')
+        return
+    
+    num_threads = threads or app.config['INFERENCE_THREADS']
+    set_num_threads(num_threads)
+    
+    texts = [f"{item.title} {item.content}" for item in ContentItem.query.limit(rows).all()]
+    if not texts:
+        click.echo('No content to benchmark.')
+        return
+    
+    model_name = transformer_nlp.model_name
+    reference = create_backend('fp32', model_name, transformer_nlp.tokenizer, transformer_nlp.model)
+    sample = texts[:64]
+    
+    for name in [value.strip() for value in backends.split(',') if value.strip()]:
+        try:
+            backend = create_backend(
+                name, model_name, transformer_nlp.tokenizer, transformer_nlp.model,
+                onnx_dir=app.config['ONNX_DIR'], num_threads=num_threads
+            )
+        except Exception as e:
+            click.echo(f"{name:<5} unavailable: {e}")
+            continue
+        
+        result = benchmark_backend(backend, texts, batch_size=batch_size)
+        agreement = embedding_agreement(reference, backend, sample)
+        status = 'ok' if agreement >= MIN_AGREEMENT else 'BELOW THRESHOLD'
+        click.echo(
+            f"{name:<5} {result['rows_per_second']:>8} rows/s  "
+            f"min cosine vs fp32 {agreement:.4f} ({status})"
+        )
+
+def _import_profile(statement: str) -> Dict:
+    """Run statement in a fresh interpreter; wall time and cumulative import time per package"""
+    env = dict(os.environ, WARMUP_ON_STARTUP='0')
+    start_time = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        cwd=app.root_path, env=env, capture_output=True, text=True
+    )
+    elapsed = time.perf_counter() - start_time
+    if result.returncode != 0:
+        raise click.ClickException(f"'{statement}' failed:\n{result.stderr[-2000:]}")
+    
+    # Lines look like "import time:   self [us] | cumulative |   package.module"
+    packages = {}
+    for line in result.stderr.splitlines():
+        fields = line.split('|')
+        if not line.startswith('import time:') or len(fields) != 3:
+            continue
+        try:
+            cumulative = int(fields[1])
+        except ValueError:
+            continue  # Header line
+        package = fields[2].strip().split('.')[0]
+        packages[package] = max(packages.get(package, 0), cumulative)
+    
+    return {'seconds': elapsed, 'packages': packages}
+
+@app.cli.command('bench-startup')
+@click.option('--runs', default=3, help='Fresh interpreters per measurement (the fastest is reported).')
+def bench_startup(runs):
+    """Compare creating the app with and without the heavy libraries loaded up front"""
+    runs = max(runs, 1)
+    available = [name for name in HEAVY_MODULES if module_available(name)]
+    eager_statement = '; '.join(['import main'] + [f"import {name}" for name in available])
+    
+    lazy = min((_import_profile('import main') for _ in range(runs)), key=lambda profile: profile['seconds'])
+    eager = min((_import_profile(eager_statement) for _ in range(runs)), key=lambda profile: profile['seconds'])
+    
+    loaded = [name for name in HEAVY_MODULES if name in lazy['packages']]
+    click.echo(f"import main:                   {lazy['seconds']:.2f}s "
+               f"(heavy libraries loaded: {', '.join(loaded) or 'none'})")
+    click.echo(f"import main + heavy libraries: {eager['seconds']:.2f}s (previous eager startup)")
+    for name in available:
+        click.echo(f"  {name:<12} {eager['packages'].get(name, 0) / 1e6:6.2f}s cumulative")
+
+def _analytics_queries() -> Dict:
+    """Representative statements for the hot analytics and admin paths"""
+    start_date = datetime.utcnow() - timedelta(days=30)
+    session_id = db.session.query(Question.session_id).limit(1).scalar() or ''
+    category_id = db.session.query(Category.id).limit(1).scalar() or 0
+    
+    return {
+        'daily counts (30 days)': select(func.date(Question.asked_at), func.count(Question.id))
+            .where(Question.asked_at >= start_date)
+            .group_by(func.date(Question.asked_at)),
+        'category distribution (30 days)': select(Category.name, func.count(Question.id))
+            .select_from(Question)
+            .join(ContentItem, ContentItem.id == Question.best_answer_id)
+            .join(Category, Category.id == ContentItem.category_id)
+            .where(Question.asked_at >= start_date)
+            .group_by(Category.id, Category.name),
+        'recent questions': select(Question.id, Question.question_text, Category.name)
+            .outerjoin(ContentItem, ContentItem.id == Question.best_answer_id)
+            .outerjoin(Category, Category.id == ContentItem.category_id)
+            .order_by(desc(Question.asked_at))
+            .limit(50),
+        'questions in a session': select(Question.id).where(Question.session_id == session_id),
+        'questions answered by an item': select(func.count(Question.id)).where(Question.best_answer_id == 1),
+        'content in a category': select(ContentItem.id).where(ContentItem.category_id == category_id),
+    }
+
+def _explain(statement) -> List[str]:
+    """Query plan lines for a statement on the current database"""
+    connection = db.session.connection()
+    compiled = statement.compile(dialect=connection.dialect)
+    params = compiled.params
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+    
+    prefix = 'EXPLAIN QUERY PLAN' if connection.dialect.name == 'sqlite' else 'EXPLAIN'
+    rows = connection.exec_driver_sql(f"{prefix} {compiled}", params).all()
+    if connection.dialect.name == 'sqlite':
+        return [row[-1] for row in rows]  # (id, parent, notused, detail)
+    return [' | '.join(str(value) for value in row) for row in rows]
+
+@app.cli.command('explain-analytics')
+@click.option('--runs', default=5, help='Executions per query (the fastest is reported).')
+def explain_analytics(runs):
+    """Show the query plan and runtime of the hot analytics and admin queries"""
+    click.echo(f"Questions: {Question.query.count()}, content items: {ContentItem.query.count()}")
+    
+    for name, statement in _analytics_queries().items():
+        timings = []
+        for _ in range(max(runs, 1)):
+            start_time = time.perf_counter()
+            db.session.execute(statement).all()
+            timings.append(time.perf_counter() - start_time)
+        
+        click.echo(f"\n{name}: {min(timings) * 1000:.2f}ms")
+        for line in _explain(statement):
+            click.echo(f"  {line}")
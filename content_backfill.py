@@ -0,0 +1,118 @@
+"""
+Backfill of ContentItem.processed_content
+Reprocesses rows stamped with an older preprocessing version in chunks
+"""
+
+import logging
+import threading
+from typing import Callable, List, Optional
+from sqlalchemy import or_, update
+from app import db
+from models import ContentItem
+
+class ProcessedContentBackfill:
+    """Brings processed_content up to the current preprocessing version"""
+    
+    def __init__(self, nlp_processor, chunk_size: int = 500):
+        self.logger = logging.getLogger(__name__)
+        self.nlp_processor = nlp_processor
+        self.chunk_size = chunk_size
+        self._thread = None
+        self._lock = threading.Lock()
+    
+    def _stale_query(self, version: str):
+        """Rows not yet processed with the given preprocessing version"""
+        return ContentItem.query.filter(or_(
+            ContentItem.processed_content.is_(None),
+            ContentItem.processed_version.is_(None),
+            ContentItem.processed_version != version
+        ))
+    
+    def count_stale(self) -> int:
+        """Number of rows whose processed_content is missing or outdated"""
+        return self._stale_query(self.nlp_processor.preprocessing_version).count()
+    
+    def run(self, on_chunk: Optional[Callable[[List[ContentItem]], None]] = None) -> int:
+        """Reprocess all stale rows chunk by chunk, return the number updated
+        
+        Each chunk is committed on its own, so an interrupted run resumes
+        where it stopped. A row is only written if its updated_at is still
+        the one read with the chunk; rows edited meanwhile keep the edit
+        (which stored its own processed text) and are skipped. on_chunk
+        receives the updated items after commit.
+        """
+        version = self.nlp_processor.preprocessing_version
+        updated = 0
+        last_id = 0
+        
+        while True:
+            chunk = (self._stale_query(version)
+                     .filter(ContentItem.id > last_id)
+                     .order_by(ContentItem.id)
+                     .limit(self.chunk_size)
+                     .all())
+            if not chunk:
+                break
+            
+            processed_texts = self.nlp_processor.preprocess_batch(
+                [f"{item.title} {item.content}" for item in chunk]
+            )
+            written = []
+            for item, processed_text in zip(chunk, processed_texts):
+                if self._write_if_unchanged(item, processed_text, version):
+                    written.append(item)
+            
+            last_id = chunk[-1].id
+            db.session.commit()
+            updated += len(written)
+            if len(written) < len(chunk):
+                self.logger.info(f"Skipped {len(chunk) - len(written)} items edited during the backfill")
+            self.logger.info(f"Backfilled processed content for {updated} items")
+            
+            if on_chunk and written:
+                on_chunk(written)
+        
+        return updated
+    
+    def _write_if_unchanged(self, item: ContentItem, processed_text: str, version: str) -> bool:
+        """Store processed_text unless the row changed since it was read"""
+        seen = item.updated_at
+        unchanged = ContentItem.updated_at.is_(None) if seen is None else ContentItem.updated_at == seen
+        result = db.session.execute(
+            update(ContentItem)
+            .where(ContentItem.id == item.id, unchanged)
+            # Setting updated_at keeps its onupdate from marking the row as edited
+            .values(processed_content=processed_text, processed_version=version, updated_at=seen)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+    
+    def start_background(self, app, on_chunk: Optional[Callable[[List[ContentItem]], None]] = None,
+                         on_complete: Optional[Callable[[int], None]] = None) -> bool:
+        """Run the backfill in a daemon thread unless one is already running
+        
+        on_complete receives the number of updated rows once a run changed any.
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            
+            def worker():
+                with app.app_context():
+                    try:
+                        updated = self.run(on_chunk)
+                        if updated and on_complete:
+                            on_complete(updated)
+                    except Exception as e:
+                        self.logger.error(f"Processed content backfill failed: {e}")
+                        db.session.rollback()
+                    finally:
+                        db.session.remove()
+            
+            self._thread = threading.Thread(target=worker, name='processed-content-backfill', daemon=True)
+            self._thread.start()
+            return True
+    
+    def is_running(self) -> bool:
+        """Whether a background backfill is in progress"""
+        return self._thread is not None and self._thread.is_alive()
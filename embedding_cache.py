@@ -0,0 +1,262 @@
+"""
+Persistent embedding cache shared between worker processes
+Stores embeddings in a memory-mapped .npy file keyed by content hash
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from file_lock import exclusive_lock
+
+class EmbeddingCache:
+    """Embedding cache keyed by (model_name, sha256 of the embedded text)
+    
+    Vectors live in one memory-mapped .npy file per model, so every worker
+    maps the same pages through the OS page cache. A JSON sidecar maps
+    content hashes to rows and an append-only journal records the rows
+    added since, one line per put_many; the sidecar is only rewritten when
+    the matrix file is replaced (growth or compaction). Writers hold a file
+    lock, readers replay journal lines tagged with their sidecar generation.
+    """
+    
+    MIN_CAPACITY = 1024
+    
+    def __init__(self, cache_dir: str, model_name: str):
+        self.logger = logging.getLogger(__name__)
+        self.cache_dir = cache_dir
+        self.model_name = model_name
+        
+        file_stem = re.sub(r'[^A-Za-z0-9_.-]', '_', model_name)
+        self.matrix_path = os.path.join(cache_dir, f"{file_stem}.npy")
+        self.index_path = os.path.join(cache_dir, f"{file_stem}.json")
+        self.journal_path = os.path.join(cache_dir, f"{file_stem}.journal")
+        self.lock_path = os.path.join(cache_dir, f"{file_stem}.lock")
+        
+        self._rows = {}  # content hash -> row in the matrix
+        self._size = 0
+        self._matrix = None
+        self._index_mtime = None
+        self._generation = 0  # Bumped whenever the sidecar is rewritten
+        self._journal_offset = 0  # Bytes of the journal already applied
+        self._lock = threading.RLock()
+        
+        self.hits = 0
+        self.misses = 0
+        
+        os.makedirs(cache_dir, exist_ok=True)
+    
+    @staticmethod
+    def content_key(text: str) -> str:
+        """Hash of the embedded text, used as the cache key within a model"""
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+    
+    def _file_lock(self):
+        """Serialize writers across processes"""
+        return exclusive_lock(self.lock_path, self._lock)
+    
+    def _refresh(self) -> None:
+        """Pick up rows other processes added, remapping the matrix if it was replaced"""
+        try:
+            mtime = os.stat(self.index_path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        
+        if mtime != self._index_mtime:
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as index_file:
+                    index = json.load(index_file)
+            except Exception as e:
+                self.logger.warning(f"Could not load embedding cache {self.index_path}: {e}")
+                return
+            
+            if index.get('model_name') != self.model_name:
+                self.logger.warning(f"Ignoring embedding cache written for {index.get('model_name')}")
+                return
+            
+            self._rows = index.get('rows', {})
+            self._size = index.get('size', 0)
+            self._generation = index.get('generation', 0)
+            self._matrix = None
+            self._journal_offset = 0
+            self._index_mtime = mtime
+        
+        self._replay_journal()
+        
+        if self._size and (self._matrix is None or len(self._matrix) < self._size):
+            try:
+                self._matrix = np.load(self.matrix_path, mmap_mode='r')
+            except Exception as e:
+                self.logger.warning(f"Could not map embedding cache {self.matrix_path}: {e}")
+                self._rows, self._size, self._matrix = {}, 0, None
+    
+    def _replay_journal(self) -> None:
+        """Apply complete journal lines written since the last refresh"""
+        try:
+            with open(self.journal_path, 'rb') as journal_file:
+                journal_file.seek(0, os.SEEK_END)
+                if journal_file.tell() < self._journal_offset:
+                    # Truncated ahead of a sidecar rewrite; reloaded once the sidecar changes
+                    self._journal_offset = 0
+                journal_file.seek(self._journal_offset)
+                data = journal_file.read()
+        except FileNotFoundError:
+            return
+        
+        complete = data.rfind(b'\n') + 1
+        for line in data[:complete].splitlines():
+            entry = json.loads(line)
+            if entry.get('generation') != self._generation:
+                continue
+            self._rows.update(entry['rows'])
+            self._size = max(self._size, entry['size'])
+        self._journal_offset += complete
+    
+    def _write_index(self) -> None:
+        """Atomically replace the sidecar with every row, starting a new journal generation"""
+        self._generation += 1
+        # Emptied first, so no reader pairs the new sidecar with old journal lines
+        open(self.journal_path, 'w').close()
+        self._journal_offset = 0
+        
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as index_file:
+            json.dump({
+                'model_name': self.model_name,
+                'generation': self._generation,
+                'size': self._size,
+                'rows': self._rows
+            }, index_file)
+        os.replace(tmp_path, self.index_path)
+        self._index_mtime = os.stat(self.index_path).st_mtime_ns
+    
+    def _append_journal(self, rows: Dict[str, int]) -> None:
+        """Record rows added to the current matrix file with one appended line"""
+        line = json.dumps({'generation': self._generation, 'size': self._size, 'rows': rows})
+        with open(self.journal_path, 'a', encoding='utf-8') as journal_file:
+            journal_file.write(line + '\n')
+        self._journal_offset = os.path.getsize(self.journal_path)
+    
+    def _write_matrix(self, vectors: np.ndarray, capacity: int) -> None:
+        """Atomically replace the matrix file with vectors padded to capacity"""
+        tmp_path = f"{self.matrix_path}.tmp"
+        matrix = np.lib.format.open_memmap(
+            tmp_path, mode='w+', dtype=np.float32, shape=(capacity, vectors.shape[1])
+        )
+        matrix[:len(vectors)] = vectors
+        matrix.flush()
+        del matrix
+        os.replace(tmp_path, self.matrix_path)
+    
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Look up cached vectors, None for each text not in the cache"""
+        with self._lock:
+            self._refresh()
+            results = []
+            for text in texts:
+                row = self._rows.get(self.content_key(text))
+                if row is None or self._matrix is None:
+                    results.append(None)
+                    self.misses += 1
+                else:
+                    results.append(np.array(self._matrix[row]))
+                    self.hits += 1
+            return results
+    
+    def put_many(self, texts: List[str], vectors: np.ndarray) -> None:
+        """Append vectors for texts that are not cached yet"""
+        if not texts:
+            return
+        
+        try:
+            with self._file_lock():
+                self._refresh()
+                
+                new_rows = {}
+                for text, vector in zip(texts, vectors):
+                    key = self.content_key(text)
+                    if key not in self._rows and key not in new_rows:
+                        new_rows[key] = vector
+                
+                if not new_rows:
+                    return
+                
+                new_vectors = np.asarray(list(new_rows.values()), dtype=np.float32)
+                required = self._size + len(new_vectors)
+                capacity = len(self._matrix) if self._matrix is not None else 0
+                replaced = False
+                
+                if self._matrix is not None and self._matrix.shape[1] != new_vectors.shape[1]:
+                    self.logger.warning("Embedding dimension changed, discarding cached vectors")
+                    self._rows, self._size, self._matrix, capacity = {}, 0, None, 0
+                    required = len(new_vectors)
+                
+                if required > capacity:
+                    # Grow geometrically so appends stay amortised O(1)
+                    capacity = max(self.MIN_CAPACITY, capacity * 2, required)
+                    existing = (np.asarray(self._matrix[:self._size]) if self._matrix is not None
+                                else np.zeros((0, new_vectors.shape[1]), dtype=np.float32))
+                    self._write_matrix(existing, capacity)
+                    replaced = True
+                
+                matrix = np.load(self.matrix_path, mmap_mode='r+')
+                matrix[self._size:required] = new_vectors
+                matrix.flush()
+                del matrix
+                
+                added = {key: self._size + offset for offset, key in enumerate(new_rows)}
+                self._rows.update(added)
+                self._size = required
+                if replaced:
+                    self._write_index()
+                    self._matrix = np.load(self.matrix_path, mmap_mode='r')
+                else:
+                    # Rows landed in spare capacity, which every mapping already sees
+                    self._append_journal(added)
+        
+        except Exception as e:
+            self.logger.warning(f"Could not write embedding cache {self.matrix_path}: {e}")
+    
+    def compact(self, live_texts: Iterable[str]) -> int:
+        """Rewrite the cache keeping only rows for live_texts, return rows dropped"""
+        live_keys = {self.content_key(text) for text in live_texts}
+        
+        with self._file_lock():
+            self._refresh()
+            if self._matrix is None:
+                return 0
+            
+            kept = [(key, row) for key, row in self._rows.items() if key in live_keys]
+            dropped = len(self._rows) - len(kept)
+            if not dropped:
+                return 0
+            
+            vectors = np.asarray(self._matrix[[row for _, row in kept]], dtype=np.float32)
+            vectors = vectors.reshape(len(kept), self._matrix.shape[1])
+            self._write_matrix(vectors, max(self.MIN_CAPACITY, len(kept)))
+            
+            self._rows = {key: row for row, (key, _) in enumerate(kept)}
+            self._size = len(kept)
+            self._write_index()
+            self._matrix = np.load(self.matrix_path, mmap_mode='r')
+        
+        self.logger.info(f"Compacted embedding cache {self.matrix_path}: dropped {dropped} rows")
+        return dropped
+    
+    def get_stats(self) -> Dict:
+        """Get cache statistics"""
+        with self._lock:
+            self._refresh()
+            return {
+                'model_name': self.model_name,
+                'entries': self._size,
+                'capacity': len(self._matrix) if self._matrix is not None else 0,
+                'hits': self.hits,
+                'misses': self.misses
+            }
@@ -4,44 +4,53 @@ Connects to external sources like Wikipedia and web APIs for enhanced answers
 """
 
 import logging
-import requests
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from typing import Dict, List, Optional, Tuple
 import json
 import re
 from urllib.parse import quote_plus
 from datetime import datetime, timedelta
 
-try:
-    import wikipedia
-    WIKIPEDIA_AVAILABLE = True
-except ImportError:
-    WIKIPEDIA_AVAILABLE = False
+from lazy_imports import lazy_import, module_available
 
-try:
-    from bs4 import BeautifulSoup
-    BS4_AVAILABLE = True
-except ImportError:
-    BS4_AVAILABLE = False
+# Imported on the first external search rather than at startup
+requests = lazy_import('requests')
+bs4 = lazy_import('bs4')
+BS4_AVAILABLE = module_available('bs4')
 
 class ExternalKnowledgeConnector:
     """Connector for external knowledge sources"""
     
-    def __init__(self):
+    WIKIPEDIA_API_URL = "https://en.wikipedia.org/w/api.php"
+    STACKOVERFLOW_API_URL = "https://api.stackexchange.com/2.3/search/advanced"
+    GITHUB_API_URL = "https://api.github.com/search/code"
+    USER_AGENT = "QASystem/1.0 (external knowledge search)"
+    
+    def __init__(self, deadline_seconds: float = 3.0, max_workers: int = 6, request_timeout: float = 5.0):
         self.logger = logging.getLogger(__name__)
         self.cache = {}
         self.cache_duration = timedelta(hours=24)  # Cache for 24 hours
         
-        # Configure Wikipedia
-        if WIKIPEDIA_AVAILABLE:
-            wikipedia.set_lang("en")
-            wikipedia.set_rate_limiting(True)
+        # Sources are queried in parallel; whatever misses the per-request
+        # deadline is dropped, and each HTTP call times out by the deadline
+        self.deadline_seconds = deadline_seconds
+        self.request_timeout = request_timeout
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='external-knowledge')
     
-    def search_wikipedia(self, query: str, max_results: int = 3) -> List[Dict]:
-        """Search Wikipedia for relevant articles"""
-        if not WIKIPEDIA_AVAILABLE:
-            self.logger.warning("Wikipedia not available")
-            return []
+    def _request_timeout(self, deadline: Optional[float]) -> float:
+        """Timeout for one HTTP request, cut short so it ends by the search deadline"""
+        if deadline is None:
+            return self.request_timeout
+        return min(self.request_timeout, deadline - time.monotonic())
+    
+    def search_wikipedia(self, query: str, max_results: int = 3, deadline: Optional[float] = None) -> List[Dict]:
+        """Search Wikipedia for relevant articles
         
+        One MediaWiki API request returns the matching pages with their
+        intro extracts, where the wikipedia package took no timeout and
+        fetched every page separately.
+        """
         try:
             # Check cache first
             cache_key = f"wiki_{query}"
@@ -50,43 +59,43 @@ class ExternalKnowledgeConnector:
                 if datetime.now() - cached_time < self.cache_duration:
                     return cached_result
             
-            # Search Wikipedia
-            search_results = wikipedia.search(query, results=max_results)
-            articles = []
+            timeout = self._request_timeout(deadline)
+            if timeout <= 0:
+                return []
             
-            for title in search_results:
-                try:
-                    page = wikipedia.page(title)
-                    summary = wikipedia.summary(title, sentences=3)
-                    
-                    articles.append({
-                        'title': page.title,
-                        'summary': summary,
-                        'url': page.url,
-                        'source': 'Wikipedia',
-                        'content': summary,
-                        'category': 'External Knowledge'
-                    })
-                except wikipedia.exceptions.DisambiguationError as e:
-                    # Take the first option from disambiguation
-                    try:
-                        page = wikipedia.page(e.options[0])
-                        summary = wikipedia.summary(e.options[0], sentences=3)
-                        articles.append({
-                            'title': page.title,
-                            'summary': summary,
-                            'url': page.url,
-                            'source': 'Wikipedia',
-                            'content': summary,
-                            'category': 'External Knowledge'
-                        })
-                    except:
-                        continue
-                except wikipedia.exceptions.PageError:
-                    continue
-                except Exception as e:
-                    self.logger.warning(f"Error fetching Wikipedia page {title}: {e}")
+            params = {
+                'action': 'query',
+                'format': 'json',
+                'generator': 'search',
+                'gsrsearch': query,
+                'gsrlimit': max_results,
+                'prop': 'extracts|info|pageprops',
+                'exintro': 1,
+                'explaintext': 1,
+                'exsentences': 3,
+                'exlimit': max_results,
+                'inprop': 'url',
+                'ppprop': 'disambiguation'
+            }
+            response = requests.get(self.WIKIPEDIA_API_URL, params=params, timeout=timeout,
+                                    headers={'User-Agent': self.USER_AGENT})
+            response.raise_for_status()
+            
+            pages = response.json().get('query', {}).get('pages', {}).values()
+            articles = []
+            for page in sorted(pages, key=lambda page: page.get('index', 0)):
+                # Disambiguation pages only list other articles
+                if 'disambiguation' in page.get('pageprops', {}) or not page.get('extract'):
                     continue
+                
+                articles.append({
+                    'title': page['title'],
+                    'summary': page['extract'],
+                    'url': page.get('fullurl', ''),
+                    'source': 'Wikipedia',
+                    'content': page['extract'],
+                    'category': 'External Knowledge'
+                })
             
             # Cache the results
             self.cache[cache_key] = (datetime.now(), articles)
@@ -132,10 +141,10 @@ class ExternalKnowledgeConnector:
         
         return results
     
-    def _search_stackoverflow(self, query: str) -> List[Dict]:
+    def _search_stackoverflow(self, query: str, deadline: Optional[float] = None) -> List[Dict]:
         """Search Stack Overflow for programming questions"""
         try:
-            url = "https://api.stackexchange.com/2.3/search/advanced"
+            url = self.STACKOVERFLOW_API_URL
             params = {
                 'order': 'desc',
                 'sort': 'relevance',
@@ -145,7 +154,11 @@ class ExternalKnowledgeConnector:
                 'filter': 'withbody'
             }
             
-            response = requests.get(url, params=params, timeout=10)
+            timeout = self._request_timeout(deadline)
+            if timeout <= 0:
+                return []
+            
+            response = requests.get(url, params=params, timeout=timeout)
             if response.status_code == 200:
                 data = response.json()
                 results = []
@@ -171,10 +184,10 @@ class ExternalKnowledgeConnector:
         
         return []
     
-    def _search_github_docs(self, query: str) -> List[Dict]:
+    def _search_github_docs(self, query: str, deadline: Optional[float] = None) -> List[Dict]:
         """Search GitHub for documentation"""
         try:
-            url = "https://api.github.com/search/code"
+            url = self.GITHUB_API_URL
             params = {
                 'q': f'{query} extension:md',
                 'sort': 'indexed',
@@ -182,7 +195,11 @@ class ExternalKnowledgeConnector:
                 'per_page': 3
             }
             
-            response = requests.get(url, params=params, timeout=10)
+            timeout = self._request_timeout(deadline)
+            if timeout <= 0:
+                return []
+            
+            response = requests.get(url, params=params, timeout=timeout)
             if response.status_code == 200:
                 data = response.json()
                 results = []
@@ -214,7 +231,7 @@ class ExternalKnowledgeConnector:
             return text.strip()
         
         try:
-            soup = BeautifulSoup(html_content, 'html.parser')
+            soup = bs4.BeautifulSoup(html_content, 'html.parser')
             # Remove script and style elements
             for script in soup(["script", "style"]):
                 script.decompose()
@@ -231,24 +248,61 @@ class ExternalKnowledgeConnector:
             text = re.sub(r'<[^>]+>', '', html_content)
             return text.strip()
     
-    def enhance_answer_with_external_knowledge(self, question: str, existing_answers: List[Dict]) -> List[Dict]:
-        """Enhance existing answers with external knowledge"""
-        enhanced_answers = existing_answers.copy()
+    def start_external_search(self, question: str) -> Dict:
+        """Fan the external sources out on the executor and return at once
         
-        # Search external sources
-        external_sources = []
+        Pass the result to enhance_answer_with_external_knowledge once
+        internal retrieval is done, so both run at the same time.
+        """
+        deadline = time.monotonic() + self.deadline_seconds
+        return {
+            'deadline': deadline,
+            'futures': [
+                self.executor.submit(self.search_wikipedia, question, 2, deadline),
+                self.executor.submit(self._search_stackoverflow, question, deadline),
+                self.executor.submit(self._search_github_docs, question, deadline)
+            ]
+        }
+    
+    def collect_external_results(self, pending: Dict) -> List[Dict]:
+        """Gather results of sources that answered before the deadline"""
+        futures = pending['futures']
+        done, not_done = wait(futures, timeout=max(0.0, pending['deadline'] - time.monotonic()))
         
-        # Wikipedia search
-        wiki_results = self.search_wikipedia(question, max_results=2)
-        external_sources.extend(wiki_results)
+        if not_done:
+            self.logger.info(f"Dropping {len(not_done)} external sources that missed the deadline")
+            for future in not_done:
+                future.cancel()
         
-        # Web content search
-        web_results = self.search_web_content(question, max_results=2)
-        external_sources.extend(web_results)
+        results = []
+        for future in futures:
+            if future in done:
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    self.logger.warning(f"External source failed: {e}")
+                    results.append([])
+            else:
+                results.append([])
+        
+        wiki_results, stackoverflow_results, github_results = results
+        # Web content keeps its previous limit of two results
+        return wiki_results + (stackoverflow_results + github_results)[:2]
+    
+    def enhance_answer_with_external_knowledge(self, question: str, existing_answers: List[Dict],
+                                               pending: Optional[Dict] = None) -> List[Dict]:
+        """Enhance existing answers with external knowledge"""
+        enhanced_answers = existing_answers.copy()
+        
+        # Search external sources, unless a search was already started
+        if pending is None:
+            pending = self.start_external_search(question)
+        external_sources = self.collect_external_results(pending)
         
         # Add external sources as additional answers
         for source in external_sources:
             # Mark as external source
+            source = source.copy()
             source['is_external'] = True
             source['confidence'] = 0.7  # Default confidence for external sources
             enhanced_answers.append(source)
@@ -257,21 +311,26 @@ class ExternalKnowledgeConnector:
     
     def get_related_topics(self, topic: str) -> List[str]:
         """Get related topics for better search suggestions"""
-        if not WIKIPEDIA_AVAILABLE:
-            return []
-        
         try:
-            # Get Wikipedia page and extract links
-            page = wikipedia.page(topic)
+            # Links from the topic's Wikipedia page
+            params = {
+                'action': 'query',
+                'format': 'json',
+                'titles': topic,
+                'redirects': 1,
+                'prop': 'links',
+                'plnamespace': 0,
+                'pllimit': 10  # First 10 links
+            }
+            response = requests.get(self.WIKIPEDIA_API_URL, params=params, timeout=self.request_timeout,
+                                    headers={'User-Agent': self.USER_AGENT})
+            response.raise_for_status()
             
-            # Get categories and related pages
             related = []
-            
-            # Extract some links from the content
-            links = page.links[:10]  # First 10 links
-            for link in links:
-                if len(link.split()) <= 3:  # Short, likely relevant topics
-                    related.append(link)
+            for page in response.json().get('query', {}).get('pages', {}).values():
+                for link in page.get('links', []):
+                    if len(link['title'].split()) <= 3:  # Short, likely relevant topics
+                        related.append(link['title'])
             
             return related[:5]  # Return top 5
             
@@ -0,0 +1,28 @@
+"""
+Cross-process file locking
+Serializes writers of files shared by the worker processes on one host
+"""
+
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+@contextmanager
+def exclusive_lock(lock_path: str, thread_lock: threading.RLock):
+    """Hold thread_lock and an flock on lock_path (threads only where flock is missing)"""
+    with thread_lock:
+        if not FCNTL_AVAILABLE:
+            yield
+            return
+        
+        with open(lock_path, 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
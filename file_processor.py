@@ -3,20 +3,13 @@ import csv
 import logging
 from typing import List, Dict, Tuple
 from werkzeug.utils import secure_filename
-import pandas as pd
+from lazy_imports import lazy_import, module_available
 
-# Import document processing libraries with fallbacks
-try:
-    from docx import Document as DocxDocument
-    DOCX_AVAILABLE = True
-except ImportError:
-    DOCX_AVAILABLE = False
-
-try:
-    import win32com.client
-    DOC_AVAILABLE = True
-except ImportError:
-    DOC_AVAILABLE = False
+# pandas and the document libraries are imported on the first upload
+pd = lazy_import('pandas')
+docx = lazy_import('docx')
+DOCX_AVAILABLE = module_available('docx')
+DOC_AVAILABLE = module_available('win32com')
 
 class FileProcessor:
     """File processor for handling bulk content import"""
@@ -182,7 +175,7 @@ class FileProcessor:
             return [], "python-docx library not available. Install it to process DOCX files."
         
         try:
-            doc = DocxDocument(file_path)
+            doc = docx.Document(file_path)
             
             items = []
             current_title = ""
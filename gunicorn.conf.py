@@ -0,0 +1,14 @@
+"""
+gunicorn settings hooks, read from the working directory by default
+"""
+
+def post_worker_init(worker):
+    """Warm up each worker once it has loaded the app, after the fork
+    
+    Starting at import instead would also warm up every flask CLI command,
+    and with PRELOAD_MODELS the master must not start threads before it forks.
+    """
+    app = worker.wsgi
+    warmup = getattr(app, 'warmup', None)
+    if warmup is not None and app.config['WARMUP_ON_STARTUP']:
+        warmup.start_background(app)
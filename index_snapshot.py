@@ -0,0 +1,356 @@
+"""
+Versioned on-disk snapshots of the content indexes
+Workers memory-map the arrays read-only, so the pages are shared through the OS page cache
+"""
+
+import json
+import logging
+import os
+import pickle
+import shutil
+import threading
+import time
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from file_lock import exclusive_lock
+from lazy_imports import lazy_import
+
+# Only needed once sparse rows are stacked
+sp = lazy_import('scipy.sparse')
+
+class RecordTable:
+    """Read-only sequence of JSON records backed by a memory-mapped blob
+    
+    Records are decoded on access, so a worker only materialises the rows it
+    actually returns instead of holding the whole corpus as Python objects.
+    """
+    
+    def __init__(self, path: str):
+        self._offsets = np.load(f"{path}.offsets.npy", mmap_mode='r')
+        size = int(self._offsets[-1])
+        self._blob = np.memmap(f"{path}.bin", dtype=np.uint8, mode='r') if size else np.zeros(0, np.uint8)
+    
+    @staticmethod
+    def write(path: str, records: List) -> None:
+        """Write records as one UTF-8 blob plus an offsets array"""
+        offsets = np.zeros(len(records) + 1, dtype=np.int64)
+        with open(f"{path}.bin", 'wb') as blob:
+            for i, record in enumerate(records):
+                encoded = json.dumps(record, ensure_ascii=False).encode('utf-8')
+                blob.write(encoded)
+                offsets[i + 1] = offsets[i] + len(encoded)
+        np.save(f"{path}.offsets.npy", offsets)
+    
+    def __len__(self) -> int:
+        """Number of records"""
+        return len(self._offsets) - 1
+    
+    def __getitem__(self, row: int):
+        """Decode one record"""
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError(row)
+        return json.loads(self._blob[self._offsets[row]:self._offsets[row + 1]].tobytes().decode('utf-8'))
+    
+    def __iter__(self) -> Iterator:
+        for row in range(len(self)):
+            yield self[row]
+
+class OverlayTable:
+    """Writable view of a table that keeps its changes next to it
+    
+    Replaced and appended records are held in memory; every other row is
+    read from the base, which is never modified. Deltas replayed onto a
+    RecordTable thus cost the changed rows only, and copy() duplicates
+    the changes, not the table.
+    """
+    
+    def __init__(self, base, replaced: Optional[Dict] = None, appended: Optional[List] = None):
+        self._base = base
+        self._base_size = len(base)
+        self._replaced = dict(replaced or {})
+        self._appended = list(appended or [])
+    
+    def __len__(self) -> int:
+        """Number of records, appended ones included"""
+        return self._base_size + len(self._appended)
+    
+    def _row(self, row: int) -> int:
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError(row)
+        return row
+    
+    def __getitem__(self, row: int):
+        """Record at row, from the changes when it was replaced or appended"""
+        row = self._row(row)
+        if row >= self._base_size:
+            return self._appended[row - self._base_size]
+        if row in self._replaced:
+            return self._replaced[row]
+        return self._base[row]
+    
+    def __setitem__(self, row: int, record) -> None:
+        """Replace the record at row"""
+        row = self._row(row)
+        if row >= self._base_size:
+            self._appended[row - self._base_size] = record
+        else:
+            self._replaced[row] = record
+    
+    def __iter__(self) -> Iterator:
+        for row in range(len(self)):
+            yield self[row]
+    
+    def append(self, record) -> None:
+        """Add a record after the last row"""
+        self._appended.append(record)
+    
+    def copy(self) -> 'OverlayTable':
+        """Independent view over the same base"""
+        return OverlayTable(self._base, self._replaced, self._appended)
+
+class StackedRows:
+    """Rows of a base matrix followed by the rows appended since
+    
+    append() returns a new StackedRows that copies only the appended rows,
+    so a memory-mapped base stays shared between workers. Row selection,
+    len() and products with a vector work across both blocks; stacked()
+    joins them into one array (or CSR matrix) for export.
+    """
+    
+    def __init__(self, base, appended=None):
+        self.base = base
+        self.appended = appended
+    
+    def __len__(self) -> int:
+        """Number of rows, appended ones included"""
+        return self.base.shape[0] + (0 if self.appended is None else self.appended.shape[0])
+    
+    @property
+    def shape(self):
+        return (len(self),) + tuple(self.base.shape[1:])
+    
+    def append(self, rows) -> 'StackedRows':
+        """Rows added after the current ones, sharing the base"""
+        if self.appended is not None:
+            rows = _stack([self.appended, rows])
+        return StackedRows(self.base, rows)
+    
+    def stacked(self):
+        """All rows as one array, a copy once rows were appended"""
+        if self.appended is None:
+            return self.base
+        return _stack([self.base, self.appended])
+    
+    def __matmul__(self, other):
+        """Product of every row with other"""
+        if self.appended is None:
+            return self.base @ other
+        return _stack([self.base @ other, self.appended @ other])
+    
+    def __getitem__(self, rows):
+        """Selected rows (a slice, boolean mask or row numbers) as one array"""
+        if isinstance(rows, slice):
+            rows = np.arange(*rows.indices(len(self)))
+        rows = np.asarray(rows)
+        if rows.dtype == bool:
+            rows = np.flatnonzero(rows)
+        if self.appended is None:
+            return self.base[rows]
+        
+        base_size = self.base.shape[0]
+        in_base = rows < base_size
+        selected = _stack([self.base[rows[in_base]], self.appended[rows[~in_base] - base_size]])
+        # Restore the requested order: base rows were taken first
+        order = np.argsort(~in_base, kind='stable')
+        return selected[np.argsort(order)]
+
+def _stack(blocks):
+    """Stack arrays or sparse matrices row-wise"""
+    if isinstance(blocks[0], np.ndarray):
+        return np.concatenate(blocks)
+    return sp.vstack(blocks, format='csr')
+
+class IndexSnapshotStore:
+    """Publishes and loads versioned index snapshots in snapshot_dir
+    
+    Each snapshot is an immutable directory v<version> holding one
+    subdirectory per part (e.g. 'lexical', 'dense'). A part is a dict of
+    'arrays' (saved as .npy and memory-mapped on load), 'tables' (lists of
+    JSON records, loaded as RecordTable), 'objects' (pickled) and 'meta'.
+    
+    Small changes are published as delta versions instead: a delta.json
+    holding the operations applied on top of the previous version, so an
+    edit does not rewrite the corpus. After max_deltas deltas the writer
+    publishes a full snapshot again. The CURRENT file names the live
+    version and is swapped atomically.
+    """
+    
+    KEEP_VERSIONS = 3
+    DELTA_FILE = 'delta.json'
+    
+    def __init__(self, snapshot_dir: str, check_interval: float = 1.0, max_deltas: int = 16):
+        self.logger = logging.getLogger(__name__)
+        self.snapshot_dir = snapshot_dir
+        self.check_interval = check_interval
+        self.max_deltas = max_deltas
+        self.current_path = os.path.join(snapshot_dir, 'CURRENT')
+        self.lock_path = os.path.join(snapshot_dir, '.lock')
+        self._lock = threading.RLock()
+        self._checked_at = 0.0
+        self._current = None
+        os.makedirs(snapshot_dir, exist_ok=True)
+    
+    def exclusive(self):
+        """Serialize index writers across threads and worker processes"""
+        return exclusive_lock(self.lock_path, self._lock)
+    
+    def _version_dir(self, version: int) -> str:
+        """Directory holding a snapshot version"""
+        return os.path.join(self.snapshot_dir, f"v{version:08d}")
+    
+    def _read_current(self) -> Optional[int]:
+        """Version named by the CURRENT file, None before the first publish"""
+        try:
+            with open(self.current_path, 'r') as current_file:
+                return int(current_file.read().strip())
+        except (FileNotFoundError, ValueError):
+            return None
+    
+    def current_version(self, refresh: bool = False) -> Optional[int]:
+        """Live snapshot version, re-read at most every check_interval seconds"""
+        now = time.monotonic()
+        if refresh or now - self._checked_at >= self.check_interval:
+            self._current = self._read_current()
+            self._checked_at = now
+        return self._current
+    
+    def publish(self, parts: Dict[str, Dict]) -> int:
+        """Write parts as a new snapshot and make it current; call under exclusive()"""
+        version = (self._read_current() or 0) + 1
+        version_dir = self._version_dir(version)
+        tmp_dir = f"{version_dir}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        
+        for part_name, part in parts.items():
+            part_dir = os.path.join(tmp_dir, part_name)
+            os.makedirs(part_dir)
+            for name, array in part.get('arrays', {}).items():
+                np.save(os.path.join(part_dir, f"{name}.npy"), np.ascontiguousarray(array))
+            for name, records in part.get('tables', {}).items():
+                RecordTable.write(os.path.join(part_dir, name), records)
+            for name, value in part.get('objects', {}).items():
+                with open(os.path.join(part_dir, f"{name}.pkl"), 'wb') as object_file:
+                    pickle.dump(value, object_file)
+            with open(os.path.join(part_dir, 'meta.json'), 'w', encoding='utf-8') as meta_file:
+                json.dump({
+                    'arrays': list(part.get('arrays', {})),
+                    'tables': list(part.get('tables', {})),
+                    'objects': list(part.get('objects', {})),
+                    'meta': part.get('meta', {})
+                }, meta_file)
+        
+        self._make_current(version, tmp_dir)
+        self.logger.info(f"Published index snapshot v{version}")
+        self._cleanup(version)
+        return version
+    
+    def can_publish_delta(self) -> bool:
+        """Whether a delta may be chained onto the current version"""
+        current = self._read_current()
+        return current is not None and len(self.delta_chain(current)) <= self.max_deltas
+    
+    def publish_delta(self, operations: List[Dict]) -> int:
+        """Publish JSON operations on top of the current version; call under exclusive()"""
+        previous = self._read_current()
+        if previous is None:
+            raise ValueError("A delta needs a published snapshot to apply to")
+        
+        version = previous + 1
+        tmp_dir = f"{self._version_dir(version)}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        with open(os.path.join(tmp_dir, self.DELTA_FILE), 'w', encoding='utf-8') as delta_file:
+            json.dump({'previous': previous, 'operations': operations}, delta_file, ensure_ascii=False)
+        
+        self._make_current(version, tmp_dir)
+        self.logger.info(f"Published index delta v{version} ({len(operations)} operations)")
+        return version
+    
+    def _make_current(self, version: int, tmp_dir: str) -> None:
+        """Move a written version into place and point CURRENT at it"""
+        os.replace(tmp_dir, self._version_dir(version))
+        
+        tmp_current = f"{self.current_path}.tmp"
+        with open(tmp_current, 'w') as current_file:
+            current_file.write(str(version))
+        os.replace(tmp_current, self.current_path)
+        
+        self._current = version
+        self._checked_at = time.monotonic()
+    
+    def _read_delta(self, version: int) -> Optional[Dict]:
+        """Contents of a delta version, None for a full snapshot"""
+        try:
+            with open(os.path.join(self._version_dir(version), self.DELTA_FILE), 'r', encoding='utf-8') as delta_file:
+                return json.load(delta_file)
+        except FileNotFoundError:
+            return None
+    
+    def delta_chain(self, version: int) -> List[int]:
+        """Versions to load for version: its full snapshot, then each delta in order"""
+        chain = [version]
+        delta = self._read_delta(version)
+        while delta is not None:
+            chain.append(delta['previous'])
+            delta = self._read_delta(delta['previous'])
+        return chain[::-1]
+    
+    def load_delta(self, version: int) -> List[Dict]:
+        """Operations recorded by a delta version"""
+        delta = self._read_delta(version)
+        if delta is None:
+            raise ValueError(f"v{version} is not a delta")
+        return delta['operations']
+    
+    def load(self, version: int) -> Dict[str, Dict]:
+        """Open every part of a full snapshot with its arrays memory-mapped read-only"""
+        version_dir = self._version_dir(version)
+        parts = {}
+        
+        for part_name in os.listdir(version_dir):
+            part_dir = os.path.join(version_dir, part_name)
+            with open(os.path.join(part_dir, 'meta.json'), 'r', encoding='utf-8') as meta_file:
+                layout = json.load(meta_file)
+            
+            objects = {}
+            for name in layout['objects']:
+                with open(os.path.join(part_dir, f"{name}.pkl"), 'rb') as object_file:
+                    objects[name] = pickle.load(object_file)
+            
+            parts[part_name] = {
+                'arrays': {name: np.load(os.path.join(part_dir, f"{name}.npy"), mmap_mode='r')
+                           for name in layout['arrays']},
+                'tables': {name: RecordTable(os.path.join(part_dir, name)) for name in layout['tables']},
+                'objects': objects,
+                'meta': layout['meta']
+            }
+        
+        return parts
+    
+    def _cleanup(self, current: int) -> None:
+        """Delete old versions; workers still mapping them keep their open pages"""
+        for entry in os.listdir(self.snapshot_dir):
+            if not entry.startswith('v') or entry.endswith('.tmp'):
+                continue
+            try:
+                version = int(entry[1:])
+            except ValueError:
+                continue
+            if version <= current - self.KEEP_VERSIONS:
+                shutil.rmtree(os.path.join(self.snapshot_dir, entry), ignore_errors=True)
@@ -0,0 +1,179 @@
+"""
+CPU inference backends for transformer sentence embeddings
+fp32 torch, dynamically int8-quantized torch, or an exported ONNX graph
+"""
+
+import os
+import re
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from model_registry import model_registry
+
+from lazy_imports import lazy_import, module_available
+
+torch = lazy_import('torch')
+TORCH_AVAILABLE = module_available('torch')
+
+onnxruntime = lazy_import('onnxruntime')
+ONNXRUNTIME_AVAILABLE = module_available('onnxruntime')
+
+BACKENDS = ('fp32', 'int8', 'onnx')
+
+# Minimum cosine between a backend's embeddings and the fp32 ones for it to be used
+MIN_AGREEMENT = 0.98
+
+# Sentences used to check a backend against fp32 before it serves traffic
+AGREEMENT_SAMPLES = [
+    "How do I reset my password?",
+    "What are the office opening hours on weekends?",
+    "Python lists can be sorted in place with the sort method.",
+    "The quarterly report is due at the end of the month.",
+    "Which documents are needed to open a new account?",
+    "Transformers encode text into dense vectors for semantic search.",
+]
+
+def set_num_threads(num_threads: Optional[int]) -> None:
+    """Set intra-op threads for torch (ONNX sessions take their own setting)"""
+    if num_threads and TORCH_AVAILABLE:
+        torch.set_num_threads(num_threads)
+
+def _mean_pool(last_hidden_state: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+    """Mean of token states over real tokens only"""
+    mask = attention_mask[..., None].astype(np.float32)
+    summed = (last_hidden_state * mask).sum(axis=1)
+    return summed / np.clip(mask.sum(axis=1), 1e-9, None)
+
+class TorchBackend:
+    """Runs the transformer model with torch; name is 'fp32' or 'int8'"""
+    
+    def __init__(self, tokenizer, model, name: str = 'fp32'):
+        self.tokenizer = tokenizer
+        self.model = model
+        self.name = name
+        self.dimension = model.config.hidden_size
+    
+    def encode(self, texts: List[str], max_length: int = 512) -> np.ndarray:
+        """Mean-pooled embeddings, one float32 row per text"""
+        inputs = self.tokenizer(
+            texts,
+            return_tensors='pt',
+            max_length=max_length,
+            truncation=True,
+            padding=True
+        )
+        
+        with torch.no_grad():
+            outputs = self.model(**inputs)
+            # Mean pooling over real tokens only
+            mask = inputs['attention_mask'].unsqueeze(-1).to(outputs.last_hidden_state.dtype)
+            summed = (outputs.last_hidden_state * mask).sum(dim=1)
+            counts = mask.sum(dim=1).clamp(min=1e-9)
+            return (summed / counts).numpy().astype(np.float32)
+
+class OnnxBackend:
+    """Runs an ONNX export of the transformer model with onnxruntime"""
+    
+    def __init__(self, tokenizer, session, dimension: int):
+        self.tokenizer = tokenizer
+        self.session = session
+        self.name = 'onnx'
+        self.dimension = dimension
+        self._input_names = {model_input.name for model_input in session.get_inputs()}
+    
+    def encode(self, texts: List[str], max_length: int = 512) -> np.ndarray:
+        """Mean-pooled embeddings, one float32 row per text"""
+        inputs = self.tokenizer(
+            texts,
+            return_tensors='np',
+            max_length=max_length,
+            truncation=True,
+            padding=True
+        )
+        feed = {name: np.asarray(value, dtype=np.int64)
+                for name, value in inputs.items() if name in self._input_names}
+        last_hidden_state = self.session.run(None, feed)[0]
+        return _mean_pool(last_hidden_state, inputs['attention_mask']).astype(np.float32)
+
+def _quantized_model(model_name: str, model):
+    """Shared dynamically int8-quantized copy of the model's Linear layers"""
+    def load():
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    
+    return model_registry.get(f"transformer:{model_name}:int8", load)
+
+def _export_onnx(model, tokenizer, path: str) -> None:
+    """Export the model with dynamic batch and sequence axes"""
+    sample = tokenizer(["export sample"], return_tensors='pt')
+    input_names = [name for name in ('input_ids', 'attention_mask', 'token_type_ids') if name in sample]
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names}
+    dynamic_axes['last_hidden_state'] = {0: 'batch', 1: 'sequence'}
+    
+    tmp_path = f"{path}.tmp"
+    torch.onnx.export(
+        model,
+        tuple(sample[name] for name in input_names),
+        tmp_path,
+        input_names=input_names,
+        output_names=['last_hidden_state'],
+        dynamic_axes=dynamic_axes,
+        opset_version=14
+    )
+    os.replace(tmp_path, path)
+
+def _onnx_session(model_name: str, model, tokenizer, onnx_dir: str, num_threads: Optional[int]):
+    """Shared onnxruntime session, exporting the model on first use"""
+    def load():
+        os.makedirs(onnx_dir, exist_ok=True)
+        path = os.path.join(onnx_dir, f"{re.sub(r'[^A-Za-z0-9_.-]', '_', model_name)}.onnx")
+        if not os.path.exists(path):
+            _export_onnx(model, tokenizer, path)
+        
+        options = onnxruntime.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        return onnxruntime.InferenceSession(path, sess_options=options, providers=['CPUExecutionProvider'])
+    
+    return model_registry.get(f"transformer:{model_name}:onnx", load)
+
+def create_backend(name: str, model_name: str, tokenizer, model,
+                   onnx_dir: Optional[str] = None, num_threads: Optional[int] = None):
+    """Build the named backend for an fp32 (tokenizer, model) pair; raises on failure"""
+    if name == 'fp32':
+        return TorchBackend(tokenizer, model)
+    if name == 'int8':
+        return TorchBackend(tokenizer, _quantized_model(model_name, model), name='int8')
+    if name == 'onnx':
+        if not ONNXRUNTIME_AVAILABLE:
+            raise ImportError("onnxruntime is not installed")
+        if not onnx_dir:
+            raise ValueError("onnx backend needs an export directory")
+        session = _onnx_session(model_name, model, tokenizer, onnx_dir, num_threads)
+        return OnnxBackend(tokenizer, session, model.config.hidden_size)
+    raise ValueError(f"Unknown inference backend {name!r}, expected one of {BACKENDS}")
+
+def embedding_agreement(reference, candidate, texts: List[str] = AGREEMENT_SAMPLES) -> float:
+    """Lowest cosine similarity between the two backends' embeddings of texts"""
+    expected = reference.encode(texts)
+    actual = candidate.encode(texts)
+    norms = np.linalg.norm(expected, axis=1) * np.linalg.norm(actual, axis=1)
+    cosines = (expected * actual).sum(axis=1) / np.clip(norms, 1e-9, None)
+    return float(cosines.min())
+
+def benchmark_backend(backend, texts: List[str], batch_size: int = 32) -> Dict:
+    """Throughput of backend.encode over texts"""
+    backend.encode(texts[:batch_size])  # Warm up kernels and allocations
+    
+    start_time = time.perf_counter()
+    for start in range(0, len(texts), batch_size):
+        backend.encode(texts[start:start + batch_size])
+    elapsed = time.perf_counter() - start_time
+    
+    return {
+        'backend': backend.name,
+        'rows': len(texts),
+        'seconds': round(elapsed, 3),
+        'rows_per_second': round(len(texts) / elapsed, 1) if elapsed else None
+    }
@@ -0,0 +1,79 @@
+"""
+Micro-batching inference worker
+Groups query-embedding requests from concurrent threads into one forward pass
+"""
+
+import queue
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from batch_worker import BatchWorker
+
+class MicroBatcher(BatchWorker):
+    """Single worker thread that batches texts submitted by request threads
+    
+    The worker blocks for the first request, then keeps collecting for at
+    most max_wait_ms or until max_batch_size texts are queued, and runs one
+    encode_fn call for the whole group. max_wait_ms bounds the queueing delay
+    a request can add and max_batch_size bounds the forward pass, which
+    together cap tail latency while concurrent requests share each pass.
+    """
+    
+    thread_name = 'inference-batcher'
+    
+    def __init__(self, encode_fn: Callable[[List[str]], Optional[np.ndarray]],
+                 max_batch_size: int = 32, max_wait_ms: float = 5.0, max_queue: int = 1024):
+        super().__init__(max_batch_size, max_wait_ms / 1000.0, max_queue)
+        self.encode_fn = encode_fn
+        
+        self.requests = 0
+        self.batches = 0
+        self.largest_batch = 0
+    
+    def submit(self, text: str) -> Future:
+        """Queue a text for embedding; the future resolves to its vector"""
+        future = Future()
+        # Raises queue.Full when the worker is saturated so callers can shed load
+        if not self._enqueue((text, future)):
+            future.set_exception(RuntimeError("Inference worker is stopped"))
+        return future
+    
+    def embed(self, text: str, timeout: Optional[float] = None) -> Optional[np.ndarray]:
+        """Embed one text through the shared batch, None if encoding failed"""
+        try:
+            future = self.submit(text)
+        except queue.Full:
+            self.logger.warning("Inference queue full, encoding on the request thread")
+            matrix = self.encode_fn([text])
+            return None if matrix is None else matrix[0]
+        
+        return future.result(timeout=timeout)
+    
+    def _process(self, batch: List) -> None:
+        """Encode a batch and resolve each request's future with its row"""
+        texts = [text for text, _ in batch]
+        try:
+            matrix = self.encode_fn(texts)
+        except Exception as e:
+            self.logger.error(f"Batched inference failed: {e}")
+            matrix = None
+        
+        for position, (_, future) in enumerate(batch):
+            if future.set_running_or_notify_cancel():
+                future.set_result(None if matrix is None else matrix[position])
+        
+        self.requests += len(batch)
+        self.batches += 1
+        self.largest_batch = max(self.largest_batch, len(batch))
+    
+    def get_stats(self) -> Dict:
+        """Batching statistics"""
+        return {
+            'requests': self.requests,
+            'batches': self.batches,
+            'average_batch_size': round(self.requests / self.batches, 2) if self.batches else 0.0,
+            'largest_batch': self.largest_batch,
+            'queued': self._queue.qsize()
+        }
@@ -0,0 +1,52 @@
+"""
+Deferred imports for heavy libraries
+Availability is checked without running the module, which is imported on first attribute access
+"""
+
+import importlib
+import importlib.util
+import threading
+from typing import Callable, Optional
+
+def module_available(name: str) -> bool:
+    """Whether a module can be imported, without importing it"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+class LazyModule:
+    """Stand-in for a module that imports it on first attribute access
+    
+    on_load runs once with the real module, before anything else sees it,
+    for module-level configuration that used to happen at import time.
+    """
+    
+    def __init__(self, name: str, on_load: Optional[Callable] = None):
+        self._name = name
+        self._on_load = on_load
+        self._module = None
+        self._lock = threading.Lock()
+    
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    module = importlib.import_module(self._name)
+                    if self._on_load:
+                        self._on_load(module)
+                    self._module = module
+        return self._module
+    
+    def __getattr__(self, attr: str):
+        if attr in ('_name', '_on_load', '_module', '_lock'):
+            raise AttributeError(attr)
+        return getattr(self._load(), attr)
+    
+    def __repr__(self) -> str:
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f"<lazy module {self._name!r} ({state})>"
+
+def lazy_import(name: str, on_load: Optional[Callable] = None) -> LazyModule:
+    """Module proxy for name, imported the first time it is used"""
+    return LazyModule(name, on_load)
@@ -1,4 +1,11 @@
-from app import app, socketio
+from app import create_app, socketio
+
+app = create_app()
 
 if __name__ == '__main__':
+    # Only serving processes warm up: flask CLI commands import this module
+    # too, and gunicorn workers start from gunicorn.conf.py (or their first
+    # request, see routes._start_warmup)
+    if app.config['WARMUP_ON_STARTUP']:
+        app.warmup.start_background(app)
     socketio.run(app, host='0.0.0.0', port=5000, debug=True)
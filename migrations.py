@@ -0,0 +1,66 @@
+"""
+Lightweight schema migrations
+db.create_all() only creates missing tables, so columns added to existing
+models are applied here
+"""
+
+import logging
+from sqlalchemy import inspect, text
+from app import db
+
+# (table, column, DDL type) added after the table was first created
+ADDED_COLUMNS = [
+    ('content_item', 'processed_version', 'VARCHAR(100)'),
+    ('analytics', 'confidence_sum', 'FLOAT'),
+    ('question', 'public_id', 'VARCHAR(36)'),
+]
+
+# (index name, table, columns, unique) for indexes on existing tables; names
+# match the ones db.create_all() gives the model declarations
+ADDED_INDEXES = [
+    ('ix_question_public_id', 'question', ('public_id',), True),
+    ('ix_question_asked_at_best_answer_id', 'question', ('asked_at', 'best_answer_id'), False),
+    ('ix_question_session_id', 'question', ('session_id',), False),
+    ('ix_question_best_answer_id', 'question', ('best_answer_id',), False),
+    ('ix_content_item_category_id', 'content_item', ('category_id',), False),
+]
+
+def ensure_schema():
+    """Add any missing columns and indexes to existing tables"""
+    logger = logging.getLogger(__name__)
+    inspector = inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+    
+    for table, column, column_type in ADDED_COLUMNS:
+        if table not in existing_tables:
+            continue
+        
+        columns = {info['name'] for info in inspector.get_columns(table)}
+        if column in columns:
+            continue
+        
+        try:
+            with db.engine.begin() as connection:
+                connection.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {column_type}'))
+            logger.info(f"Added column {table}.{column}")
+        except Exception as e:
+            # Another worker may have added it first
+            logger.warning(f"Could not add column {table}.{column}: {e}")
+    
+    for name, table, columns, unique in ADDED_INDEXES:
+        if table not in existing_tables:
+            continue
+        
+        indexes = {info['name'] for info in inspect(db.engine).get_indexes(table)}
+        if name in indexes:
+            continue
+        
+        try:
+            with db.engine.begin() as connection:
+                connection.execute(text(
+                    f'CREATE {"UNIQUE " if unique else ""}INDEX {name} ON {table} ({", ".join(columns)})'
+                ))
+            logger.info(f"Added index {name} on {table}")
+        except Exception as e:
+            # Another worker may have added it first
+            logger.warning(f"Could not add index {name}: {e}")
@@ -0,0 +1,108 @@
+"""
+Process-wide model registry
+Loads each spaCy or transformer model once and shares it between processors
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Tuple
+
+from lazy_imports import lazy_import, module_available
+
+# Imported when a model is first loaded, not when the app starts
+spacy = lazy_import('spacy')
+transformers = lazy_import('transformers')
+TRANSFORMERS_AVAILABLE = module_available('transformers') and module_available('torch')
+
+SPACY_MODEL_NAMES = ("en_core_web_lg", "en_core_web_md", "en_core_web_sm")
+DEFAULT_TRANSFORMER_MODEL = 'sentence-transformers/all-MiniLM-L6-v2'
+
+def _current_rss_mb() -> float:
+    """Resident set size of this process in MB"""
+    try:
+        with open('/proc/self/statm', 'r') as statm:
+            resident_pages = int(statm.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        import resource
+        # Peak RSS is the closest portable figure (KB on Linux)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+class ModelRegistry:
+    """Loads each model once per process, on first use or on warmup()"""
+    
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._models = {}  # key -> loaded model
+        self._stats = {}  # key -> load statistics
+        self._locks = {}  # key -> lock serializing its load
+        self._lock = threading.Lock()
+    
+    def get(self, key: str, loader: Callable):
+        """Return the model stored under key, loading it with loader the first time"""
+        if key in self._models:
+            return self._models[key]
+        
+        with self._lock:
+            key_lock = self._locks.setdefault(key, threading.Lock())
+        
+        with key_lock:
+            if key in self._models:
+                return self._models[key]
+            
+            rss_before = _current_rss_mb()
+            start_time = time.perf_counter()
+            model = loader()
+            load_seconds = time.perf_counter() - start_time
+            
+            self._stats[key] = {
+                'load_seconds': round(load_seconds, 3),
+                'rss_delta_mb': round(_current_rss_mb() - rss_before, 1),
+                'loaded_at': time.time()
+            }
+            self._models[key] = model
+            self.logger.info(f"Loaded model {key} in {load_seconds:.2f}s")
+            return model
+    
+    def get_spacy_model(self):
+        """Shared spaCy pipeline, falling back lg -> md -> sm -> blank"""
+        return self.get('spacy', self._load_spacy_model)
+    
+    def _load_spacy_model(self):
+        for model_name in SPACY_MODEL_NAMES:
+            try:
+                nlp = spacy.load(model_name)
+                self.logger.info(f"Loaded {model_name} spaCy model")
+                return nlp
+            except OSError:
+                continue
+        
+        # Create a blank model as last resort
+        self.logger.warning("Using blank spaCy model - install en_core_web_sm for better results")
+        return spacy.blank("en")
+    
+    def get_transformer(self, model_name: str = DEFAULT_TRANSFORMER_MODEL,
+                        local_files_only: bool = False) -> Tuple:
+        """Shared (tokenizer, model) pair in eval mode; raises if it cannot be loaded
+        
+        local_files_only stops a missing model from being downloaded, so a
+        cold worker fails fast instead of blocking on the network.
+        """
+        if not TRANSFORMERS_AVAILABLE:
+            raise ImportError("transformers is not installed")
+        
+        def load():
+            tokenizer = transformers.AutoTokenizer.from_pretrained(model_name, local_files_only=local_files_only)
+            model = transformers.AutoModel.from_pretrained(model_name, local_files_only=local_files_only)
+            model.eval()
+            return tokenizer, model
+        
+        return self.get(f"transformer:{model_name}", load)
+    
+    def get_stats(self) -> Dict:
+        """Load time and memory per loaded model"""
+        return {key: dict(stats) for key, stats in self._stats.items()}
+
+model_registry = ModelRegistry()
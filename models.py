@@ -20,12 +20,23 @@ class ContentItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     content = db.Column(db.Text, nullable=False)
-    category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=False)
+    category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=False, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Processed content for NLP
     processed_content = db.Column(db.Text)  # Preprocessed text for faster matching
+    processed_version = db.Column(db.String(100))  # NLPProcessor.preprocessing_version that produced it
+    
+    def to_dict(self):
+        """Dict shape used by the NLP processors and their indexes"""
+        return {
+            'id': self.id,
+            'title': self.title,
+            'content': self.content,
+            'category': self.category.name,
+            'category_id': self.category_id
+        }
     
     def __repr__(self):
         return f'<ContentItem {self.title}>'
@@ -33,12 +44,13 @@ class ContentItem(db.Model):
 class Question(db.Model):
     """Question model for tracking user questions"""
     id = db.Column(db.Integer, primary_key=True)
+    public_id = db.Column(db.String(36), unique=True, index=True)  # Generated when queued, before the row exists
     question_text = db.Column(db.Text, nullable=False)
-    session_id = db.Column(db.String(100), nullable=False)  # Session-based tracking
+    session_id = db.Column(db.String(100), nullable=False, index=True)  # Session-based tracking
     asked_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Best matching answer
-    best_answer_id = db.Column(db.Integer, db.ForeignKey('content_item.id'), nullable=True)
+    best_answer_id = db.Column(db.Integer, db.ForeignKey('content_item.id'), nullable=True, index=True)
     best_answer = db.relationship('ContentItem', backref='matched_questions')
     
     # Confidence score of the match
@@ -47,6 +59,10 @@ class Question(db.Model):
     # User feedback (optional)
     was_helpful = db.Column(db.Boolean, nullable=True)
     
+    # Time-window scans (trends, dashboard, recent questions) use the leading
+    # asked_at column; best_answer_id lets the category joins read it from the index
+    __table_args__ = (db.Index('ix_question_asked_at_best_answer_id', 'asked_at', 'best_answer_id'),)
+    
     def __repr__(self):
         return f'<Question {self.question_text[:50]}...>'
 
@@ -57,6 +73,7 @@ class Analytics(db.Model):
     total_questions = db.Column(db.Integer, default=0)
     total_sessions = db.Column(db.Integer, default=0)
     avg_confidence_score = db.Column(db.Float, default=0.0)
+    confidence_sum = db.Column(db.Float, default=0.0)  # Running sum behind avg_confidence_score, NULL until reconciled
     most_asked_category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=True)
     most_asked_category = db.relationship('Category', backref='analytics_records')
     
@@ -66,6 +83,29 @@ class Analytics(db.Model):
     def __repr__(self):
         return f'<Analytics {self.date}>'
 
+class AnalyticsCategoryCount(db.Model):
+    """Questions per best-answer category and day, kept up to date incrementally"""
+    id = db.Column(db.Integer, primary_key=True)
+    date = db.Column(db.Date, nullable=False)
+    category_id = db.Column(db.Integer, db.ForeignKey('category.id', ondelete='CASCADE'), nullable=False)
+    question_count = db.Column(db.Integer, default=0, nullable=False)
+    
+    __table_args__ = (db.UniqueConstraint('date', 'category_id', name='unique_date_category'),)
+    
+    def __repr__(self):
+        return f'<AnalyticsCategoryCount {self.date} {self.category_id}>'
+
+class AnalyticsSession(db.Model):
+    """Sessions seen on a day, so distinct sessions are counted without a rescan"""
+    id = db.Column(db.Integer, primary_key=True)
+    date = db.Column(db.Date, nullable=False)
+    session_id = db.Column(db.String(100), nullable=False)
+    
+    __table_args__ = (db.UniqueConstraint('date', 'session_id', name='unique_date_session'),)
+    
+    def __repr__(self):
+        return f'<AnalyticsSession {self.date} {self.session_id}>'
+
 class FileUpload(db.Model):
     """File upload tracking model"""
     id = db.Column(db.Integer, primary_key=True)
@@ -1,130 +1,505 @@
-import spacy
 import logging
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
 import re
-from typing import List, Tuple, Dict
+import threading
+from typing import List, Tuple, Dict, Optional
+from lazy_imports import lazy_import
+from model_registry import model_registry
+from index_snapshot import OverlayTable, StackedRows
+
+# sklearn and scipy are imported when the index is first built
+sp = lazy_import('scipy.sparse')
+sklearn_text = lazy_import('sklearn.feature_extraction.text')
+
+# Devanagari letters, vowel signs and digits (the danda marks are left out as
+# punctuation) so Hindi words survive cleaning and tokenization intact
+DEVANAGARI_CHARS = '\u0900-\u0963\u0966-\u097F'
+
+# Bump whenever preprocess_text output changes so stored processed_content
+# is backfilled (see content_backfill.py)
+PREPROCESSING_VERSION = 1
+
+# Pipeline components lemmatisation and stop-word filtering rely on; the rest
+# (parser, NER, ...) are disabled while preprocessing
+LEMMA_PIPES = ('tok2vec', 'transformer', 'tagger', 'morphologizer', 'attribute_ruler', 'lemmatizer')
 
 class NLPProcessor:
     """NLP processor for question matching and answer ranking"""
     
-    def __init__(self):
+    def __init__(self, batch_size: int = 256, n_process: int = 1):
         self.logger = logging.getLogger(__name__)
-        self.nlp = None
-        self.tfidf_vectorizer = TfidfVectorizer(
-            max_features=5000,
-            stop_words='english',
-            ngram_range=(1, 2),
-            lowercase=True
-        )
+        self._nlp = None
+        self.batch_size = batch_size
+        self.n_process = n_process
+        self._tfidf_vectorizer = None
         self.content_vectors = None
         self.content_items_cache = []
-        self._load_spacy_model()
+        
+        # Persistent index state, kept in step with content_items_cache
+        self._processed_texts = []  # Preprocessed text per cached item
+        self._row_by_id = {}  # content item id -> row in content_vectors
+        self._active_rows = None  # False for rows removed or replaced since the last fit
+        self._index_built = False
+        self._pending_changes = 0  # Rows written with a stale vocabulary
+        self._doc_vectors = None  # spaCy doc vector per row, None without word vectors
+        self._index_lock = threading.RLock()
     
-    def _load_spacy_model(self):
-        """Load spaCy model with fallback"""
-        try:
-            # Try to load the large English model first
-            self.nlp = spacy.load("en_core_web_lg")
-            self.logger.info("Loaded en_core_web_lg spaCy model")
-        except OSError:
-            try:
-                # Fallback to medium model
-                self.nlp = spacy.load("en_core_web_md")
-                self.logger.info("Loaded en_core_web_md spaCy model")
-            except OSError:
-                try:
-                    # Fallback to small model
-                    self.nlp = spacy.load("en_core_web_sm")
-                    self.logger.info("Loaded en_core_web_sm spaCy model")
-                except OSError:
-                    # Create a blank model as last resort
-                    self.nlp = spacy.blank("en")
-                    self.logger.warning("Using blank spaCy model - install en_core_web_sm for better results")
+    @property
+    def nlp(self):
+        """Shared spaCy pipeline from the model registry, loaded on first use"""
+        if self._nlp is None:
+            self._nlp = model_registry.get_spacy_model()
+        return self._nlp
+    
+    @property
+    def tfidf_vectorizer(self):
+        """Index vectorizer, created on first use"""
+        if self._tfidf_vectorizer is None:
+            self._tfidf_vectorizer = sklearn_text.TfidfVectorizer(
+                max_features=5000,
+                stop_words='english',
+                ngram_range=(1, 2),
+                lowercase=True,
+                token_pattern=rf'(?u)[\w{DEVANAGARI_CHARS}]{{2,}}'
+            )
+        return self._tfidf_vectorizer
+    
+    @tfidf_vectorizer.setter
+    def tfidf_vectorizer(self, vectorizer):
+        self._tfidf_vectorizer = vectorizer
+    
+    @property
+    def preprocessing_version(self) -> str:
+        """Stamp stored next to processed_content, covering code and spaCy model"""
+        if self.nlp and hasattr(self.nlp, 'meta'):
+            meta = self.nlp.meta
+            return f"{PREPROCESSING_VERSION}:{meta.get('lang')}_{meta.get('name')}-{meta.get('version')}"
+        return f"{PREPROCESSING_VERSION}:basic"
     
     def preprocess_text(self, text: str) -> str:
         """Preprocess text for better matching"""
-        if not text:
-            return ""
+        return self.preprocess_batch([text], n_process=1)[0]
+    
+    def preprocess_batch(self, texts: List[str], n_process: Optional[int] = None,
+                         batch_size: Optional[int] = None) -> List[str]:
+        """Preprocess many texts in one streamed spaCy pass, keeping their order
         
-        # Basic cleaning
-        text = re.sub(r'\s+', ' ', text)  # Multiple spaces to single space
-        text = re.sub(r'[^\w\s]', ' ', text)  # Remove punctuation
-        text = text.lower().strip()
+        Only the components lemmatisation needs are run. n_process > 1 forks
+        worker processes, which suits CLI imports better than request threads.
+        """
+        cleaned = [self._clean_text(text) for text in texts]
         
-        if self.nlp and hasattr(self.nlp, 'vocab'):
-            # Use spaCy for advanced preprocessing
-            doc = self.nlp(text)
+        if not self.nlp or not hasattr(self.nlp, 'vocab'):
+            # Basic preprocessing without spaCy
+            return cleaned
+        
+        results = [''] * len(cleaned)
+        positions = [i for i, text in enumerate(cleaned) if text]
+        disabled = [name for name in self.nlp.pipe_names if name not in LEMMA_PIPES]
+        
+        # Use spaCy for advanced preprocessing
+        docs = self.nlp.pipe(
+            (cleaned[i] for i in positions),
+            disable=disabled,
+            batch_size=batch_size or self.batch_size,
+            n_process=n_process or self.n_process
+        )
+        for i, doc in zip(positions, docs):
             # Extract lemmatized tokens, excluding stop words and punctuation
             tokens = [token.lemma_ for token in doc 
                      if not token.is_stop and not token.is_punct and len(token.text) > 1]
-            return ' '.join(tokens)
-        else:
-            # Basic preprocessing without spaCy
-            return text
+            results[i] = ' '.join(tokens)
+        
+        return results
+    
+    @staticmethod
+    def _clean_text(text: str) -> str:
+        """Collapse whitespace, strip punctuation and lowercase"""
+        if not text:
+            return ""
+        
+        text = re.sub(r'\s+', ' ', text)  # Multiple spaces to single space
+        text = re.sub(rf'[^\w\s{DEVANAGARI_CHARS}]', ' ', text)  # Remove punctuation
+        return text.lower().strip()
     
     def get_semantic_similarity(self, text1: str, text2: str) -> float:
         """Calculate semantic similarity between two texts using spaCy"""
-        if not self.nlp or not hasattr(self.nlp, 'vocab'):
-            return self._basic_similarity(text1, text2)
-        
         try:
-            doc1 = self.nlp(text1)
-            doc2 = self.nlp(text2)
+            vectors = self.compute_doc_vectors([text1, text2])
             
             # Check if the model has word vectors
-            if doc1.has_vector and doc2.has_vector:
-                return doc1.similarity(doc2)
-            else:
-                return self._basic_similarity(text1, text2)
+            if vectors is not None and vectors[0].any() and vectors[1].any():
+                return float(vectors[0] @ vectors[1])
         except Exception as e:
             self.logger.warning(f"Error calculating semantic similarity: {e}")
-            return self._basic_similarity(text1, text2)
+        
+        return self._basic_similarity(text1, text2)
+    
+    def compute_doc_vectors(self, texts: List[str]) -> Optional[np.ndarray]:
+        """L2-normalised spaCy doc vectors, zero rows where no word has a vector
+        
+        Returns None when the pipeline has no static word vectors (sm or blank
+        models), in which case callers fall back to TF-IDF similarity.
+        """
+        if not self.nlp or not hasattr(self.nlp, 'vocab') or not self.nlp.vocab.vectors_length:
+            return None
+        
+        # Doc.vector averages static word vectors, so only the tokenizer has to run
+        docs = self.nlp.pipe(texts, disable=self.nlp.pipe_names, batch_size=self.batch_size)
+        vectors = np.array([doc.vector for doc in docs], dtype=np.float32)
+        vectors = vectors.reshape(len(texts), self.nlp.vocab.vectors_length)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
+    
+    def _semantic_scores(self, question: str, texts: List[str], vectors: Optional[np.ndarray]) -> np.ndarray:
+        """Similarity of question to each text from cached doc vectors
+        
+        vectors holds one precomputed doc vector per text (or is None); texts
+        without a usable vector are scored with the TF-IDF fallback.
+        """
+        scores = np.zeros(len(texts), dtype=np.float32)
+        missing = np.ones(len(texts), dtype=bool)
+        
+        if vectors is not None and len(texts):
+            query = self.compute_doc_vectors([question])
+            if query is not None and query[0].any():
+                scores = vectors @ query[0]
+                missing = ~vectors.any(axis=1)
+        
+        if missing.any():
+            rows = np.flatnonzero(missing)
+            scores[rows] = self._basic_similarities(question, [texts[row] for row in rows])
+        
+        return scores
     
     def _basic_similarity(self, text1: str, text2: str) -> float:
         """Basic similarity calculation using TF-IDF and cosine similarity"""
+        return float(self._basic_similarities(text1, [text2])[0])
+    
+    def _basic_similarities(self, question: str, texts: List[str]) -> np.ndarray:
+        """TF-IDF cosine similarity of question to each text"""
         try:
-            texts = [text1, text2]
-            tfidf_matrix = self.tfidf_vectorizer.fit_transform(texts)
-            similarity = cosine_similarity(tfidf_matrix[0:1], tfidf_matrix[1:2])
-            return float(similarity[0][0])
+            # Use a throwaway vectorizer so the corpus index vocabulary is untouched
+            vectorizer = sklearn_text.TfidfVectorizer(stop_words='english', lowercase=True)
+            tfidf_matrix = vectorizer.fit_transform([question] + list(texts))
+            # Rows are L2-normalised, so the dot product is the cosine
+            return (tfidf_matrix[1:] @ tfidf_matrix[0].T).toarray().ravel()
         except Exception as e:
             self.logger.warning(f"Error in basic similarity calculation: {e}")
-            return 0.0
+            return np.zeros(len(texts))
     
-    def build_content_index(self, content_items: List[Dict]) -> None:
-        """Build TF-IDF index for content items"""
+    def has_content_index(self) -> bool:
+        """Check whether the persistent content index has been built"""
+        return self._index_built
+    
+    def get_index_size(self) -> int:
+        """Number of items held in the content index"""
+        return len(self._row_by_id)
+    
+    def build_content_index(self, content_items: List[Dict], processed_texts: Optional[List[str]] = None) -> None:
+        """Build TF-IDF index for content items
+        
+        processed_texts may carry already preprocessed text (one per item) to
+        skip the spaCy pass, e.g. ContentItem.processed_content.
+        """
         self.logger.info(f"Building content index for {len(content_items)} items")
         
-        if not content_items:
-            self.content_vectors = None
+        with self._index_lock:
             self.content_items_cache = []
-            return
+            self._processed_texts = []
+            self._row_by_id = {}
+            self._active_rows = np.zeros(0, dtype=bool)
+            self._pending_changes = 0
+            self._index_built = True
+            
+            if not content_items:
+                self.content_vectors = None
+                self._doc_vectors = None
+                return
+            
+            processed_texts = list(processed_texts) if processed_texts else [None] * len(content_items)
+            missing = [i for i, text in enumerate(processed_texts) if not text]
+            if missing:
+                # Combine title and content for better matching
+                combined_texts = [
+                    f"{content_items[i].get('title', '')} {content_items[i].get('content', '')}"
+                    for i in missing
+                ]
+                for i, processed_text in zip(missing, self.preprocess_batch(combined_texts)):
+                    processed_texts[i] = processed_text
+            
+            for item, processed_text in zip(content_items, processed_texts):
+                self._row_by_id[item.get('id')] = len(self.content_items_cache)
+                self._processed_texts.append(processed_text)
+                self.content_items_cache.append(item)
+            self._active_rows = np.ones(len(content_items), dtype=bool)
+            
+            doc_vectors = self._item_doc_vectors(content_items)
+            self._doc_vectors = None if doc_vectors is None else StackedRows(doc_vectors)
+            self._refit_index()
+    
+    def _item_doc_vectors(self, items: List[Dict]) -> Optional[np.ndarray]:
+        """Doc vectors of the items' title and content"""
+        try:
+            return self.compute_doc_vectors(
+                [f"{item.get('title', '')} {item.get('content', '')}" for item in items]
+            )
+        except Exception as e:
+            self.logger.warning(f"Error computing doc vectors: {e}")
+            return None
+    
+    def export_snapshot(self) -> Optional[Dict]:
+        """Index state as a snapshot part for index_snapshot.IndexSnapshotStore
         
-        # Prepare content texts
-        content_texts = []
-        self.content_items_cache = []
+        Removed rows are left out and appended rows merged into one block.
+        """
+        with self._index_lock:
+            if not self._index_built:
+                return None
+            
+            live = np.flatnonzero(self._active_rows)
+            items = [self.content_items_cache[row] for row in live]
+            part = {
+                'arrays': {
+                    'ids': np.array([item.get('id') for item in items], dtype=np.int64)
+                },
+                'tables': {
+                    'items': items,
+                    'processed': [self._processed_texts[row] for row in live]
+                },
+                'objects': {'vectorizer': self.tfidf_vectorizer},
+                'meta': {'pending_changes': self._pending_changes, 'shape': None}
+            }
+            if self.content_vectors is not None:
+                content_vectors = self.content_vectors[live].tocsr()
+                part['arrays']['tfidf_data'] = content_vectors.data
+                part['arrays']['tfidf_indices'] = content_vectors.indices
+                part['arrays']['tfidf_indptr'] = content_vectors.indptr
+                part['meta']['shape'] = list(content_vectors.shape)
+            if self._doc_vectors is not None:
+                part['arrays']['doc_vectors'] = self._doc_vectors[live]
+            return part
+    
+    def attach_snapshot(self, part: Dict) -> None:
+        """Serve from a loaded snapshot part, keeping its arrays memory-mapped
+        
+        Everything is swapped under the index lock, so queries see either the
+        old or the new snapshot. Changes replayed on top are kept beside the
+        shared rows (OverlayTable, StackedRows and the removed-row mask) and
+        never copy them; readers copy only that overlay before releasing the
+        lock.
+        """
+        arrays = part['arrays']
+        shape = part['meta'].get('shape')
+        content_vectors = None
+        if shape:
+            content_vectors = StackedRows(sp.csr_matrix(
+                (arrays['tfidf_data'], arrays['tfidf_indices'], arrays['tfidf_indptr']),
+                shape=tuple(shape), copy=False
+            ))
+        doc_vectors = arrays.get('doc_vectors')
+        row_by_id = {int(item_id): row for row, item_id in enumerate(arrays['ids'])}
+        
+        with self._index_lock:
+            self.tfidf_vectorizer = part['objects']['vectorizer']
+            self.content_vectors = content_vectors
+            self.content_items_cache = OverlayTable(part['tables']['items'])
+            self._processed_texts = OverlayTable(part['tables']['processed'])
+            self._doc_vectors = None if doc_vectors is None else StackedRows(doc_vectors)
+            self._row_by_id = row_by_id
+            self._active_rows = np.ones(len(row_by_id), dtype=bool)
+            self._pending_changes = part['meta'].get('pending_changes', 0)
+            self._index_built = True
+    
+    def _items_view(self):
+        """Items aligned with the current rows, safe to read once the lock is released"""
+        return self.content_items_cache.copy()
+    
+    def _similarities(self, question_vector) -> np.ndarray:
+        """Cosine similarity of every row to a question vector, zero for removed rows"""
+        # TF-IDF rows are L2-normalised, so the dot product is the cosine
+        similarities = (self.content_vectors @ question_vector.T).toarray().ravel()
+        similarities[~self._active_rows] = 0.0
+        return similarities
+    
+    def _refit_index(self) -> None:
+        """Refit the vectorizer on the live rows' processed text (no spaCy pass)
         
-        for item in content_items:
-            # Combine title and content for better matching
-            combined_text = f"{item.get('title', '')} {item.get('content', '')}"
-            processed_text = self.preprocess_text(combined_text)
-            content_texts.append(processed_text)
-            self.content_items_cache.append(item)
+        Removed rows are dropped, so every row is private and active again.
+        """
+        live = np.flatnonzero(self._active_rows)
+        self.content_items_cache = [self.content_items_cache[row] for row in live]
+        self._processed_texts = [self._processed_texts[row] for row in live]
+        if self._doc_vectors is not None:
+            self._doc_vectors = StackedRows(self._doc_vectors[live])
+        self._row_by_id = {item.get('id'): row for row, item in enumerate(self.content_items_cache)}
+        self._active_rows = np.ones(len(live), dtype=bool)
+        if not len(live):
+            self.content_vectors = None
+            self._pending_changes = 0
+            return
         
         try:
             # Build TF-IDF vectors
-            self.content_vectors = self.tfidf_vectorizer.fit_transform(content_texts)
+            self.content_vectors = StackedRows(self.tfidf_vectorizer.fit_transform(self._processed_texts))
+            self._pending_changes = 0
             self.logger.info("Content index built successfully")
         except Exception as e:
             self.logger.error(f"Error building content index: {e}")
             self.content_vectors = None
-            self.content_items_cache = []
+    
+    def upsert_content_item(self, item: Dict, processed_text: Optional[str] = None,
+                            allow_refit: bool = True) -> bool:
+        """Add or replace a single item in the content index, see upsert_content_items"""
+        return self.upsert_content_items([item], [processed_text], allow_refit=allow_refit)
+    
+    def upsert_content_items(self, items: List[Dict], processed_texts: Optional[List[str]] = None,
+                             allow_refit: bool = True) -> bool:
+        """Add or replace items in the content index
+        
+        The batch shares one spaCy pass for texts not already preprocessed,
+        one append to the index and at most one refit of the vectorizer.
+        Replaced rows are only marked removed until that refit. Returns
+        True when the index was refit; allow_refit=False (replaying a delta
+        whose writer did not refit) only appends, so the rows of an
+        attached snapshot are never copied.
+        """
+        if not items:
+            return False
+        
+        processed_texts = list(processed_texts) if processed_texts else [None] * len(items)
+        missing = [i for i, text in enumerate(processed_texts) if not text]
+        if missing:
+            combined_texts = [f"{items[i].get('title', '')} {items[i].get('content', '')}" for i in missing]
+            for i, processed_text in zip(missing, self.preprocess_batch(combined_texts)):
+                processed_texts[i] = processed_text
+        doc_vectors = self._item_doc_vectors(items)
+        
+        with self._index_lock:
+            if not self._index_built:
+                return False
+            
+            self._remove_rows([item.get('id') for item in items])
+            
+            start_row = len(self.content_items_cache)
+            for offset, (item, processed_text) in enumerate(zip(items, processed_texts)):
+                self._row_by_id[item.get('id')] = start_row + offset
+                self._processed_texts.append(processed_text)
+                self.content_items_cache.append(item)
+            self._active_rows = np.concatenate([self._active_rows, np.ones(len(items), dtype=bool)])
+            
+            # Keep one doc vector per row; zero rows fall back to TF-IDF similarity
+            if doc_vectors is None and self._doc_vectors is not None:
+                doc_vectors = np.zeros((len(items), self._doc_vectors.shape[1]), dtype=np.float32)
+            if self._doc_vectors is not None:
+                self._doc_vectors = self._doc_vectors.append(doc_vectors)
+            elif start_row == 0 and doc_vectors is not None:
+                self._doc_vectors = StackedRows(doc_vectors)
+            
+            # Terms outside the fitted vocabulary would map to zero and leave
+            # the items unfindable by them, so such batches refit right away
+            if self.content_vectors is None or (allow_refit and self._has_new_terms(processed_texts)):
+                self._refit_index()
+                return True
+            
+            # Vectorize with the current vocabulary; refit once enough rows
+            # were written against it that the IDF weights drift
+            row_vectors = self.tfidf_vectorizer.transform(processed_texts)
+            self.content_vectors = self.content_vectors.append(row_vectors)
+            self._pending_changes += len(items)
+            return self._refit_if_stale(allow_refit)
+    
+    def remove_content_item(self, item_id: int, allow_refit: bool = True) -> bool:
+        """Remove an item from the content index, returning True when it was refit"""
+        with self._index_lock:
+            if not self._index_built:
+                return False
+            
+            if not self._remove_rows([item_id]):
+                return False
+            self._pending_changes += 1
+            return self._refit_if_stale(allow_refit)
+    
+    def update_category_name(self, category_id: int, name: str) -> None:
+        """Propagate a category rename to the cached items"""
+        with self._index_lock:
+            if not self._index_built:
+                return
+            
+            # Replaced rather than edited: readers may still hold the old items
+            for row in np.flatnonzero(self._active_rows):
+                item = self.content_items_cache[row]
+                if item.get('category_id') == category_id:
+                    self.content_items_cache[row] = {**item, 'category': name}
+    
+    def _remove_rows(self, item_ids: List[int]) -> int:
+        """Mark the rows of item_ids removed; the next refit drops them"""
+        rows = [self._row_by_id.pop(item_id) for item_id in set(item_ids) if item_id in self._row_by_id]
+        for row in rows:
+            self.content_items_cache[row] = None
+            self._processed_texts[row] = None
+        self._active_rows[rows] = False
+        return len(rows)
+    
+    def _has_new_terms(self, processed_texts: List[str]) -> bool:
+        """Whether the texts have words a refit would add to the vocabulary
+        
+        Only single words count: almost every text has unseen bigrams, and
+        the item stays findable by its words until the next scheduled refit.
+        Once the vocabulary is capped at max_features a refit swaps terms
+        rather than adding them, so new words wait for that refit as well.
+        """
+        vectorizer = self.tfidf_vectorizer
+        vocabulary = vectorizer.vocabulary_
+        if vectorizer.max_features is not None and len(vocabulary) >= vectorizer.max_features:
+            return False
+        
+        analyzer = vectorizer.build_analyzer()
+        return any(' ' not in term and term not in vocabulary
+                   for processed_text in processed_texts for term in analyzer(processed_text))
+    
+    def _refit_if_stale(self, allow_refit: bool = True) -> bool:
+        """Refit the vectorizer when too many rows were written since the last fit"""
+        if allow_refit and self._pending_changes > max(10, int(len(self._row_by_id) * 0.1)):
+            self._refit_index()
+            return True
+        return False
+    
+    def retrieve_candidates(self, question: str, max_candidates: int = 50) -> List[Dict]:
+        """Cheap lexical retrieval of candidate items for a later rerank stage
+        
+        Uses only the sparse TF-IDF index (no semantic scoring), so the cost
+        is one sparse product regardless of how expensive the reranker is.
+        """
+        if self.content_vectors is None or not self.content_items_cache:
+            return []
+        
+        try:
+            processed_question = self.preprocess_text(question)
+            
+            with self._index_lock:
+                if self.content_vectors is None:
+                    return []
+                
+                question_vector = self.tfidf_vectorizer.transform([processed_question])
+                similarities = self._similarities(question_vector)
+                content_items = self._items_view()
+            
+            matched = np.flatnonzero(similarities > 0.0)
+            if len(matched) > max_candidates:
+                matched = matched[np.argpartition(-similarities[matched], max_candidates - 1)[:max_candidates]]
+            matched = matched[np.argsort(-similarities[matched])]
+            
+            return [content_items[idx] for idx in matched]
+            
+        except Exception as e:
+            self.logger.error(f"Error retrieving candidates: {e}")
+            return []
     
     def find_best_answers(self, question: str, top_k: int = 5) -> List[Tuple[Dict, float]]:
         """Find best matching answers for a question"""
-        if not self.content_vectors or not self.content_items_cache:
+        if self.content_vectors is None or not self.content_items_cache:
             self.logger.warning("Content index not built or empty")
             return []
         
@@ -132,28 +507,36 @@ class NLPProcessor:
             # Preprocess the question
             processed_question = self.preprocess_text(question)
             
-            # Transform question using the same vectorizer
-            question_vector = self.tfidf_vectorizer.transform([processed_question])
-            
-            # Calculate cosine similarities
-            similarities = cosine_similarity(question_vector, self.content_vectors).flatten()
+            with self._index_lock:
+                if self.content_vectors is None:
+                    return []
+                
+                # Transform question using the same vectorizer
+                question_vector = self.tfidf_vectorizer.transform([processed_question])
+                
+                # Calculate cosine similarities
+                similarities = self._similarities(question_vector)
+                content_items = self._items_view()
+                doc_vectors = self._doc_vectors
             
-            # Get top-k most similar items
+            # Get top-k most similar items, keeping only those with some similarity
             top_indices = np.argsort(similarities)[::-1][:top_k]
+            top_indices = top_indices[similarities[top_indices] > 0.0]
+            
+            # Calculate additional semantic similarity from the cached doc vectors
+            semantic_scores = self._semantic_scores(
+                question,
+                [f"{content_items[idx].get('title', '')} {content_items[idx].get('content', '')}"
+                 for idx in top_indices],
+                doc_vectors[top_indices] if doc_vectors is not None else None
+            )
             
             results = []
-            for idx in top_indices:
-                if similarities[idx] > 0.0:  # Only include items with some similarity
-                    # Calculate additional semantic similarity if possible
-                    semantic_score = self.get_semantic_similarity(
-                        question, 
-                        f"{self.content_items_cache[idx].get('title', '')} {self.content_items_cache[idx].get('content', '')}"
-                    )
-                    
-                    # Combine TF-IDF and semantic scores
-                    combined_score = (similarities[idx] * 0.7) + (semantic_score * 0.3)
-                    
-                    results.append((self.content_items_cache[idx], combined_score))
+            for idx, semantic_score in zip(top_indices, semantic_scores):
+                # Combine TF-IDF and semantic scores
+                combined_score = (similarities[idx] * 0.7) + (float(semantic_score) * 0.3)
+                
+                results.append((content_items[idx], combined_score))
             
             self.logger.info(f"Found {len(results)} potential answers for question")
             return results
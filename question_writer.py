@@ -0,0 +1,138 @@
+"""
+Asynchronous batched writer for question logs
+Requests queue Question rows and feedback; a background thread writes them in batched transactions
+"""
+
+import queue
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from app import db
+from batch_worker import BatchWorker
+from models import Question
+
+class QuestionWriter(BatchWorker):
+    """Single writer thread that persists questions, their analytics and feedback
+    
+    Requests only enqueue, so they never wait on the database write lock.
+    The worker blocks for the first entry, then keeps collecting for at most
+    flush_interval_ms or until max_batch_size entries are queued, and writes
+    the group with one commit for the questions and one for the analytics.
+    Questions carry a public_id generated when they are queued, so pages can
+    reference them (e.g. in the feedback form) before they are written.
+    """
+    
+    thread_name = 'question-writer'
+    stop_at_exit = True
+    
+    def __init__(self, app, analytics_manager, max_batch_size: int = 100,
+                 flush_interval_ms: float = 200.0, max_queue: int = 10000):
+        super().__init__(max_batch_size, flush_interval_ms / 1000.0, max_queue)
+        self.app = app
+        self.analytics_manager = analytics_manager
+        
+        self.questions_written = 0
+        self.feedback_written = 0
+        self.batches = 0
+        self.failed = 0
+    
+    def _submit(self, entry) -> None:
+        """Queue an entry, writing it on the calling thread when async writes are off, stopped or full"""
+        try:
+            if self.max_wait > 0 and self._enqueue(entry):
+                return
+        except queue.Full:
+            self.logger.warning("Question write queue full, writing on the request thread")
+        self._write([entry])
+    
+    def submit_question(self, public_id: str, question_text: str, session_id: str,
+                        best_answer_id: Optional[int], confidence_score: float) -> None:
+        """Queue a question for logging; public_id identifies it before it is written"""
+        self._submit(('question', {
+            'public_id': public_id,
+            'question_text': question_text,
+            'session_id': session_id,
+            'best_answer_id': best_answer_id,
+            'confidence_score': confidence_score,
+            'asked_at': datetime.utcnow()
+        }))
+    
+    def submit_feedback(self, question_id: str, was_helpful: bool) -> None:
+        """Queue feedback for a question by public_id (or numeric id from older pages)"""
+        self._submit(('feedback', (question_id, was_helpful)))
+    
+    def _process(self, batch: List) -> None:
+        """Worker side: one batched write per collected group"""
+        self._write(batch)
+    
+    def _write(self, batch: List) -> None:
+        """Write a batch in order: questions, then their analytics, then feedback"""
+        with self.app.app_context():
+            try:
+                questions = self._write_questions(
+                    [payload for kind, payload in batch if kind == 'question']
+                )
+                self.analytics_manager.record_questions(questions)
+                
+                feedback = [payload for kind, payload in batch if kind == 'feedback']
+                if feedback:
+                    self._apply_feedback(feedback)
+                
+                self.batches += 1
+            finally:
+                db.session.remove()
+    
+    def _write_questions(self, payloads: List[Dict]) -> List[Question]:
+        """Write questions in one commit; if it fails, retry row by row so only bad rows are dropped"""
+        if not payloads:
+            return []
+        
+        try:
+            questions = [Question(**payload) for payload in payloads]
+            db.session.add_all(questions)
+            db.session.commit()
+            self.questions_written += len(questions)
+            return questions
+        except Exception as e:
+            db.session.rollback()
+            if len(payloads) == 1:
+                self.logger.error(f"Could not write question {payloads[0]['public_id']}: {e}")
+                self.failed += 1
+                return []
+            self.logger.warning(f"Could not write {len(payloads)} questions at once, retrying one by one: {e}")
+        
+        return [question for payload in payloads for question in self._write_questions([payload])]
+    
+    def _apply_feedback(self, feedback: List) -> None:
+        """Set was_helpful on the referenced questions; later feedback wins"""
+        helpful_by_id = dict(feedback)
+        public_ids = [question_id for question_id in helpful_by_id if not question_id.isdigit()]
+        numeric_ids = [int(question_id) for question_id in helpful_by_id if question_id.isdigit()]
+        
+        try:
+            questions = []
+            if public_ids:
+                questions += Question.query.filter(Question.public_id.in_(public_ids)).all()
+            if numeric_ids:
+                questions += Question.query.filter(Question.id.in_(numeric_ids)).all()
+            
+            for question in questions:
+                key = question.public_id if question.public_id in helpful_by_id else str(question.id)
+                question.was_helpful = helpful_by_id[key]
+            
+            db.session.commit()
+            self.feedback_written += len(questions)
+        except Exception as e:
+            self.logger.error(f"Could not write feedback: {e}")
+            db.session.rollback()
+            self.failed += len(feedback)
+    
+    def get_stats(self) -> Dict:
+        """Write statistics"""
+        return {
+            'questions_written': self.questions_written,
+            'feedback_written': self.feedback_written,
+            'batches': self.batches,
+            'failed': self.failed,
+            'queued': self._queue.qsize()
+        }
@@ -1,19 +1,471 @@
 from flask import render_template, request, redirect, url_for, flash, session, jsonify
 from flask_socketio import emit
 from app import app, db, socketio
-from models import Category, ContentItem, Question, FileUpload
+from models import Category, ContentItem, FileUpload
 from nlp_processor import NLPProcessor
 from file_processor import FileProcessor
 from analytics import AnalyticsManager
+from question_writer import QuestionWriter
+from answer_cache import AnswerCache
+from content_backfill import ProcessedContentBackfill
+from index_snapshot import IndexSnapshotStore
+from model_registry import model_registry
 import os
 import logging
+import threading
+from contextlib import contextmanager
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
 from datetime import datetime
 import uuid
+import numpy as np
 
 # Initialize processors
-nlp_processor = NLPProcessor()
+nlp_processor = NLPProcessor(
+    batch_size=app.config['SPACY_BATCH_SIZE'],
+    n_process=app.config['SPACY_N_PROCESS']
+)
 file_processor = FileProcessor()
-analytics_manager = AnalyticsManager()
+analytics_manager = AnalyticsManager(trends_ttl=app.config['TRENDS_CACHE_TTL'])
+question_writer = QuestionWriter(
+    app,
+    analytics_manager,
+    max_batch_size=app.config['QUESTION_WRITE_BATCH'],
+    flush_interval_ms=app.config['QUESTION_FLUSH_MS']
+)
+answer_cache = AnswerCache(
+    max_entries=app.config['ANSWER_CACHE_SIZE'],
+    ttl_seconds=app.config['ANSWER_CACHE_TTL']
+)
+content_backfill = ProcessedContentBackfill(
+    nlp_processor,
+    chunk_size=app.config['BACKFILL_CHUNK_SIZE']
+)
+
+# Index snapshots shared by all workers on this host (None keeps indexes per process)
+index_store = IndexSnapshotStore(
+    app.config['INDEX_SNAPSHOT_DIR'], max_deltas=app.config['INDEX_SNAPSHOT_MAX_DELTAS']
+) if app.config['INDEX_SNAPSHOT_DIR'] else None
+_attached_snapshot = {'version': None}
+_snapshot_lock = threading.RLock()
+
+def _get_transformer_nlp():
+    """Return the transformer processor when it is available"""
+    return getattr(app, 'transformer_nlp', None)
+
+@contextmanager
+def _index_write_lock():
+    """Serialize index writes across workers when the indexes are shared
+    
+    Also holds off this worker's own snapshot syncs, so a change is never
+    applied a second time from the delta its writer is publishing.
+    """
+    if index_store is None:
+        yield
+        return
+    
+    with index_store.exclusive(), _snapshot_lock:
+        yield
+
+def _sync_index_snapshot(refresh=False):
+    """Catch up with the shared index snapshot if another worker published one
+    
+    Deltas on top of the version this worker already serves are replayed;
+    otherwise the full snapshot is attached and its deltas replayed on top.
+    """
+    if index_store is None:
+        return
+    
+    version = index_store.current_version(refresh=refresh)
+    if version is None or version == _attached_snapshot['version']:
+        return
+    
+    with _snapshot_lock:
+        attached = _attached_snapshot['version']
+        if version == attached:
+            return
+        
+        try:
+            chain = index_store.delta_chain(version)
+            parts = None
+            if attached in chain:
+                deltas = chain[chain.index(attached) + 1:]
+            else:
+                parts = index_store.load(chain[0])
+                deltas = chain[1:]
+            operations = [operation for delta in deltas for operation in index_store.load_delta(delta)]
+        except Exception as e:
+            logging.warning(f"Could not load index snapshot v{version}: {e}")
+            return
+        
+        if parts is not None:
+            if 'lexical' in parts:
+                nlp_processor.attach_snapshot(parts['lexical'])
+            
+            transformer_nlp = _get_transformer_nlp()
+            if transformer_nlp is not None:
+                if 'dense' not in parts or not transformer_nlp.attach_snapshot(parts['dense']):
+                    # Rebuilt from the database by _ensure_content_index
+                    transformer_nlp.clear_index()
+        
+        for operation in operations:
+            _apply_index_operation(operation, allow_rebuild=False)
+        
+        _attached_snapshot['version'] = version
+        answer_cache.set_corpus_version(version)
+        logging.info(f"Serving index snapshot v{version}")
+
+def _publish_index_snapshot():
+    """Share this worker's indexes and switch to the memory-mapped published copy"""
+    if index_store is None:
+        return
+    
+    parts = {}
+    lexical = nlp_processor.export_snapshot()
+    if lexical is not None:
+        parts['lexical'] = lexical
+    transformer_nlp = _get_transformer_nlp()
+    dense = transformer_nlp.export_snapshot() if transformer_nlp is not None else None
+    if dense is not None:
+        parts['dense'] = dense
+    if not parts:
+        return
+    
+    try:
+        index_store.publish(parts)
+    except Exception as e:
+        logging.warning(f"Failed to publish index snapshot: {e}")
+        # As for a failed delta, the shared state is reloaded on the next sync
+        _attached_snapshot['version'] = None
+        answer_cache.bump_corpus_version()
+        return
+    
+    # Drop the private rows and overlay in favour of the shared pages
+    _sync_index_snapshot(refresh=True)
+
+def _publish_index_change(operation, rebuilt=False):
+    """Share a change already applied in this worker, as a delta while the chain is short
+    
+    Workers replay deltas as an overlay without rebuilding anything, so a
+    change that rebuilt an index here (rebuilt=True) is shared as a full
+    snapshot instead.
+    """
+    if index_store is None:
+        answer_cache.bump_corpus_version()
+        return
+    
+    attached = _attached_snapshot['version']
+    if rebuilt or attached is None or attached != index_store.current_version(refresh=True) \
+            or not index_store.can_publish_delta():
+        _publish_index_snapshot()
+        return
+    
+    try:
+        _attached_snapshot['version'] = index_store.publish_delta([operation])
+    except Exception as e:
+        logging.warning(f"Failed to publish index delta: {e}")
+        # Reload the shared state on the next sync rather than serve an unshared change
+        _attached_snapshot['version'] = None
+        answer_cache.bump_corpus_version()
+        return
+    
+    answer_cache.set_corpus_version(_attached_snapshot['version'])
+
+def _apply_index_operation(operation, allow_rebuild=True):
+    """Apply one content change, as recorded in a delta, to this worker's indexes
+    
+    Returns True when an index was refit or compacted rather than patched,
+    or a processor failed part-way. Deltas are replayed with
+    allow_rebuild=False: their writer rebuilt nothing, so the change stays
+    a small overlay on the memory-mapped snapshot.
+    """
+    transformer_nlp = _get_transformer_nlp()
+    kind = operation['op']
+    rebuilt = False
+    
+    if kind == 'upsert':
+        try:
+            rebuilt |= nlp_processor.upsert_content_items(
+                operation['items'], processed_texts=operation['processed'], allow_refit=allow_rebuild
+            )
+        except Exception as e:
+            logging.warning(f"Failed to update content index: {e}")
+            rebuilt = True
+        
+        if transformer_nlp is not None:
+            try:
+                rebuilt |= transformer_nlp.upsert_items(operation['items'], allow_rebuild=allow_rebuild)
+            except Exception as e:
+                logging.warning(f"Failed to update embedding index: {e}")
+                rebuilt = True
+    
+    elif kind == 'remove':
+        try:
+            rebuilt |= nlp_processor.remove_content_item(operation['id'], allow_refit=allow_rebuild)
+            if transformer_nlp is not None:
+                rebuilt |= transformer_nlp.remove_item(operation['id'], allow_rebuild=allow_rebuild)
+        except Exception as e:
+            logging.warning(f"Failed to remove item {operation['id']} from content index: {e}")
+            rebuilt = True
+    
+    elif kind == 'rename_category':
+        nlp_processor.update_category_name(operation['category_id'], operation['name'])
+        if transformer_nlp is not None:
+            transformer_nlp.update_category_name(operation['category_id'], operation['name'])
+    
+    return rebuilt
+
+def _content_index_ready():
+    """Whether both content indexes are built (or shared) in this worker"""
+    transformer_nlp = _get_transformer_nlp()
+    needs_embeddings = transformer_nlp is not None and not transformer_nlp.has_embedding_index()
+    return nlp_processor.has_content_index() and not needs_embeddings
+
+def _ensure_content_index():
+    """Attach the shared index snapshot, or build the content indexes from the database"""
+    _sync_index_snapshot()
+    if _content_index_ready():
+        return
+    
+    with _index_write_lock():
+        # Another worker may have published while we waited for the lock
+        _sync_index_snapshot(refresh=True)
+        if _content_index_ready():
+            return
+        
+        transformer_nlp = _get_transformer_nlp()
+        needs_embeddings = transformer_nlp is not None and not transformer_nlp.has_embedding_index()
+        
+        content_items = ContentItem.query.options(joinedload(ContentItem.category)).all()
+        content_data = [item.to_dict() for item in content_items]
+        
+        if not nlp_processor.has_content_index():
+            # Stored processed text is used even when stale; outdated rows are
+            # refreshed by a background backfill instead of inside this request
+            nlp_processor.build_content_index(
+                content_data,
+                processed_texts=[item.processed_content for item in content_items]
+            )
+            
+            version = nlp_processor.preprocessing_version
+            if any(item.processed_version != version for item in content_items):
+                content_backfill.start_background(app, on_complete=_rebuild_lexical_index)
+        
+        if needs_embeddings:
+            try:
+                transformer_nlp.build_embedding_index(content_data)
+            except Exception as e:
+                logging.warning(f"Failed to build embedding index: {e}")
+        
+        _publish_index_snapshot()
+
+def _upsert_operation(content_items):
+    """Index change for written ContentItems; build it before a commit expires them"""
+    return {
+        'op': 'upsert',
+        'items': [item.to_dict() for item in content_items],
+        'processed': [item.processed_content for item in content_items]
+    }
+
+def _apply_index_change(operation):
+    """Apply a content change on top of the latest shared state and share it"""
+    with _index_write_lock():
+        _sync_index_snapshot(refresh=True)
+        rebuilt = _apply_index_operation(operation)
+        _publish_index_change(operation, rebuilt=rebuilt)
+
+def _index_content_items(content_items):
+    """Keep the content indexes in step with written ContentItems"""
+    _apply_index_change(_upsert_operation(content_items))
+
+def _rebuild_lexical_index(updated_count=None):
+    """Refit the lexical index from freshly backfilled processed text"""
+    with _index_write_lock():
+        _sync_index_snapshot(refresh=True)
+        content_items = ContentItem.query.options(joinedload(ContentItem.category)).all()
+        nlp_processor.build_content_index(
+            [item.to_dict() for item in content_items],
+            processed_texts=[item.processed_content for item in content_items]
+        )
+        answer_cache.bump_corpus_version()
+        _publish_index_snapshot()
+
+def _index_content_item(content_item):
+    """Keep the content indexes in step with a written ContentItem"""
+    _index_content_items([content_item])
+
+def _unindex_content_item(content_id):
+    """Drop a deleted ContentItem from the content indexes"""
+    _apply_index_change({'op': 'remove', 'id': content_id})
+
+def _rename_indexed_category(category_id, name):
+    """Propagate a category rename to the content indexes"""
+    _apply_index_change({'op': 'rename_category', 'category_id': category_id, 'name': name})
+
+def _warm_transformer_model():
+    """Load the transformer model and inference backend"""
+    transformer_nlp = _get_transformer_nlp()
+    if transformer_nlp is None:
+        raise RuntimeError("Transformer NLP is not configured")
+    transformer_nlp.load_model()
+    if transformer_nlp.model is None:
+        raise RuntimeError("Transformer model could not be loaded")
+
+def _warm_dummy_query():
+    """Run retrieval and ranking once so lazy allocations happen before traffic"""
+    question = "How do I get started?"
+    candidates = nlp_processor.retrieve_candidates(question, max_candidates=app.config['RETRIEVAL_CANDIDATES'])
+    nlp_processor.find_best_answers(question, top_k=5)
+    transformer_nlp = _get_transformer_nlp()
+    if transformer_nlp is not None and transformer_nlp.model is not None:
+        transformer_nlp.rank_answers(question, answers=candidates or None, top_k=10)
+
+def register_warmup_steps(warmup):
+    """Register the steps a worker runs before it reports ready"""
+    warmup.add_step('spacy_model', model_registry.get_spacy_model)
+    # Without a transformer processor (ENABLE_TRANSFORMER=0) there is nothing to retry
+    if _get_transformer_nlp() is not None:
+        warmup.add_step('transformer_model', _warm_transformer_model, required=False)
+    warmup.add_step('content_index', _ensure_content_index)
+    warmup.add_step('dummy_query', _warm_dummy_query, required=False)
+
+@app.before_request
+def _start_warmup():
+    """Start warming up on the first request (e.g. a readiness probe) if not already running"""
+    warmup = getattr(app, 'warmup', None)
+    if warmup is not None:
+        warmup.start_background(app)
+
+def _find_matches(question_text, normalized_question):
+    """Retrieve, rerank and enrich answers for a question as (item, score) pairs"""
+    # External sources are queried in the background while internal retrieval runs
+    external_search = None
+    if hasattr(app, 'external_knowledge'):
+        try:
+            external_search = app.external_knowledge.start_external_search(normalized_question)
+        except Exception as e:
+            logging.warning(f"Could not start external knowledge search: {e}")
+    
+    # Stage 1: cheap lexical retrieval of candidates; the costlier
+    # reranking below only sees these
+    candidates = nlp_processor.retrieve_candidates(
+        normalized_question, app.config['RETRIEVAL_CANDIDATES']
+    )
+    
+    # Check if question is in Hindi and use specialized extraction
+    detected_lang = app.multilang_processor.detect_language(question_text)
+    use_hindi_extractor = detected_lang in ['hi', 'hindi'] or any(
+        char in question_text for char in 'कखगघचछजझटठडढतथदधनपफबभमयरलवशषसहा'
+    )
+    
+    matches = []
+    
+    if use_hindi_extractor and hasattr(app, 'hindi_extractor'):
+        # Use Hindi content extractor for paragraph-level extraction
+        for content_item in candidates:
+            relevant_paragraphs = app.hindi_extractor.extract_relevant_paragraphs(
+                question_text, content_item['content'], max_paragraphs=3
+            )
+            
+            if relevant_paragraphs:
+                # Format the extracted paragraphs into a comprehensive answer
+                formatted_answer = app.hindi_extractor.format_answer_with_paragraphs(
+                    relevant_paragraphs, question_text
+                )
+                
+                # Create modified content item with extracted relevant content
+                modified_item = content_item.copy()
+                modified_item['content'] = formatted_answer['answer']
+                modified_item['original_content'] = content_item['content']
+                modified_item['extracted_paragraphs'] = len(relevant_paragraphs)
+                modified_item['total_words'] = formatted_answer['total_words']
+                
+                matches.append((modified_item, formatted_answer['confidence']))
+        
+        # Sort by confidence
+        matches.sort(key=lambda x: x[1], reverse=True)
+        matches = matches[:5]  # Take top 5
+    
+    # Use advanced transformer NLP if Hindi extractor didn't find enough or as fallback
+    if len(matches) < 2:
+        if hasattr(app, 'transformer_nlp') and app.transformer_nlp:
+            try:
+                # Stage 2: rerank the candidates; with no lexical hits at all,
+                # rank the whole embedding index instead
+                transformer_matches = app.transformer_nlp.rank_answers(
+                    normalized_question, answers=candidates or None, top_k=10
+                )
+                # Avoid duplicates if we already have Hindi extracted content
+                for match in transformer_matches:
+                    if not any(existing[0]['id'] == match[0]['id'] for existing in matches):
+                        matches.append(match)
+            except Exception as e:
+                logging.warning(f"Transformer NLP failed, falling back: {e}")
+                traditional_matches = nlp_processor.find_best_answers(normalized_question, top_k=5)
+                for match in traditional_matches:
+                    if not any(existing[0]['id'] == match[0]['id'] for existing in matches):
+                        matches.append(match)
+        else:
+            # Fallback to basic NLP
+            traditional_matches = nlp_processor.find_best_answers(normalized_question, top_k=5)
+            for match in traditional_matches:
+                if not any(existing[0]['id'] == match[0]['id'] for existing in matches):
+                    matches.append(match)
+    
+    # Enhance with external knowledge that arrived before the deadline
+    if external_search is not None:
+        try:
+            enhanced_matches = app.external_knowledge.enhance_answer_with_external_knowledge(
+                normalized_question, [match[0] for match in matches[:3]], pending=external_search
+            )
+            
+            # Convert enhanced matches back to (item, score) format
+            enhanced_scored = []
+            for item in enhanced_matches:
+                if item.get('is_external', False):
+                    enhanced_scored.append((item, item.get('confidence', 0.7)))
+                else:
+                    # Find original score
+                    for match, score in matches:
+                        if match.get('id') == item.get('id'):
+                            enhanced_scored.append((match, score))
+                            break
+            
+            matches = enhanced_scored
+        except Exception as e:
+            logging.warning(f"External knowledge enhancement failed: {e}")
+    
+    return matches
+
+def _prepare_answers(matches, normalized_question):
+    """Turn ranked matches into the answer dicts rendered by the question page"""
+    answers = []
+    for match, score in matches:
+        if score > 0.1:  # Only show answers with reasonable confidence
+            answer_data = {
+                'title': match['title'],
+                'content': match['content'],
+                'category': match['category'],
+                'confidence': round(score * 100, 1),
+                'is_external': match.get('is_external', False),
+                'source': match.get('source', 'Internal'),
+                'url': match.get('url', '')
+            }
+            
+            # Detailed confidence metrics come from the score breakdown that
+            # rank_answers attached, so they cost no extra model calls
+            if 'score_breakdown' in match and hasattr(app, 'transformer_nlp') and app.transformer_nlp:
+                try:
+                    confidence_details = app.transformer_nlp.get_answer_confidence(
+                        normalized_question, match, score
+                    )
+                    answer_data['confidence_details'] = confidence_details
+                except:
+                    pass
+            
+            answers.append(answer_data)
+    
+    return answers
 
 @app.route('/')
 def index():
@@ -41,165 +493,57 @@ def ask_question():
                 question_text, target_language
             )
             
-            # Detect language and get response template
-            detected_lang = multilang_info['detected_language']
             response_template = multilang_info['response_template']
             normalized_question = multilang_info['normalized_question']
             
-            # Get all content items for processing
-            content_items = ContentItem.query.all()
-            
-            if not content_items:
-                flash(response_template['no_results'], 'warning')
-                return render_template('user/question.html', 
-                                     question=question_text, 
-                                     answers=[],
-                                     language_info=multilang_info)
+            # Content comes from the in-memory indexes, loaded once per process;
+            # syncing first keys the answer cache on the latest shared snapshot
+            _ensure_content_index()
             
-            # Prepare content for NLP processing
-            content_data = []
-            for item in content_items:
-                content_data.append({
-                    'id': item.id,
-                    'title': item.title,
-                    'content': item.content,
-                    'category': item.category.name,
-                    'category_id': item.category.id
-                })
+            # Repeat questions are served from the answer cache
+            cache_key = answer_cache.make_key(normalized_question, multilang_info['target_language'])
+            cached_result = answer_cache.get(cache_key)
             
-            # Check if question is in Hindi and use specialized extraction
-            detected_lang = app.multilang_processor.detect_language(question_text)
-            use_hindi_extractor = detected_lang in ['hi', 'hindi'] or any(
-                char in question_text for char in 'कखगघचछजझटठडढतथदधनपफबभमयरलवशषसहा'
-            )
-            
-            matches = []
-            
-            if use_hindi_extractor and hasattr(app, 'hindi_extractor'):
-                # Use Hindi content extractor for paragraph-level extraction
-                for content_item in content_data:
-                    relevant_paragraphs = app.hindi_extractor.extract_relevant_paragraphs(
-                        question_text, content_item['content'], max_paragraphs=3
-                    )
-                    
-                    if relevant_paragraphs:
-                        # Format the extracted paragraphs into a comprehensive answer
-                        formatted_answer = app.hindi_extractor.format_answer_with_paragraphs(
-                            relevant_paragraphs, question_text
-                        )
-                        
-                        # Create modified content item with extracted relevant content
-                        modified_item = content_item.copy()
-                        modified_item['content'] = formatted_answer['answer']
-                        modified_item['original_content'] = content_item['content']
-                        modified_item['extracted_paragraphs'] = len(relevant_paragraphs)
-                        modified_item['total_words'] = formatted_answer['total_words']
-                        
-                        matches.append((modified_item, formatted_answer['confidence']))
+            if cached_result is None:
+                if not nlp_processor.get_index_size():
+                    flash(response_template['no_results'], 'warning')
+                    return render_template('user/question.html', 
+                                         question=question_text, 
+                                         answers=[],
+                                         language_info=multilang_info)
                 
-                # Sort by confidence
-                matches.sort(key=lambda x: x[1], reverse=True)
-                matches = matches[:5]  # Take top 5
-            
-            # Use advanced transformer NLP if Hindi extractor didn't find enough or as fallback
-            if len(matches) < 2:
-                if hasattr(app, 'transformer_nlp') and app.transformer_nlp:
-                    try:
-                        transformer_matches = app.transformer_nlp.rank_answers(normalized_question, content_data)
-                        # Avoid duplicates if we already have Hindi extracted content
-                        for match in transformer_matches:
-                            if not any(existing[0]['id'] == match[0]['id'] for existing in matches):
-                                matches.append(match)
-                    except Exception as e:
-                        logging.warning(f"Transformer NLP failed, falling back: {e}")
-                        nlp_processor.build_content_index(content_data)
-                        traditional_matches = nlp_processor.find_best_answers(normalized_question, top_k=5)
-                        for match in traditional_matches:
-                            if not any(existing[0]['id'] == match[0]['id'] for existing in matches):
-                                matches.append(match)
-                else:
-                    # Fallback to basic NLP
-                    nlp_processor.build_content_index(content_data)
-                    traditional_matches = nlp_processor.find_best_answers(normalized_question, top_k=5)
-                    for match in traditional_matches:
-                        if not any(existing[0]['id'] == match[0]['id'] for existing in matches):
-                            matches.append(match)
-            
-            # Enhance with external knowledge
-            if hasattr(app, 'external_knowledge'):
-                try:
-                    enhanced_matches = app.external_knowledge.enhance_answer_with_external_knowledge(
-                        normalized_question, [match[0] for match in matches[:3]]
-                    )
-                    
-                    # Convert enhanced matches back to (item, score) format
-                    enhanced_scored = []
-                    for item in enhanced_matches:
-                        if item.get('is_external', False):
-                            enhanced_scored.append((item, item.get('confidence', 0.7)))
-                        else:
-                            # Find original score
-                            for match, score in matches:
-                                if match.get('id') == item.get('id'):
-                                    enhanced_scored.append((match, score))
-                                    break
-                    
-                    matches = enhanced_scored
-                except Exception as e:
-                    logging.warning(f"External knowledge enhancement failed: {e}")
-            
-            # Save question to database
-            best_answer_id = None
-            confidence_score = 0.0
-            
-            if matches:
-                best_match = matches[0]
-                best_answer_id = best_match[0].get('id')
-                confidence_score = best_match[1]
+                matches = _find_matches(question_text, normalized_question)
+                
+                best_answer_id = None
+                confidence_score = 0.0
+                
+                if matches:
+                    best_match = matches[0]
+                    best_answer_id = best_match[0].get('id')
+                    confidence_score = best_match[1]
+                
+                cached_result = {
+                    'answers': _prepare_answers(matches, normalized_question),
+                    'best_answer_id': best_answer_id,
+                    'confidence_score': confidence_score
+                }
+                answer_cache.set(cache_key, cached_result)
             
-            question = Question(
-                question_text=question_text,
-                session_id=session['session_id'],
-                best_answer_id=best_answer_id,
-                confidence_score=confidence_score
+            # Log the question and update analytics in the background; the
+            # public id lets the feedback form reference it right away
+            question_id = str(uuid.uuid4())
+            question_writer.submit_question(
+                question_id,
+                question_text,
+                session['session_id'],
+                cached_result['best_answer_id'],
+                cached_result['confidence_score']
             )
             
-            db.session.add(question)
-            db.session.commit()
-            
-            # Update analytics
-            analytics_manager.update_daily_analytics()
-            
-            # Prepare answers for display
-            answers = []
-            for match, score in matches:
-                if score > 0.1:  # Only show answers with reasonable confidence
-                    answer_data = {
-                        'title': match['title'],
-                        'content': match['content'],
-                        'category': match['category'],
-                        'confidence': round(score * 100, 1),
-                        'is_external': match.get('is_external', False),
-                        'source': match.get('source', 'Internal'),
-                        'url': match.get('url', '')
-                    }
-                    
-                    # Get detailed confidence metrics if transformer NLP is available
-                    if hasattr(app, 'transformer_nlp') and app.transformer_nlp:
-                        try:
-                            confidence_details = app.transformer_nlp.get_answer_confidence(
-                                normalized_question, match, score
-                            )
-                            answer_data['confidence_details'] = confidence_details
-                        except:
-                            pass
-                    
-                    answers.append(answer_data)
-            
             return render_template('user/question.html', 
                                  question=question_text, 
-                                 answers=answers,
-                                 question_id=question.id,
+                                 answers=cached_result['answers'],
+                                 question_id=question_id,
                                  language_info=multilang_info,
                                  response_template=response_template)
             
@@ -222,11 +566,9 @@ def feedback():
     was_helpful = request.form.get('helpful') == 'yes'
     
     if question_id:
-        question = Question.query.get(question_id)
-        if question:
-            question.was_helpful = was_helpful
-            db.session.commit()
-            flash('Thank you for your feedback!', 'success')
+        # Applied after the question itself is written
+        question_writer.submit_feedback(question_id, was_helpful)
+        flash('Thank you for your feedback!', 'success')
     
     return redirect(url_for('index'))
 
@@ -235,12 +577,23 @@ def feedback():
 def admin_dashboard():
     """Admin dashboard"""
     stats = analytics_manager.get_dashboard_stats()
-    return render_template('admin/dashboard.html', stats=stats)
+    return render_template('admin/dashboard.html', 
+                         stats=stats,
+                         answer_cache_stats=answer_cache.get_stats())
 
 @app.route('/admin/categories')
 def admin_categories():
     """Manage categories"""
-    categories = Category.query.all()
+    # Item counts come from one grouped query instead of loading every
+    # category's content items
+    category_rows = db.session.query(Category, func.count(ContentItem.id))\
+                              .outerjoin(ContentItem, ContentItem.category_id == Category.id)\
+                              .group_by(Category.id)\
+                              .order_by(Category.id).all()
+    categories = []
+    for category, content_count in category_rows:
+        category.content_count = content_count
+        categories.append(category)
     return render_template('admin/categories.html', categories=categories)
 
 @app.route('/admin/categories/add', methods=['POST'])
@@ -287,6 +640,7 @@ def edit_category(category_id):
     category.name = name
     category.description = description
     db.session.commit()
+    _rename_indexed_category(category_id, name)
     
     flash('Category updated successfully.', 'success')
     return redirect(url_for('admin_categories'))
@@ -313,7 +667,7 @@ def admin_content():
     page = request.args.get('page', 1, type=int)
     category_id = request.args.get('category', type=int)
     
-    query = ContentItem.query
+    query = ContentItem.query.options(joinedload(ContentItem.category))
     if category_id:
         query = query.filter_by(category_id=category_id)
     
@@ -351,11 +705,13 @@ def add_content():
         title=title,
         content=content,
         category_id=category_id,
-        processed_content=processed_content
+        processed_content=processed_content,
+        processed_version=nlp_processor.preprocessing_version
     )
     
     db.session.add(content_item)
     db.session.commit()
+    _index_content_item(content_item)
     
     flash('Content added successfully.', 'success')
     return redirect(url_for('admin_content'))
@@ -384,9 +740,11 @@ def edit_content(content_id):
     content_item.content = content
     content_item.category_id = category_id
     content_item.processed_content = nlp_processor.preprocess_text(f"{title} {content}")
+    content_item.processed_version = nlp_processor.preprocessing_version
     content_item.updated_at = datetime.utcnow()
     
     db.session.commit()
+    _index_content_item(content_item)
     
     flash('Content updated successfully.', 'success')
     return redirect(url_for('admin_content'))
@@ -398,6 +756,7 @@ def delete_content(content_id):
     
     db.session.delete(content_item)
     db.session.commit()
+    _unindex_content_item(content_id)
     
     flash('Content deleted successfully.', 'success')
     return redirect(url_for('admin_content'))
@@ -456,29 +815,40 @@ def upload_file():
                 flash(f'Error processing file: {error_message}', 'error')
                 return redirect(url_for('admin_content'))
             
-            # Create content items
+            # Create content items, preprocessing all rows in one spaCy pass
+            items = [item_data for item_data in items
+                     if item_data.get('title') and item_data.get('content')]
+            processed_contents = nlp_processor.preprocess_batch(
+                [f"{item_data['title']} {item_data['content']}" for item_data in items]
+            )
+            
             items_created = 0
-            for item_data in items:
-                if item_data.get('title') and item_data.get('content'):
-                    processed_content = nlp_processor.preprocess_text(
-                        f"{item_data['title']} {item_data['content']}"
-                    )
-                    
-                    content_item = ContentItem(
-                        title=item_data['title'][:200],  # Limit title length
-                        content=item_data['content'],
-                        category_id=category_id,
-                        processed_content=processed_content
-                    )
-                    
-                    db.session.add(content_item)
-                    items_created += 1
+            created_items = []
+            for item_data, processed_content in zip(items, processed_contents):
+                content_item = ContentItem(
+                    title=item_data['title'][:200],  # Limit title length
+                    content=item_data['content'],
+                    category_id=category_id,
+                    processed_content=processed_content,
+                    processed_version=nlp_processor.preprocessing_version
+                )
+                
+                db.session.add(content_item)
+                created_items.append(content_item)
+                items_created += 1
             
             # Update file upload record
             file_upload.processed = True
             file_upload.items_created = items_created
+            
+            # Flushed rows have their ids; the commit would expire them and
+            # reading them back for the index would cost queries per row
+            db.session.flush()
+            operation = _upsert_operation(created_items)
             db.session.commit()
             
+            _apply_index_change(operation)
+            
             # Clean up uploaded file
             try:
                 os.remove(file_path)
@@ -610,8 +980,13 @@ def api_collaborative_save(content_id):
             content_item = ContentItem.query.get(content_id)
             if content_item:
                 content_item.content = content
+                content_item.processed_content = nlp_processor.preprocess_text(
+                    f"{content_item.title} {content}"
+                )
+                content_item.processed_version = nlp_processor.preprocessing_version
                 content_item.updated_at = datetime.utcnow()
                 db.session.commit()
+                _index_content_item(content_item)
                 
                 return jsonify({'success': True, 'message': 'Content saved successfully'})
     
@@ -638,11 +1013,19 @@ def api_transformer_analyze():
             expansions = app.transformer_nlp.generate_query_expansion(text)
             result['analysis']['query_expansions'] = expansions
             
-            # Get embeddings info (without actual vectors for API response)
-            embeddings = app.transformer_nlp.get_embeddings(text)
+            # Embed the text and its expansions in one batch (vectors stay out of the response);
+            # the first expansion is always the original text
+            embeddings = app.transformer_nlp.get_embeddings_batch(expansions)
             result['analysis']['has_embeddings'] = embeddings is not None
             if embeddings is not None:
-                result['analysis']['embedding_dimension'] = len(embeddings)
+                result['analysis']['embedding_dimension'] = embeddings.shape[1]
+                norms = np.linalg.norm(embeddings, axis=1)
+                norms[norms == 0] = 1.0
+                similarities = embeddings[1:] @ embeddings[0] / (norms[1:] * norms[0])
+                result['analysis']['expansion_similarities'] = [
+                    {'query': query, 'similarity': round(float(similarity), 4)}
+                    for query, similarity in zip(expansions[1:], similarities)
+                ]
         
         except Exception as e:
             logging.error(f"Transformer analysis error: {e}")
@@ -652,6 +1035,26 @@ def api_transformer_analyze():
     
     return jsonify(result)
 
+@app.route('/healthz/live')
+def healthz_live():
+    """Liveness probe: the process is serving requests"""
+    return jsonify({'status': 'ok'})
+
+@app.route('/healthz/ready')
+def healthz_ready():
+    """Readiness probe: 200 once warmup finished, 503 before, with per-component timings"""
+    warmup = getattr(app, 'warmup', None)
+    if warmup is None:
+        return jsonify({'ready': True, 'state': 'disabled', 'components': {}})
+    
+    status = warmup.get_status()
+    return jsonify(status), 200 if status['ready'] else 503
+
+@app.route('/api/models')
+def api_models():
+    """API endpoint for load time and memory of each shared model"""
+    return jsonify(model_registry.get_stats())
+
 # Error handlers
 @app.errorhandler(404)
 def not_found_error(error):
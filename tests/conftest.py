@@ -0,0 +1,87 @@
+"""
+Shared fixtures: the app runs against a throwaway SQLite database with the
+optional subsystems (transformer, external knowledge, collaboration) off
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+_TMP_DIR = tempfile.mkdtemp(prefix='qa-tests-')
+
+# app.py reads its settings from the environment at import time
+os.environ.update({
+    'DATABASE_URL': f"sqlite:///{os.path.join(_TMP_DIR, 'test.db')}",
+    'INDEX_SNAPSHOT_DIR': '',
+    'EMBEDDING_CACHE_DIR': os.path.join(_TMP_DIR, 'embeddings'),
+    'ENABLE_TRANSFORMER': '0',
+    'ENABLE_EXTERNAL_KNOWLEDGE': '0',
+    'ENABLE_COLLABORATION': '0',
+    'WARMUP_ON_STARTUP': '0',
+    'QUESTION_FLUSH_MS': '0'
+})
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture(scope='session')
+def app():
+    from app import create_app
+    app = create_app({'TESTING': True, 'UPLOAD_FOLDER': os.path.join(_TMP_DIR, 'uploads')})
+    # Tests drive indexing themselves instead of racing a warmup thread
+    app.warmup = None
+    return app
+
+@pytest.fixture
+def database(app, monkeypatch):
+    """Empty tables, content indexes and answer cache for each test"""
+    import routes
+    from app import db
+    from nlp_processor import NLPProcessor
+    
+    nlp_processor = NLPProcessor()
+    # A blank spaCy model has no lemmatizer, so match on the cleaned text instead
+    if not nlp_processor.nlp or not nlp_processor.nlp.pipe_names:
+        monkeypatch.setattr(NLPProcessor, 'nlp', None)
+    monkeypatch.setattr(routes, 'nlp_processor', nlp_processor)
+    monkeypatch.setattr(routes, '_attached_snapshot', {'version': None})
+    routes.answer_cache.bump_corpus_version()
+    
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        yield db
+        db.session.remove()
+
+@pytest.fixture
+def client(app, database):
+    return app.test_client()
+
+@pytest.fixture
+def add_item(database):
+    """Write a ContentItem in the 'General' category"""
+    import routes
+    from models import Category, ContentItem
+    
+    def add(title, content):
+        category = Category.query.filter_by(name='General').first()
+        if category is None:
+            category = Category(name='General')
+            database.session.add(category)
+        item = ContentItem(title=title, content=content, category=category,
+                           processed_content=routes.nlp_processor.preprocess_text(f"{title} {content}"),
+                           processed_version=routes.nlp_processor.preprocessing_version)
+        database.session.add(item)
+        database.session.commit()
+        return item
+    return add
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """Shared index snapshots in a fresh directory, checked on every request"""
+    import routes
+    from index_snapshot import IndexSnapshotStore
+    
+    store = IndexSnapshotStore(str(tmp_path / 'index'), check_interval=0.0, max_deltas=2)
+    monkeypatch.setattr(routes, 'index_store', store)
+    return store
@@ -0,0 +1,35 @@
+import routes
+from answer_cache import AnswerCache
+
+def _ask(client, question):
+    return client.post('/ask', data={'question': question, 'language': 'en'})
+
+def test_set_discards_answers_computed_for_an_older_corpus():
+    cache = AnswerCache()
+    cache.set_corpus_version(3)
+    key = cache.make_key('office hours', 'en')
+    
+    cache.set_corpus_version(4)
+    cache.set(key, {'answers': []})
+    
+    assert cache.get(cache.make_key('office hours', 'en')) is None
+
+def test_answer_cache_follows_the_shared_snapshot(client, add_item, store):
+    item = add_item('Office hours', 'We are open from nine to five.')
+    add_item('Parking', 'Visitors park in the north garage.')
+    
+    _ask(client, 'When are office hours?')
+    assert routes.answer_cache.corpus_version == store.current_version()
+    
+    hits = routes.answer_cache.hits
+    _ask(client, 'When are office hours?')
+    assert routes.answer_cache.hits == hits + 1
+    
+    # Another worker removes the item; this worker must not answer from its cache
+    with store.exclusive():
+        version = store.publish_delta([{'op': 'remove', 'id': item.id}])
+    
+    response = _ask(client, 'When are office hours?')
+    assert routes.answer_cache.hits == hits + 1
+    assert routes.answer_cache.corpus_version == version
+    assert b'nine to five' not in response.data
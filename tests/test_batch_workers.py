@@ -0,0 +1,70 @@
+import threading
+import uuid
+
+import numpy as np
+import pytest
+
+import routes
+from inference_worker import MicroBatcher
+from models import Question
+from question_writer import QuestionWriter
+
+@pytest.fixture
+def writer(app, database):
+    writer = QuestionWriter(app, routes.analytics_manager, flush_interval_ms=50.0)
+    yield writer
+    writer.stop()
+
+def _submit(writer, public_id):
+    writer.submit_question(public_id, f"Question {public_id}", 'session', None, 0.5)
+
+def _payload(public_id):
+    return {'public_id': public_id, 'question_text': f"Question {public_id}", 'session_id': 'session',
+            'best_answer_id': None, 'confidence_score': 0.5}
+
+def test_failed_batch_is_retried_row_by_row(writer):
+    existing = str(uuid.uuid4())
+    writer._write([('question', _payload(existing))])
+    
+    # The duplicate public_id fails the batch commit; only that row is dropped
+    fresh = [str(uuid.uuid4()) for _ in range(3)]
+    writer._write([('question', _payload(public_id)) for public_id in [fresh[0], existing, fresh[1], fresh[2]]])
+    
+    assert writer.questions_written == 4
+    assert writer.failed == 1
+    assert Question.query.filter(Question.public_id.in_(fresh)).count() == 3
+
+def test_submissions_racing_stop_are_all_written(writer):
+    public_ids = [str(uuid.uuid4()) for _ in range(200)]
+    threads = [threading.Thread(target=_submit, args=(writer, public_id)) for public_id in public_ids]
+    for thread in threads[:100]:
+        thread.start()
+    stopper = threading.Thread(target=writer.stop)
+    stopper.start()
+    for thread in threads[100:]:
+        thread.start()
+    for thread in threads + [stopper]:
+        thread.join()
+    
+    assert writer._queue.empty()
+    assert Question.query.filter(Question.public_id.in_(public_ids)).count() == 200
+
+def test_micro_batcher_shares_one_encode_call():
+    calls = []
+    release = threading.Event()
+    
+    def encode(texts):
+        calls.append(len(texts))
+        release.wait(1.0)
+        return np.array([[len(text)] for text in texts], dtype=np.float32)
+    
+    batcher = MicroBatcher(encode, max_batch_size=8, max_wait_ms=50.0)
+    futures = [batcher.submit('x' * length) for length in range(1, 5)]
+    release.set()
+    
+    assert [future.result(timeout=1.0)[0] for future in futures] == [1, 2, 3, 4]
+    assert calls == [4]
+    
+    batcher.stop()
+    with pytest.raises(RuntimeError):
+        batcher.submit('late').result(timeout=1.0)
@@ -0,0 +1,56 @@
+from content_backfill import ProcessedContentBackfill
+from models import Category, ContentItem
+
+class FakeProcessor:
+    """Stamps processed text with its version; before_batch runs mid-backfill"""
+    
+    preprocessing_version = 'v2'
+    
+    def __init__(self, before_batch=None):
+        self.before_batch = before_batch
+    
+    def preprocess_batch(self, texts):
+        if self.before_batch:
+            self.before_batch()
+        return [f"v2 {text}" for text in texts]
+
+def _stale_items(database, count):
+    category = Category(name='General')
+    items = [ContentItem(title=f"Item {i}", content='Old text', category=category,
+                         processed_content='old', processed_version='v1') for i in range(count)]
+    database.session.add_all(items)
+    database.session.commit()
+    return [item.id for item in items]
+
+def test_backfill_updates_stale_rows_without_touching_updated_at(database):
+    item_ids = _stale_items(database, 3)
+    updated_at = {item.id: item.updated_at for item in ContentItem.query.all()}
+    
+    assert ProcessedContentBackfill(FakeProcessor(), chunk_size=2).run() == 3
+    
+    database.session.expire_all()
+    for item in ContentItem.query.filter(ContentItem.id.in_(item_ids)):
+        assert item.processed_version == 'v2'
+        assert item.processed_content == f"v2 {item.title} Old text"
+        assert item.updated_at == updated_at[item.id]
+
+def test_backfill_skips_rows_edited_while_it_ran(app, database):
+    first_id, edited_id = _stale_items(database, 2)
+    
+    def edit_in_another_request():
+        with app.app_context():
+            item = database.session.get(ContentItem, edited_id)
+            item.content = 'New text'
+            item.processed_content = 'new text'
+            item.processed_version = 'v2'
+            database.session.commit()
+    
+    updated_chunks = []
+    backfill = ProcessedContentBackfill(FakeProcessor(before_batch=edit_in_another_request))
+    
+    assert backfill.run(on_chunk=updated_chunks.append) == 1
+    assert [[item.id for item in chunk] for chunk in updated_chunks] == [[first_id]]
+    
+    database.session.expire_all()
+    edited = database.session.get(ContentItem, edited_id)
+    assert (edited.content, edited.processed_content) == ('New text', 'new text')
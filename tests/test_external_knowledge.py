@@ -0,0 +1,110 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from external_knowledge import ExternalKnowledgeConnector
+
+WIKIPEDIA_PAGES = {'query': {'pages': {
+    '3': {'title': 'Python (language)', 'index': 2, 'extract': 'A programming language.',
+          'fullurl': 'https://en.wikipedia.org/wiki/Python_(programming_language)'},
+    '1': {'title': 'Python', 'index': 1, 'extract': 'Python may refer to:',
+          'pageprops': {'disambiguation': ''}},
+    '2': {'title': 'Pythonidae', 'index': 3, 'extract': 'A family of snakes.',
+          'fullurl': 'https://en.wikipedia.org/wiki/Pythonidae'}
+}}}
+
+class FakeAPIServer(ThreadingHTTPServer):
+    """Local stand-in for the external APIs, one path per source
+    
+    Each path answers with responses[path] after delays[path] seconds;
+    every request is recorded in requests as (path, query, headers).
+    """
+    
+    daemon_threads = True
+    
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FakeAPIHandler)
+        self.responses = {}
+        self.delays = {}
+        self.requests = []
+        self.release = threading.Event()  # Ends pending delays on shutdown
+    
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server_address[1]}{path}"
+
+class FakeAPIHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        self.server.requests.append((url.path, parse_qs(url.query), dict(self.headers)))
+        self.server.release.wait(self.server.delays.get(url.path, 0.0))
+        
+        body = json.dumps(self.server.responses.get(url.path, {})).encode('utf-8')
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The client gave up at its timeout
+    
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def api_server(monkeypatch):
+    server = FakeAPIServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(ExternalKnowledgeConnector, 'WIKIPEDIA_API_URL', server.url('/wikipedia'))
+    monkeypatch.setattr(ExternalKnowledgeConnector, 'STACKOVERFLOW_API_URL', server.url('/stackoverflow'))
+    monkeypatch.setattr(ExternalKnowledgeConnector, 'GITHUB_API_URL', server.url('/github'))
+    yield server
+    server.release.set()
+    server.shutdown()
+    server.server_close()
+
+def test_slow_sources_are_dropped_at_the_deadline(api_server):
+    api_server.responses['/wikipedia'] = WIKIPEDIA_PAGES
+    api_server.delays['/stackoverflow'] = 5.0
+    api_server.delays['/github'] = 5.0
+    connector = ExternalKnowledgeConnector(deadline_seconds=0.3)
+    
+    start = time.monotonic()
+    results = connector.collect_external_results(connector.start_external_search('python'))
+    
+    assert time.monotonic() - start < 1.0
+    assert [result['title'] for result in results] == ['Python (language)', 'Pythonidae']
+    assert sorted(path for path, _, _ in api_server.requests) == ['/github', '/stackoverflow', '/wikipedia']
+
+def test_http_timeout_is_capped_by_the_deadline(api_server):
+    api_server.delays['/stackoverflow'] = 5.0
+    connector = ExternalKnowledgeConnector(request_timeout=5.0)
+    
+    start = time.monotonic()
+    results = connector._search_stackoverflow('python', deadline=time.monotonic() + 0.3)
+    
+    # The request gave up at the deadline, not after request_timeout
+    assert results == []
+    assert time.monotonic() - start < 1.0
+
+def test_no_request_once_the_deadline_passed(api_server):
+    connector = ExternalKnowledgeConnector()
+    
+    assert connector._search_stackoverflow('python', deadline=time.monotonic() - 1.0) == []
+    assert connector.search_wikipedia('python', deadline=time.monotonic() - 1.0) == []
+    assert api_server.requests == []
+
+def test_wikipedia_skips_disambiguation_pages(api_server):
+    api_server.responses['/wikipedia'] = WIKIPEDIA_PAGES
+    
+    articles = ExternalKnowledgeConnector().search_wikipedia('python')
+    
+    assert [article['title'] for article in articles] == ['Python (language)', 'Pythonidae']
+    [(path, query, headers)] = api_server.requests
+    assert query['gsrsearch'] == ['python']
+    assert headers['User-Agent'] == ExternalKnowledgeConnector.USER_AGENT
@@ -0,0 +1,129 @@
+import numpy as np
+import pytest
+
+import routes
+from ann_index import IVFIndex
+from index_snapshot import IndexSnapshotStore, OverlayTable
+from transformer_nlp import TransformerNLP
+
+@pytest.fixture
+def transformer(app, monkeypatch):
+    """Transformer processor without a model, as on a host where it cannot load"""
+    transformer_nlp = TransformerNLP()
+    monkeypatch.setattr(app, 'transformer_nlp', transformer_nlp, raising=False)
+    return transformer_nlp
+
+def _fake_encoder(transformer_nlp, dimension=8):
+    """Give transformer_nlp deterministic unit vectors instead of a model"""
+    def embed(texts):
+        vectors = np.array([np.random.default_rng(abs(hash(text)) % 2**32).normal(size=dimension)
+                            for text in texts], dtype=np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    
+    transformer_nlp._model_loaded = True
+    transformer_nlp._model = object()
+    transformer_nlp._embed_cached = embed
+    transformer_nlp._embed_query = lambda question: embed([question])[0]
+
+def test_delta_chain_falls_back_to_full_publish(store):
+    assert not store.can_publish_delta()
+    base = store.publish({'lexical': {'meta': {}}})
+    first = store.publish_delta([{'op': 'remove', 'id': 1}])
+    second = store.publish_delta([{'op': 'remove', 'id': 2}])
+    
+    assert store.delta_chain(second) == [base, first, second]
+    assert store.load_delta(second) == [{'op': 'remove', 'id': 2}]
+    assert not store.can_publish_delta()
+
+def test_index_without_embeddings_is_published_once(add_item, store, transformer):
+    add_item('Office hours', 'We are open from nine to five.')
+    routes._ensure_content_index()
+    version = store.current_version(refresh=True)
+    assert version is not None
+    
+    for _ in range(3):
+        routes._ensure_content_index()
+    
+    assert store.current_version(refresh=True) == version
+    assert transformer.has_embedding_index()
+
+def test_edits_are_published_as_deltas_and_replayed(add_item, store, transformer):
+    add_item('Office hours', 'We are open from nine to five.')
+    routes._ensure_content_index()
+    base = store.current_version(refresh=True)
+    
+    # Known words only, so the writer appends the row without refitting
+    item = add_item('Open hours', 'The office is open from nine.')
+    routes._index_content_item(item)
+    delta = store.current_version(refresh=True)
+    assert store.delta_chain(delta) == [base, delta]
+    
+    # A worker still serving the full snapshot catches up by replaying the delta
+    routes.nlp_processor.attach_snapshot(store.load(base)['lexical'])
+    routes._attached_snapshot['version'] = base
+    assert routes.nlp_processor.get_index_size() == 1
+    
+    routes._sync_index_snapshot(refresh=True)
+    
+    assert routes._attached_snapshot['version'] == delta
+    assert routes.nlp_processor.get_index_size() == 2
+    assert 'Open hours' in [candidate['title'] for candidate in routes.nlp_processor.retrieve_candidates('open hours')]
+    # The replayed row sits beside the memory-mapped snapshot instead of copying it
+    assert isinstance(routes.nlp_processor.content_items_cache, OverlayTable)
+    assert not routes.nlp_processor.content_vectors.base.data.flags.writeable
+
+def test_edit_that_refits_is_published_as_full_snapshot(add_item, store, transformer):
+    add_item('Office hours', 'We are open from nine to five.')
+    routes._ensure_content_index()
+    
+    item = add_item('Parking', 'Visitors park in the north garage.')
+    routes._index_content_item(item)
+    version = store.current_version(refresh=True)
+    
+    assert store.delta_chain(version) == [version]
+    assert [candidate['title'] for candidate in routes.nlp_processor.retrieve_candidates('north garage')] == ['Parking']
+
+def test_replayed_removal_keeps_the_dense_snapshot_mapped(tmp_path):
+    items = [{'id': i, 'title': f"Item {i}", 'content': f"content {i}", 'category': 'General', 'category_id': 1}
+             for i in range(20)]
+    writer = TransformerNLP()
+    _fake_encoder(writer)
+    writer.build_embedding_index(items)
+    store = IndexSnapshotStore(str(tmp_path / 'index'))
+    version = store.publish({'dense': writer.export_snapshot()})
+    
+    reader = TransformerNLP()
+    _fake_encoder(reader)
+    assert reader.attach_snapshot(store.load(version)['dense'])
+    changed = dict(items[3], title='Item three')
+    assert not reader.upsert_items([changed], allow_rebuild=False)
+    assert not reader.remove_item(5, allow_rebuild=False)
+    
+    assert isinstance(reader._passage_matrix.base, np.memmap)
+    assert len(reader._passage_matrix.appended) == 1
+    titles = {answer['id']: answer['title'] for answer, _ in reader.rank_answers('Item 7')}
+    assert sorted(titles) == [i for i in range(20) if i != 5]
+    assert titles[3] == 'Item three'
+
+def test_attach_reuses_the_published_ivf_index(tmp_path, monkeypatch):
+    items = [{'id': i, 'title': f"Item {i}", 'content': f"content {i}", 'category': 'General', 'category_id': 1}
+             for i in range(200)]
+    writer = TransformerNLP(ann_min_rows=50)
+    _fake_encoder(writer)
+    writer.build_embedding_index(items)
+    assert writer._ann_index is not None
+    
+    store = IndexSnapshotStore(str(tmp_path / 'index'))
+    version = store.publish({'dense': writer.export_snapshot()})
+    
+    def no_training(self, vectors):
+        raise AssertionError("attach_snapshot retrained the IVF index")
+    monkeypatch.setattr(IVFIndex, 'build', no_training)
+    
+    reader = TransformerNLP(ann_min_rows=50)
+    _fake_encoder(reader)
+    assert reader.attach_snapshot(store.load(version)['dense'])
+    
+    assert reader._ann_index.get_stats() == writer._ann_index.get_stats()
+    assert [answer['id'] for answer, _ in reader.rank_answers('Item 7', top_k=3)] == \
+           [answer['id'] for answer, _ in writer.rank_answers('Item 7', top_k=3)]
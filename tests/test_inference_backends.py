@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+import transformer_nlp as transformer_module
+from inference_backends import (AGREEMENT_SAMPLES, MIN_AGREEMENT, benchmark_backend, create_backend,
+                                embedding_agreement)
+from model_registry import DEFAULT_TRANSFORMER_MODEL, model_registry
+from transformer_nlp import TransformerNLP
+
+class FakeBackend:
+    """Deterministic per-text vectors, optionally pushed away from the fp32 ones"""
+    
+    def __init__(self, name='fp32', noise=0.0, dimension=16):
+        self.name = name
+        self.noise = noise
+        self.dimension = dimension
+    
+    def encode(self, texts, max_length=512):
+        rows = []
+        for text in texts:
+            rng = np.random.default_rng(sum(map(ord, text)))
+            row = rng.normal(size=self.dimension)
+            rows.append(row + self.noise * rng.normal(size=self.dimension))
+        return np.array(rows, dtype=np.float32)
+
+@pytest.fixture
+def fp32_model():
+    """The production model, if it is already on disk"""
+    pytest.importorskip('torch')
+    pytest.importorskip('transformers')
+    try:
+        return model_registry.get_transformer(DEFAULT_TRANSFORMER_MODEL, local_files_only=True)
+    except Exception as e:
+        pytest.skip(f"{DEFAULT_TRANSFORMER_MODEL} is not available offline: {e}")
+
+@pytest.mark.parametrize('name', ['int8', 'onnx'])
+def test_backend_agrees_with_fp32(fp32_model, name, tmp_path):
+    if name == 'onnx':
+        pytest.importorskip('onnxruntime')
+    tokenizer, model = fp32_model
+    reference = create_backend('fp32', DEFAULT_TRANSFORMER_MODEL, tokenizer, model)
+    backend = create_backend(name, DEFAULT_TRANSFORMER_MODEL, tokenizer, model, onnx_dir=str(tmp_path))
+    
+    assert embedding_agreement(reference, backend) >= MIN_AGREEMENT
+
+def test_agreement_is_the_lowest_cosine():
+    reference = FakeBackend()
+    
+    assert embedding_agreement(reference, FakeBackend()) == pytest.approx(1.0)
+    assert embedding_agreement(reference, FakeBackend(noise=0.5)) < MIN_AGREEMENT
+
+@pytest.mark.parametrize('noise, expected', [(0.0, 'int8'), (0.5, 'fp32')])
+def test_disagreeing_backend_falls_back_to_fp32(monkeypatch, noise, expected):
+    backends = {'fp32': FakeBackend(), 'int8': FakeBackend('int8', noise=noise)}
+    monkeypatch.setattr(transformer_module, 'create_backend', lambda name, *args, **kwargs: backends[name])
+    
+    transformer_nlp = TransformerNLP(inference_backend='int8')
+    transformer_nlp._load_backend()
+    
+    assert transformer_nlp._backend.name == expected
+
+def test_benchmark_reports_rows_per_second():
+    stats = benchmark_backend(FakeBackend('int8'), AGREEMENT_SAMPLES * 10, batch_size=8)
+    
+    assert stats['backend'] == 'int8'
+    assert stats['rows'] == len(AGREEMENT_SAMPLES) * 10
+    assert stats['rows_per_second'] > 0
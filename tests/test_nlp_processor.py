@@ -0,0 +1,62 @@
+import pytest
+
+from nlp_processor import NLPProcessor
+
+def _item(item_id, title, content):
+    return {'id': item_id, 'title': title, 'content': content, 'category': 'General', 'category_id': 1}
+
+@pytest.fixture
+def processor(monkeypatch):
+    # Match on the cleaned text, whatever spaCy model is installed
+    monkeypatch.setattr(NLPProcessor, 'nlp', None)
+    processor = NLPProcessor()
+    processor.build_content_index([
+        _item(1, 'Office hours', 'We are open from nine to five.'),
+        _item(2, 'Holidays', 'The office is closed on public holidays.')
+    ])
+    return processor
+
+def test_upsert_with_new_terms_refits_right_away(processor):
+    processor.upsert_content_item(_item(3, 'Parking', 'Visitors park in the north garage.'))
+    
+    assert processor._pending_changes == 0
+    assert [item['id'] for item in processor.retrieve_candidates('north garage')] == [3]
+
+def test_upsert_with_known_terms_defers_the_refit(processor):
+    processor.upsert_content_item(_item(3, 'Office holidays', 'The office is open on holidays.'))
+    
+    assert processor._pending_changes == 1
+    assert 3 in [item['id'] for item in processor.retrieve_candidates('office holidays')]
+
+@pytest.fixture
+def capped_processor(monkeypatch):
+    # More distinct words than the vectorizer's max_features
+    monkeypatch.setattr(NLPProcessor, 'nlp', None)
+    processor = NLPProcessor()
+    items = [_item(i, f'topic{i}', ' '.join(f'word{i}x{j}' for j in range(9))) for i in range(700)]
+    processor.build_content_index(items, processed_texts=[f"{item['title']} {item['content']}" for item in items])
+    assert len(processor.tfidf_vectorizer.vocabulary_) == processor.tfidf_vectorizer.max_features
+    return processor
+
+def _count_refits(monkeypatch, processor):
+    refits = []
+    original = processor._refit_index
+    monkeypatch.setattr(processor, '_refit_index', lambda: refits.append(1) or original())
+    return refits
+
+def test_capped_vocabulary_defers_refit_for_unseen_words(capped_processor, monkeypatch):
+    refits = _count_refits(monkeypatch, capped_processor)
+    for item_id in range(1000, 1010):
+        capped_processor.upsert_content_item(_item(item_id, 'Parking', f'Visitors park in garage {item_id}.'))
+    
+    assert refits == []
+    assert capped_processor._pending_changes == 10
+
+def test_batched_upsert_refits_at_most_once(capped_processor, monkeypatch):
+    refits = _count_refits(monkeypatch, capped_processor)
+    items = [_item(item_id, f'Upload {item_id}', f'Uploaded row number{item_id}.') for item_id in range(1000, 1200)]
+    capped_processor.upsert_content_items(items)
+    
+    assert len(refits) == 1
+    assert capped_processor.get_index_size() == 900
+    assert capped_processor._pending_changes == 0
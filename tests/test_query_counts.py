@@ -0,0 +1,78 @@
+import io
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+import routes
+from models import Category, ContentItem, Question
+
+@contextmanager
+def count_queries(database):
+    """Count the SQL statements run inside the block"""
+    statements = []
+    
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    
+    event.listen(database.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(database.engine, 'before_cursor_execute', before_cursor_execute)
+
+def _seed(database, rows):
+    """rows content items and answered questions spread over a few categories"""
+    categories = [Category(name=f"Category {i}") for i in range(4)]
+    database.session.add_all(categories)
+    items = [ContentItem(title=f"Item {i}", content=f"Content of item {i}", category=categories[i % 4])
+             for i in range(rows)]
+    database.session.add_all(items)
+    database.session.flush()
+    database.session.add_all([
+        Question(question_text=f"Question {i}", session_id='s', best_answer_id=item.id, confidence_score=0.5)
+        for i, item in enumerate(items)
+    ])
+    database.session.commit()
+    # Later reads must not be served from the session's identity map
+    database.session.expunge_all()
+
+def _count(database, rows, action):
+    _seed(database, rows)
+    with count_queries(database) as statements:
+        action()
+    database.drop_all()
+    database.create_all()
+    return len(statements)
+
+@pytest.mark.parametrize('action', [
+    lambda client: routes.analytics_manager.get_recent_questions(limit=100),
+    lambda client: client.get('/admin/categories'),
+    lambda client: client.get('/admin/content')
+], ids=['recent_questions', 'admin_categories', 'admin_content'])
+def test_listing_query_count_does_not_grow_with_rows(client, database, action):
+    few = _count(database, 5, lambda: action(client))
+    many = _count(database, 60, lambda: action(client))
+    assert few == many
+
+def test_upload_query_count_does_not_grow_with_rows(client, database):
+    category = Category(name='General')
+    database.session.add(category)
+    database.session.commit()
+    category_id = category.id
+    database.session.expunge_all()
+    
+    def upload(rows):
+        text = '\n\n'.join(f"Title {i}\nUploaded content number {i}" for i in range(rows))
+        with count_queries(database) as statements:
+            client.post('/admin/upload', data={
+                'category_id': category_id,
+                'file': (io.BytesIO(text.encode('utf-8')), 'content.txt')
+            }, content_type='multipart/form-data')
+        # SQLite inserts ORM rows one statement each, so only reads are compared
+        return len([statement for statement in statements if statement.startswith('SELECT')])
+    
+    few = upload(5)
+    many = upload(60)
+    assert ContentItem.query.count() == 65
+    assert few == many
@@ -0,0 +1,64 @@
+import time
+
+import pytest
+
+import routes
+from warmup import WarmupManager
+
+class FlakyStep:
+    """Fails the first `failures` calls, then succeeds"""
+    
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+    
+    def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise RuntimeError("model not available yet")
+
+def _finish(warmup, app):
+    started = warmup.start_background(app)
+    warmup._thread.join()
+    return started
+
+def test_failed_required_step_is_retried_by_a_later_request(app):
+    model, index = FlakyStep(failures=1), FlakyStep(failures=0)
+    warmup = WarmupManager(retry_seconds=0.0)
+    warmup.add_step('model', model)
+    warmup.add_step('index', index)
+    
+    assert _finish(warmup, app)
+    assert warmup.get_status()['state'] == 'failed'
+    
+    assert _finish(warmup, app)
+    status = warmup.get_status()
+    assert status['ready']
+    assert status['components']['model']['attempts'] == 2
+    assert (model.calls, index.calls) == (2, 1)
+    assert 'retry_in_seconds' not in status
+    
+    # Nothing left to retry
+    assert not warmup.start_background(app)
+
+def test_retries_back_off(app):
+    warmup = WarmupManager(retry_seconds=10.0, max_retry_seconds=25.0)
+    warmup.add_step('transformer_model', FlakyStep(failures=5), required=False)
+    
+    _finish(warmup, app)
+    delays = [warmup._retry_at - time.monotonic()]
+    for _ in range(2):
+        warmup.run()
+        delays.append(warmup._retry_at - time.monotonic())
+    
+    # Optional steps keep the worker ready while they are retried
+    assert warmup.ready
+    assert delays == pytest.approx([10.0, 20.0, 25.0], abs=0.5)
+    assert not warmup.start_background(app)
+
+def test_transformer_step_is_skipped_without_a_transformer(app):
+    assert app.transformer_nlp is None
+    warmup = WarmupManager()
+    routes.register_warmup_steps(warmup)
+    
+    assert 'transformer_model' not in [name for name, _, _ in warmup._steps]
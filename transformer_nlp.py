@@ -8,28 +8,145 @@ import numpy as np
 from typing import List, Dict, Tuple, Optional
 import re
 import json
+import threading
 from datetime import datetime
-
-# Import with fallback handling
-try:
-    from transformers import AutoTokenizer, AutoModel
-    import torch
-    TRANSFORMERS_AVAILABLE = True
-except ImportError:
-    TRANSFORMERS_AVAILABLE = False
+from embedding_cache import EmbeddingCache
+from ann_index import IVFIndex
+from index_snapshot import OverlayTable, StackedRows
+from model_registry import model_registry, DEFAULT_TRANSFORMER_MODEL, TRANSFORMERS_AVAILABLE
+from inference_backends import MIN_AGREEMENT, create_backend, embedding_agreement, set_num_threads
+from inference_worker import MicroBatcher
 
 class TransformerNLP:
     """Advanced NLP processor using transformer models for semantic understanding"""
     
-    def __init__(self):
+    def __init__(self, cache_dir: Optional[str] = None, ann_min_rows: int = 20000,
+                 ann_lists: Optional[int] = None, ann_probe: int = 8, ann_candidates: int = 200,
+                 inference_backend: str = 'fp32', num_threads: Optional[int] = None,
+                 onnx_dir: Optional[str] = None, batch_wait_ms: float = 0.0,
+                 max_batch_size: int = 32, passage_words: int = 128, passage_overlap: int = 32,
+                 local_files_only: bool = False):
         self.logger = logging.getLogger(__name__)
-        self.model = None
-        self.tokenizer = None
         self.device = 'cpu'  # Use CPU for compatibility
-        self.model_name = 'sentence-transformers/all-MiniLM-L6-v2'  # Lightweight model
+        self.model_name = DEFAULT_TRANSFORMER_MODEL  # Lightweight model
         self.max_length = 512
         
-        self._load_model()
+        # Long content is embedded as overlapping passages of passage_words
+        # words, sharing passage_overlap words with the previous one
+        self.passage_words = passage_words
+        self.passage_overlap = min(passage_overlap, passage_words - 1)
+        
+        # Precomputed embedding index, one row per content item except the
+        # passage matrix, whose rows point back to their item row
+        self._passage_matrix = None  # L2-normalised float32 (passages, dim)
+        self._passage_owner = None  # item row of each passage
+        self._title_matrix = None
+        self._length_factors = None
+        self._active_rows = None  # False for rows tombstoned by updates/deletes
+        self._index_items = []
+        self._index_entities = []
+        self._row_by_id = {}
+        self._index_built = False
+        self._index_lock = threading.RLock()
+        
+        # Approximate search replaces the full scan once the index is large;
+        # ann_probe and ann_candidates trade recall for speed
+        self.ann_min_rows = ann_min_rows
+        self.ann_lists = ann_lists
+        self.ann_probe = ann_probe
+        self.ann_candidates = ann_candidates
+        self._ann_index = None
+        
+        # Content embeddings persisted across restarts and shared by workers
+        self.cache_dir = cache_dir
+        self.embedding_cache = None
+        self.embedding_key = None  # Model and backend the vectors come from
+        
+        # Weights come from the shared model registry on first use; the
+        # backend (fp32, int8 or onnx) runs the forward pass
+        self._model = None
+        self._tokenizer = None
+        self._backend = None
+        self.inference_backend = inference_backend
+        self.num_threads = num_threads
+        self.onnx_dir = onnx_dir
+        self.local_files_only = local_files_only
+        
+        # Query embeddings from concurrent requests share forward passes when
+        # batch_wait_ms > 0
+        self.query_batcher = None
+        if batch_wait_ms > 0:
+            self.query_batcher = MicroBatcher(
+                self._embed_normalized, max_batch_size=max_batch_size, max_wait_ms=batch_wait_ms
+            )
+        self._model_loaded = False
+        self._model_lock = threading.Lock()
+    
+    @property
+    def model(self):
+        self.load_model()
+        return self._model
+    
+    @property
+    def tokenizer(self):
+        self.load_model()
+        return self._tokenizer
+    
+    def load_model(self) -> None:
+        """Fetch the model from the registry once, e.g. during warmup"""
+        if self._model_loaded:
+            return
+        
+        with self._model_lock:
+            if self._model_loaded:
+                return
+            
+            self._load_model()
+            if self._model:
+                self._load_backend()
+            if self._backend:
+                # Backends disagree slightly, so each keeps its own vectors
+                self.embedding_key = self.model_name
+                if self._backend.name != 'fp32':
+                    self.embedding_key = f"{self.model_name}-{self._backend.name}"
+                if self.cache_dir:
+                    self.embedding_cache = EmbeddingCache(self.cache_dir, self.embedding_key)
+            self._model_loaded = True
+    
+    def _load_backend(self) -> None:
+        """Set up the configured inference backend, falling back to fp32"""
+        set_num_threads(self.num_threads)
+        fp32_backend = create_backend('fp32', self.model_name, self._tokenizer, self._model)
+        self._backend = fp32_backend
+        if self.inference_backend == 'fp32':
+            return
+        
+        try:
+            backend = create_backend(
+                self.inference_backend, self.model_name, self._tokenizer, self._model,
+                onnx_dir=self.onnx_dir, num_threads=self.num_threads
+            )
+            agreement = embedding_agreement(fp32_backend, backend)
+        except Exception as e:
+            self.logger.warning(f"Could not set up {self.inference_backend} backend, using fp32: {e}")
+            return
+        
+        # Only serve from the faster backend if its embeddings match fp32
+        if agreement < MIN_AGREEMENT:
+            self.logger.warning(
+                f"{self.inference_backend} backend agreement {agreement:.4f} is below "
+                f"{MIN_AGREEMENT}, using fp32"
+            )
+            return
+        
+        self._backend = backend
+        self.logger.info(f"Using {backend.name} inference backend (agreement {agreement:.4f})")
+    
+    @property
+    def backend(self):
+        """Inference backend in use, None without a model"""
+        self.load_model()
+        return self._backend
     
     def _load_model(self):
         """Load transformer model with fallback"""
@@ -39,45 +156,54 @@ class TransformerNLP:
         
         try:
             # Try to load a lightweight sentence transformer model
-            self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
-            self.model = AutoModel.from_pretrained(self.model_name)
-            self.model.eval()
+            self._tokenizer, self._model = model_registry.get_transformer(
+                self.model_name, local_files_only=self.local_files_only
+            )
             self.logger.info(f"Loaded transformer model: {self.model_name}")
         except Exception as e:
             self.logger.warning(f"Could not load transformer model: {e}")
             # Try alternative models
             try:
                 self.model_name = 'distilbert-base-uncased'
-                self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
-                self.model = AutoModel.from_pretrained(self.model_name)
-                self.model.eval()
+                self._tokenizer, self._model = model_registry.get_transformer(
+                    self.model_name, local_files_only=self.local_files_only
+                )
                 self.logger.info(f"Loaded fallback model: {self.model_name}")
             except Exception as e2:
                 self.logger.error(f"Could not load any transformer model: {e2}")
-                self.model = None
-                self.tokenizer = None
+                self._model = None
+                self._tokenizer = None
     
     def get_embeddings(self, text: str) -> Optional[np.ndarray]:
         """Get embeddings for text using transformer model"""
-        if not self.model or not self.tokenizer:
+        embeddings = self.get_embeddings_batch([text])
+        if embeddings is None:
+            return None
+        return embeddings[0]
+    
+    def get_embeddings_batch(self, texts: List[str], batch_size: int = 32) -> Optional[np.ndarray]:
+        """Get embeddings for many texts, one row per text in input order
+        
+        Texts are sorted by length so each batch is only padded to its own
+        longest member, and pooling ignores padding through the attention mask.
+        """
+        backend = self.backend
+        if backend is None:
             return None
         
         try:
-            # Tokenize and encode
-            inputs = self.tokenizer(
-                text,
-                return_tensors='pt',
-                max_length=self.max_length,
-                truncation=True,
-                padding=True
-            )
+            embeddings = np.zeros((len(texts), backend.dimension), dtype=np.float32)
+            order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
             
-            # Get embeddings
-            with torch.no_grad():
-                outputs = self.model(**inputs)
-                # Use mean pooling of last hidden states
-                embeddings = outputs.last_hidden_state.mean(dim=1)
-                return embeddings.numpy().flatten()
+            for start in range(0, len(order), batch_size):
+                batch_indices = order[start:start + batch_size]
+                
+                # Tokenize, encode and mean-pool over real tokens
+                embeddings[batch_indices] = backend.encode(
+                    [texts[i] for i in batch_indices], max_length=self.max_length
+                )
+            
+            return embeddings
         
         except Exception as e:
             self.logger.error(f"Error getting embeddings: {e}")
@@ -89,12 +215,12 @@ class TransformerNLP:
             return self._fallback_similarity(text1, text2)
         
         try:
-            emb1 = self.get_embeddings(text1)
-            emb2 = self.get_embeddings(text2)
+            embeddings = self.get_embeddings_batch([text1, text2])
             
-            if emb1 is None or emb2 is None:
+            if embeddings is None:
                 return self._fallback_similarity(text1, text2)
             
+            emb1, emb2 = embeddings
             # Cosine similarity
             similarity = np.dot(emb1, emb2) / (np.linalg.norm(emb1) * np.linalg.norm(emb2))
             return float(similarity)
@@ -178,8 +304,473 @@ class TransformerNLP:
         
         return unique_queries[:5]  # Limit to 5 expansions
     
-    def rank_answers(self, question: str, answers: List[Dict]) -> List[Tuple[Dict, float]]:
-        """Rank answers using advanced scoring"""
+    def has_embedding_index(self) -> bool:
+        """Check whether the precomputed embedding index has been built"""
+        return self._index_built
+    
+    def _embed_normalized(self, texts: List[str]) -> Optional[np.ndarray]:
+        """Embed texts into an L2-normalised float32 matrix"""
+        matrix = self.get_embeddings_batch(texts)
+        if matrix is None:
+            return None
+        
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+    
+    def _embed_query(self, question: str) -> Optional[np.ndarray]:
+        """L2-normalised embedding of a question, batched with concurrent requests"""
+        if self.query_batcher is None:
+            matrix = self._embed_normalized([question])
+            return None if matrix is None else matrix[0]
+        
+        return self.query_batcher.embed(question)
+    
+    def _embed_cached(self, texts: List[str]) -> Optional[np.ndarray]:
+        """Embed texts, reusing vectors from the embedding cache where possible"""
+        self.load_model()
+        if self.embedding_cache is None:
+            return self._embed_normalized(texts)
+        
+        vectors = self.embedding_cache.get_many(texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            fresh = self._embed_normalized(missing_texts)
+            if fresh is None:
+                return None
+            self.embedding_cache.put_many(missing_texts, fresh)
+            for i, vector in zip(missing, fresh):
+                vectors[i] = vector
+        
+        return np.asarray(vectors, dtype=np.float32).reshape(len(texts), -1)
+    
+    def get_content_embeddings(self) -> Optional[np.ndarray]:
+        """Return the passage embeddings of all live items"""
+        with self._index_lock:
+            if self._passage_matrix is None:
+                return None
+            return self._passage_matrix[self._active_rows[self._passage_owner]]
+    
+    def _item_passages(self, item: Dict) -> List[str]:
+        """Overlapping passages of an item's content, each prefixed with its title
+        
+        Items up to passage_words words yield the single passage "title content".
+        """
+        title = item.get('title', '')
+        content = item.get('content', '')
+        words = content.split()
+        if len(words) <= self.passage_words:
+            return [f"{title} {content}"]
+        
+        stride = self.passage_words - self.passage_overlap
+        passages = []
+        for start in range(0, len(words), stride):
+            passages.append(f"{title} {' '.join(words[start:start + self.passage_words])}")
+            if start + self.passage_words >= len(words):
+                break
+        return passages
+    
+    def _item_texts(self, item: Dict) -> List[str]:
+        """Texts embedded for a content item: its passages, and the title alone"""
+        return self._item_passages(item) + [item.get('title', '')]
+    
+    def _encode_items(self, items: List[Dict]) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """Compute passage and title embeddings for content items
+        
+        Returns (passage_matrix, passage_counts, title_matrix); the passages
+        of each item are consecutive rows of passage_matrix.
+        """
+        item_passages = [self._item_passages(item) for item in items]
+        passages = [passage for passages in item_passages for passage in passages]
+        # Passages and titles share one cache lookup and one cache write
+        matrix = self._embed_cached(passages + [item.get('title', '') for item in items])
+        if matrix is None:
+            return None
+        passage_matrix, title_matrix = matrix[:len(passages)], matrix[len(passages):]
+        passage_counts = np.array([len(passages) for passages in item_passages], dtype=np.intp)
+        return passage_matrix, passage_counts, title_matrix
+    
+    def compact_embedding_cache(self, items: List[Dict]) -> int:
+        """Drop cached embeddings not belonging to any of items, return rows dropped"""
+        if self.embedding_cache is None:
+            return 0
+        
+        live_texts = [text for item in items for text in self._item_texts(item)]
+        return self.embedding_cache.compact(live_texts)
+    
+    def _entity_set(self, text: str) -> set:
+        return {e['text'].lower() for e in self.extract_entities(text)}
+    
+    def build_embedding_index(self, items: List[Dict]) -> None:
+        """Precompute embeddings for all content items"""
+        with self._index_lock:
+            self._drop_matrices()
+            self._index_items = []
+            self._index_entities = []
+            self._row_by_id = {}
+            self._index_built = True
+        
+        if not items:
+            return
+        
+        self.logger.info(f"Building embedding index for {len(items)} items")
+        self.upsert_items(items)
+    
+    def upsert_items(self, items: List[Dict], allow_rebuild: bool = True) -> bool:
+        """Add or replace content items in the embedding index
+        
+        Only the changed items go through the model. Replaced and removed
+        rows are tombstoned and dropped on the next compaction. Returns True
+        when the index was compacted or its IVF index retrained;
+        allow_rebuild=False (replaying a delta whose writer did neither)
+        only appends, so the rows of an attached snapshot are never copied.
+        """
+        if not items:
+            return False
+        
+        encoded = self._encode_items(items) if self.model else None
+        
+        with self._index_lock:
+            if not self._index_built:
+                return False
+            
+            for item in items:
+                self._tombstone(item.get('id'))
+            
+            start_row = len(self._index_items)
+            for offset, item in enumerate(items):
+                self._row_by_id[item.get('id')] = start_row + offset
+                self._index_items.append(item)
+                self._index_entities.append(
+                    self._entity_set(f"{item.get('title', '')} {item.get('content', '')}")
+                )
+            
+            if encoded is None or (self._passage_matrix is None and start_row > 0):
+                # Without vectors for every row, rank_answers falls back to
+                # scoring items one by one
+                self._drop_matrices()
+                return allow_rebuild and self._compact_if_sparse()
+            
+            passage_matrix, passage_counts, title_matrix = encoded
+            passage_owner = np.repeat(np.arange(start_row, start_row + len(items)), passage_counts)
+            length_factors = np.array(
+                [min(1.0, len(item.get('content', '')) / 500) for item in items],
+                dtype=np.float32
+            )
+            active = np.ones(len(items), dtype=bool)
+            
+            if self._passage_matrix is None:
+                start_passage = 0
+                self._passage_matrix = StackedRows(passage_matrix)
+                self._passage_owner = passage_owner
+                self._title_matrix = StackedRows(title_matrix)
+                self._length_factors = length_factors
+                self._active_rows = active
+            else:
+                # Only the per-row bookkeeping is copied; the matrices keep their base
+                start_passage = len(self._passage_matrix)
+                self._passage_matrix = self._passage_matrix.append(passage_matrix)
+                self._passage_owner = np.concatenate([self._passage_owner, passage_owner])
+                self._title_matrix = self._title_matrix.append(title_matrix)
+                self._length_factors = np.concatenate([self._length_factors, length_factors])
+                self._active_rows = np.concatenate([self._active_rows, active])
+            
+            compacted = allow_rebuild and self._compact_if_sparse()
+            retrained = self._refresh_ann_index(start_passage, passage_matrix, allow_retrain=allow_rebuild)
+            return compacted or retrained
+    
+    def remove_item(self, item_id: int, allow_rebuild: bool = True) -> bool:
+        """Remove a content item from the embedding index, returning True when it was compacted"""
+        with self._index_lock:
+            if not self._tombstone(item_id):
+                return False
+            if not allow_rebuild or not self._compact_if_sparse():
+                return False
+            self._refresh_ann_index()
+            return True
+    
+    def update_category_name(self, category_id: int, name: str) -> None:
+        """Propagate a category rename to the indexed items"""
+        with self._index_lock:
+            # Replaced rather than edited: readers may still hold the old items
+            for row in self._row_by_id.values():
+                item = self._index_items[row]
+                if item.get('category_id') == category_id:
+                    self._index_items[row] = {**item, 'category': name}
+    
+    def clear_index(self) -> None:
+        """Forget the embedding index so it is rebuilt on next use"""
+        with self._index_lock:
+            self._drop_matrices()
+            self._index_items = []
+            self._index_entities = []
+            self._row_by_id = {}
+            self._index_built = False
+    
+    def export_snapshot(self) -> Optional[Dict]:
+        """Index state as a snapshot part for index_snapshot.IndexSnapshotStore
+        
+        meta['dense'] is False when the index holds no embeddings (no model
+        or an empty corpus); workers attach such a part as it is instead of
+        rebuilding. The IVF centroids and lists travel with the matrix.
+        """
+        with self._index_lock:
+            if not self._index_built:
+                return None
+            
+            # Snapshots never carry tombstones
+            self._compact_if_sparse(force=True)
+            part = {
+                'arrays': {
+                    'ids': np.array([item.get('id') for item in self._index_items], dtype=np.int64)
+                },
+                'tables': {
+                    'items': list(self._index_items),
+                    'entities': [sorted(entities) for entities in self._index_entities]
+                },
+                'meta': {'embedding_key': self.embedding_key, 'dense': self._passage_matrix is not None}
+            }
+            if self._passage_matrix is None:
+                return part
+            
+            part['arrays'].update({
+                'passage_matrix': self._passage_matrix.stacked(),
+                'passage_owner': self._passage_owner,
+                'title_matrix': self._title_matrix.stacked(),
+                'length_factors': self._length_factors
+            })
+            # Compaction may have dropped the approximate index; train it once here, not per worker
+            self._refresh_ann_index()
+            if self._ann_index is not None:
+                for name, array in self._ann_index.export_arrays().items():
+                    part['arrays'][f"ann_{name}"] = array
+                part['meta']['ann_trained_rows'] = self._ann_index.trained_rows
+            return part
+    
+    def attach_snapshot(self, part: Dict) -> bool:
+        """Serve from a loaded snapshot part, keeping its arrays memory-mapped
+        
+        Returns False when the snapshot was embedded with another model or
+        backend, in which case the caller builds its own index. Swapping and
+        the overlay of replayed changes follow NLPProcessor.attach_snapshot.
+        """
+        meta = part['meta']
+        dense = meta.get('dense', True)
+        if dense:
+            self.load_model()
+            if meta.get('embedding_key') != self.embedding_key:
+                return False
+        
+        arrays = part['arrays']
+        row_by_id = {int(item_id): row for row, item_id in enumerate(arrays['ids'])}
+        
+        with self._index_lock:
+            self._drop_matrices()
+            if dense:
+                self._passage_matrix = StackedRows(arrays['passage_matrix'])
+                self._passage_owner = arrays['passage_owner']
+                self._title_matrix = StackedRows(arrays['title_matrix'])
+                self._length_factors = arrays['length_factors']
+                self._active_rows = np.ones(len(row_by_id), dtype=bool)
+            self._index_items = OverlayTable(part['tables']['items'])
+            self._index_entities = OverlayTable(part['tables']['entities'])
+            self._row_by_id = row_by_id
+            self._index_built = True
+            if 'ann_centroids' in arrays:
+                self._ann_index = IVFIndex.from_arrays(
+                    arrays['ann_centroids'], arrays['ann_list_rows'], arrays['ann_list_offsets'],
+                    trained_rows=meta['ann_trained_rows'], n_probe=self.ann_probe
+                )
+            else:
+                self._refresh_ann_index()
+        return True
+    
+    def _tombstone(self, item_id: int) -> bool:
+        row = self._row_by_id.pop(item_id, None)
+        if row is None:
+            return False
+        self._index_items[row] = None
+        self._index_entities[row] = None
+        if self._active_rows is not None and row < len(self._active_rows):
+            self._active_rows[row] = False
+        return True
+    
+    def _drop_matrices(self) -> None:
+        self._passage_matrix = None
+        self._passage_owner = None
+        self._title_matrix = None
+        self._length_factors = None
+        self._active_rows = None
+        self._ann_index = None
+    
+    def _refresh_ann_index(self, start_row: Optional[int] = None,
+                           new_vectors: Optional[np.ndarray] = None, allow_retrain: bool = True) -> bool:
+        """Keep the approximate index in step with the passage matrix
+        
+        New rows are assigned to existing clusters; the index is retrained
+        after compaction or once the matrix doubled since training. Returns
+        True when it was (re)trained.
+        """
+        if self._passage_matrix is None or len(self._passage_matrix) < self.ann_min_rows:
+            self._ann_index = None
+            return False
+        
+        if self._ann_index is None or len(self._passage_matrix) > 2 * self._ann_index.trained_rows:
+            if allow_retrain:
+                ann_index = IVFIndex(n_lists=self.ann_lists, n_probe=self.ann_probe)
+                ann_index.build(self._passage_matrix)
+                self._ann_index = ann_index
+                return True
+        if self._ann_index is not None and new_vectors is not None:
+            self._ann_index.add(start_row, new_vectors)
+        return False
+    
+    def _compact_if_sparse(self, force: bool = False) -> bool:
+        """Drop tombstoned rows once they make up a quarter of the index, returning True if it did"""
+        dead_rows = len(self._index_items) - len(self._row_by_id)
+        if not dead_rows or (not force and dead_rows <= len(self._index_items) // 4):
+            return False
+        
+        keep = np.array(sorted(self._row_by_id.values()), dtype=np.intp)
+        if self._passage_matrix is not None:
+            # Row numbers change, so the approximate index is rebuilt
+            self._ann_index = None
+            new_rows = np.full(len(self._index_items), -1, dtype=np.intp)
+            new_rows[keep] = np.arange(len(keep))
+            kept_passages = new_rows[self._passage_owner] >= 0
+            self._passage_matrix = StackedRows(self._passage_matrix[kept_passages])
+            self._passage_owner = new_rows[self._passage_owner[kept_passages]]
+            self._title_matrix = StackedRows(self._title_matrix[keep])
+            self._length_factors = self._length_factors[keep]
+            self._active_rows = np.ones(len(keep), dtype=bool)
+        self._index_items = [self._index_items[row] for row in keep]
+        self._index_entities = [self._index_entities[row] for row in keep]
+        self._row_by_id = {item.get('id'): row for row, item in enumerate(self._index_items)}
+        return True
+    
+    def rank_answers(self, question: str, answers: Optional[List[Dict]] = None,
+                     top_k: Optional[int] = None) -> List[Tuple[Dict, float]]:
+        """Rank answers using advanced scoring
+        
+        With answers omitted, ranks the whole precomputed embedding index.
+        Answers that are already indexed reuse their stored embeddings, so
+        only the question (and any unindexed answer) needs a forward pass.
+        """
+        if self._passage_matrix is not None:
+            return self._rank_indexed(question, answers, top_k)
+        
+        if answers is None:
+            with self._index_lock:
+                answers = [item for item in self._index_items if item is not None]
+        
+        return self._rank_direct(question, answers)[:top_k]
+    
+    def _rank_indexed(self, question: str, answers: Optional[List[Dict]],
+                      top_k: Optional[int]) -> List[Tuple[Dict, float]]:
+        """Score indexed rows with one matrix-vector product"""
+        question_vector = self._embed_query(question)
+        if question_vector is None:
+            return []
+        question_entities = self._entity_set(question)
+        
+        unindexed_answers = []
+        with self._index_lock:
+            passage_matrix = self._passage_matrix
+            passage_owner = self._passage_owner
+            title_matrix = self._title_matrix
+            length_factors = self._length_factors
+            index_items = self._index_items.copy()
+            index_entities = self._index_entities.copy()
+            
+            if passage_matrix is None:
+                if answers is None:
+                    answers = [item for item in index_items if item is not None]
+                return self._rank_direct(question, answers)[:top_k]
+            
+            full_scan = answers is None and self._ann_index is None
+            if full_scan:
+                rows = np.flatnonzero(self._active_rows)
+            elif answers is None:
+                # Approximate passage candidates; their items are scored in full below
+                passages, _ = self._ann_index.search(passage_matrix, question_vector, self.ann_candidates)
+                rows = np.unique(passage_owner[passages])
+                rows = rows[self._active_rows[rows]]
+            else:
+                rows = []
+                for answer in answers:
+                    row = self._row_by_id.get(answer.get('id'))
+                    if row is None:
+                        unindexed_answers.append(answer)
+                    else:
+                        rows.append(row)
+                rows = np.array(rows, dtype=np.intp)
+        
+        # Each item scores as its best-matching passage
+        item_scores = np.full(len(length_factors), -np.inf, dtype=np.float32)
+        if full_scan:
+            # Full scan: one product over the whole matrix, then drop tombstones
+            np.maximum.at(item_scores, passage_owner, passage_matrix @ question_vector)
+            title_scores = (title_matrix @ question_vector)[rows]
+        else:
+            passages = np.flatnonzero(np.isin(passage_owner, rows))
+            np.maximum.at(item_scores, passage_owner[passages], passage_matrix[passages] @ question_vector)
+            title_scores = title_matrix[rows] @ question_vector
+        semantic_scores = item_scores[rows]
+        
+        # Entity matching bonus, only when the question carries entities
+        entity_scores = np.zeros(len(rows), dtype=np.float32)
+        if question_entities:
+            for position, row in enumerate(rows):
+                answer_entities = index_entities[row]
+                if answer_entities:
+                    common_entities = question_entities.intersection(answer_entities)
+                    entity_scores[position] = len(common_entities) / len(question_entities)
+        
+        # Combined score with weights
+        final_scores = (
+            semantic_scores * 0.5 +
+            title_scores * 0.2 +
+            length_factors[rows] * 0.1 +
+            entity_scores * 0.2
+        )
+        
+        k = min(top_k or len(rows), len(rows))
+        if 0 < k < len(rows):
+            top_positions = np.argpartition(-final_scores, k - 1)[:k]
+        else:
+            top_positions = np.arange(k)
+        top_positions = top_positions[np.argsort(-final_scores[top_positions])]
+        
+        scored_answers = [
+            (self._with_breakdown(index_items[rows[position]],
+                                  semantic_scores[position], title_scores[position],
+                                  length_factors[rows[position]], entity_scores[position]),
+             float(final_scores[position]))
+            for position in top_positions
+        ]
+        
+        if unindexed_answers:
+            scored_answers.extend(self._rank_direct(question, unindexed_answers))
+            scored_answers.sort(key=lambda x: x[1], reverse=True)
+        
+        return scored_answers[:top_k]
+    
+    def _with_breakdown(self, answer: Dict, semantic: float, title: float,
+                        length: float, entity: float) -> Dict:
+        """Copy of answer carrying the components of its score"""
+        scored_answer = answer.copy()
+        scored_answer['score_breakdown'] = {
+            'semantic': float(semantic),
+            'title': float(title),
+            'length': float(length),
+            'entity': float(entity)
+        }
+        return scored_answer
+    
+    def _rank_direct(self, question: str, answers: List[Dict]) -> List[Tuple[Dict, float]]:
+        """Score answers one by one without the precomputed index"""
         if not answers:
             return []
         
@@ -190,7 +781,7 @@ class TransformerNLP:
             answer_text = f"{answer.get('title', '')} {answer.get('content', '')}"
             
             # Calculate multiple similarity scores
-            semantic_score = self.calculate_semantic_similarity(question, answer_text)
+            semantic_score = self._passage_similarity(question, answer)
             
             # Title matching bonus
             title_score = self.calculate_semantic_similarity(question, answer.get('title', ''))
@@ -218,13 +809,29 @@ class TransformerNLP:
                 entity_match_score * 0.2
             )
             
-            scored_answers.append((answer, final_score))
+            scored_answers.append((
+                self._with_breakdown(answer, semantic_score, title_score,
+                                     length_factor, entity_match_score),
+                final_score
+            ))
         
         # Sort by score (descending)
         scored_answers.sort(key=lambda x: x[1], reverse=True)
         
         return scored_answers
     
+    def _passage_similarity(self, question: str, answer: Dict) -> float:
+        """Similarity of the question to the answer's best-matching passage"""
+        answer_text = f"{answer.get('title', '')} {answer.get('content', '')}"
+        passages = self._item_passages(answer)
+        if len(passages) == 1 or not self.model:
+            return self.calculate_semantic_similarity(question, answer_text)
+        
+        embeddings = self._embed_normalized([question] + passages)
+        if embeddings is None:
+            return self._fallback_similarity(question, answer_text)
+        return float((embeddings[1:] @ embeddings[0]).max())
+    
     def preprocess_text_advanced(self, text: str) -> str:
         """Advanced text preprocessing for better matching"""
         if not text:
@@ -249,15 +856,26 @@ class TransformerNLP:
         return ' '.join(filtered_words)
     
     def get_answer_confidence(self, question: str, answer: Dict, score: float) -> Dict:
-        """Get detailed confidence metrics for an answer"""
-        answer_text = f"{answer.get('title', '')} {answer.get('content', '')}"
+        """Get detailed confidence metrics for an answer
+        
+        Answers ranked by rank_answers carry a score_breakdown, which is
+        reused here so no further embeddings are computed.
+        """
+        breakdown = answer.get('score_breakdown')
+        if breakdown is None:
+            answer_text = f"{answer.get('title', '')} {answer.get('content', '')}"
+            breakdown = {
+                'semantic': self.calculate_semantic_similarity(question, answer_text),
+                'title': self.calculate_semantic_similarity(question, answer.get('title', '')),
+                'length': min(1.0, len(answer.get('content', '')) / 500)
+            }
         
         confidence_metrics = {
             'overall_score': score,
             'confidence_level': 'low',
-            'semantic_similarity': self.calculate_semantic_similarity(question, answer_text),
-            'title_relevance': self.calculate_semantic_similarity(question, answer.get('title', '')),
-            'content_length_score': min(1.0, len(answer.get('content', '')) / 500),
+            'semantic_similarity': breakdown['semantic'],
+            'title_relevance': breakdown['title'],
+            'content_length_score': breakdown['length'],
             'entity_matches': len(self.extract_entities(question))
         }
         
@@ -0,0 +1,137 @@
+"""
+Startup warmup for a worker
+Loads models, builds or maps indexes and runs a dummy query before traffic arrives
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict
+
+class WarmupManager:
+    """Runs registered warmup steps and reports readiness
+    
+    A worker is ready once every step ran and none of the required ones
+    failed; optional steps (e.g. the transformer model) may fail without
+    keeping the worker out of rotation. Failed steps are run again by a
+    later request once their backoff, doubling from retry_seconds up to
+    max_retry_seconds, has passed; steps that succeeded are not repeated.
+    """
+    
+    def __init__(self, retry_seconds: float = 5.0, max_retry_seconds: float = 300.0):
+        self.logger = logging.getLogger(__name__)
+        self.retry_seconds = retry_seconds
+        self.max_retry_seconds = max_retry_seconds
+        self._steps = []  # (name, fn, required)
+        self._components = {}
+        self._state = 'pending'
+        self._started_at = None
+        self._finished_at = None
+        self._retries = 0
+        self._retry_at = None  # time.monotonic() after which failed steps run again
+        self._thread = None
+        self._lock = threading.Lock()
+        
+        # The warmup thread does not survive a fork (e.g. gunicorn --preload)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+    
+    def _reset_after_fork(self) -> None:
+        """Let a forked worker run an unfinished warmup again"""
+        self._lock = threading.Lock()
+        if self._state in ('ready', 'failed'):
+            return
+        self._thread = None
+        self._state = 'pending'
+        self._components = {}
+        self._started_at = None
+        self._finished_at = None
+        self._retries = 0
+        self._retry_at = None
+    
+    def add_step(self, name: str, fn: Callable[[], None], required: bool = True) -> None:
+        """Register a warmup step; steps run in registration order"""
+        self._steps.append((name, fn, required))
+    
+    def _pending_steps(self):
+        """Steps that have not succeeded yet"""
+        return [step for step in self._steps if self._components.get(step[0], {}).get('status') != 'ok']
+    
+    def run(self) -> bool:
+        """Run every step that has not succeeded yet, return whether the worker is ready"""
+        if self._started_at is None:
+            self._state = 'running'
+            self._started_at = time.time()
+        
+        for name, fn, required in self._pending_steps():
+            attempts = self._components.get(name, {}).get('attempts', 0) + 1
+            start_time = time.perf_counter()
+            try:
+                fn()
+                component = {'status': 'ok'}
+            except Exception as e:
+                self.logger.warning(f"Warmup step {name} failed: {e}")
+                component = {'status': 'failed', 'error': str(e)}
+            component['seconds'] = round(time.perf_counter() - start_time, 3)
+            component['required'] = required
+            component['attempts'] = attempts
+            self._components[name] = component
+        
+        ready = not any(component['status'] != 'ok' and component['required']
+                        for component in self._components.values())
+        self._finished_at = time.time()
+        self._state = 'ready' if ready else 'failed'
+        self.logger.info(f"Warmup {self._state} in {self._finished_at - self._started_at:.2f}s")
+        
+        if self._pending_steps():
+            delay = min(self.max_retry_seconds, self.retry_seconds * 2 ** self._retries)
+            self._retries += 1
+            self._retry_at = time.monotonic() + delay
+            self.logger.info(f"Retrying failed warmup steps in {delay:.0f}s")
+        else:
+            self._retry_at = None
+        return ready
+    
+    def _can_start(self) -> bool:
+        """Not started yet, or finished with failed steps whose backoff has passed"""
+        if self._thread is None:
+            return True
+        return (not self._thread.is_alive() and self._retry_at is not None
+                and time.monotonic() >= self._retry_at)
+    
+    def start_background(self, app) -> bool:
+        """Run the warmup (or a due retry of its failed steps) in a daemon thread"""
+        if not self._can_start():
+            return False
+        
+        with self._lock:
+            if not self._can_start():
+                return False
+            
+            def worker():
+                with app.app_context():
+                    self.run()
+            
+            self._thread = threading.Thread(target=worker, name='warmup', daemon=True)
+            self._thread.start()
+            return True
+    
+    @property
+    def ready(self) -> bool:
+        """Whether warmup finished without a required step failing"""
+        return self._state == 'ready'
+    
+    def get_status(self) -> Dict:
+        """Readiness plus per-component timings"""
+        status = {
+            'ready': self.ready,
+            'state': self._state,
+            'components': {name: dict(component) for name, component in self._components.items()}
+        }
+        if self._started_at is not None:
+            end_time = self._finished_at or time.time()
+            status['total_seconds'] = round(end_time - self._started_at, 3)
+        if self._retry_at is not None:
+            status['retry_in_seconds'] = round(max(0.0, self._retry_at - time.monotonic()), 1)
+        return status